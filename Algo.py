@@ -3,25 +3,89 @@ import numpy as np
 import pandas as pd
 import yfinance as yf
 from typing import Iterator
+from TradingCalendar import TradingCalendar
+from SignalSpec import Strategy, column, where, rolling_mean_values, rolling_std_values
+from LiveDecision import BollingerDecider
+import Precision
+import Regime
+
+
+def _like(series, values):
+    '''
+
+        Wraps values in a Series or DataFrame with the same labels as series
+
+    '''
+    if series.ndim == 1:
+        return pd.Series(values, index=series.index)
+    return pd.DataFrame(values, index=series.index, columns=series.columns)
+
+def rolling_mean(series, window: int):
+    '''
+
+        Rolling mean computed window by window, so each value only depends on its own window
+
+        :param series: Series being averaged, or a frame averaged column by column
+        :type series: pd.Series or pd.DataFrame
+        :param window: Number of rows in each window
+        :type window: int
+        :return: Rolling mean, nan for the first window - 1 rows
+        :rtype: pd.Series
+
+    '''
+    return _like(series, rolling_mean_values(series.to_numpy(dtype=np.float64), window))
+
+def rolling_std(series, window: int):
+    '''
+
+        Rolling sample standard deviation computed window by window
+
+        Unlike pandas' running update, the result does not depend on where the series starts, which is
+        what lets chunked runs reproduce in-memory runs exactly.
+
+        :param series: Series whose deviation is computed, or a frame computed column by column
+        :type series: pd.Series or pd.DataFrame
+        :param window: Number of rows in each window
+        :type window: int
+        :return: Rolling standard deviation, nan for the first window - 1 rows
+        :rtype: pd.Series
+
+    '''
+    return _like(series, rolling_std_values(series.to_numpy(dtype=np.float64), window))
 
 
 class Algo(ABC):
+    #> Boolean mask over total_price_data of the days entries are allowed on, None allowing every day
+    regime_mask = None
 
-    def __init__(self, ticker: str):
+    def __init__(self, ticker: str, bar_source=None, precision=None):
         '''
 
             :param ticker: Ticker of the asset being backtested 
             :type ticker: str
+            :param bar_source: Aggregator serving daily bars from stored minutes instead of downloading them
+            :type bar_source: MinuteStore.BarAggregator or None
+            :param precision: Storage types of prices, indicators and signals, defaults to Precision.FULL
+            :type precision: Precision.PrecisionMode or None
             :return: No return 
             :rtype: None
         
         '''
         self.ticker = ticker
+        self.bar_source = bar_source
+        self.precision = Precision.FULL if precision is None else precision
+        self.signal_masks = {}
         self.price_data = pd.Series(data=[0]) 
         self.is_long = False
         self.is_short = False
         self.entry = 0
-        self.total_price_data = yf.download(tickers=self.ticker,interval = "1d")
+        if self.bar_source is not None:
+            self.total_price_data = self.bar_source.bars(self.ticker, "1d").copy()
+        else:
+            self.total_price_data = yf.download(tickers=self.ticker,interval = "1d")
+        if self.precision is not Precision.FULL:
+            self.total_price_data = Precision.compact_prices(self.total_price_data, self.precision)
+        self.calendar = TradingCalendar(self.total_price_data.index)
         self.set_highest()
         self.set_lowest()
 
@@ -42,10 +106,11 @@ class Algo(ABC):
         '''
         data = None
         if day is not None:
-            end_stamp = pd.Timestamp(day)
-            start_index = self.total_price_data.index.get_loc(end_stamp) - 21
-            start_stamp = self.total_price_data.index[start_index] 
-            data = self.total_price_data.loc[start_stamp:end_stamp]
+            end_iloc = self.calendar.get_loc(day)
+            start_iloc = self.calendar.sessions_back(day, 21)
+            data = self.total_price_data.iloc[start_iloc:end_iloc + 1]
+        elif self.bar_source is not None:
+            data = self.bar_source.period(self.ticker, period)
         else:
             interval = "1d"
             data = yf.download(tickers=self.ticker, period=period, interval=interval)
@@ -67,6 +132,49 @@ class Algo(ABC):
     def __name__(self) -> None:
         pass
 
+    def get_signal(self, name: str) -> pd.Series:
+        '''
+
+            Reads a signal column, whether it is held in total_price_data or bit packed
+
+            :param name: Name of the signal column, such as "BUY"
+            :type name: str
+            :return: The signal column
+            :rtype: pd.Series
+
+        '''
+        if name in self.signal_masks:
+            return pd.Series(self.signal_masks[name].unpack(), index=self.total_price_data.index, name=name)
+        return self.total_price_data[name]
+
+    def set_regime(self, mask=None) -> None:
+        '''
+
+            Gates the entries of the algorithm on a regime mask, ANDed with its buy and sell signals
+
+            :param mask: Whether entries are allowed on each day of total_price_data, defaults to the mean reversion mask of Regime.SPEC
+            :type mask: pd.Series indexed by date, np.ndarray or None
+            :return: No return
+            :rtype: None
+
+        '''
+        if mask is None:
+            mask = Regime.mask(self.total_price_data)
+        elif isinstance(mask, pd.Series):
+            mask = mask.reindex(self.total_price_data.index, fill_value=False)
+        self.regime_mask = np.asarray(mask, dtype=bool)
+
+    def _regime_allows(self, day=None) -> bool:
+        '''
+
+            :returns: Whether the regime mask allows entries on a day, the last day when None
+            :rtype: bool
+
+        '''
+        if self.regime_mask is None:
+            return True
+        return bool(self.regime_mask[-1 if day is None else self.calendar.get_loc(day)])
+
     def get_ticker(self) -> str:
         '''
 
@@ -122,7 +230,64 @@ class Algo(ABC):
         '''
         self.is_short = True
 
+def _minhs_spec(regime: bool = False) -> Strategy:
+    '''
+
+        Signal and return columns of MinhsAlgo, in the order they are added to the price data
+
+        :param regime: Whether BUY and SELL are also ANDed with a boolean "Regime" input column
+
+    '''
+    opens, high, low, close = column("Open"), column("High"), column("Low"), column("Close")
+    spec = {}
+
+    # 90 day rolling stdev and 20 day moving average
+    spec['Stdev'] = close.rolling_std(90)
+    spec['Moving Average'] = close.rolling_mean(20)
+
+    # Buy: previous day's low to today's open gaps down by more than a stdev, open above the moving average
+    spec['Buy1'] = (opens - low.shift(1)) < -spec['Stdev']
+    spec['Buy2'] = opens > spec['Moving Average']
+    spec['BUY'] = spec['Buy1'] & spec['Buy2']
+    if regime:
+        spec['BUY'] = spec['BUY'] & column("Regime")
+
+    # Sell: exact opposite
+    spec['Sell1'] = (opens - high.shift(1)) > spec['Stdev']
+    spec['Sell2'] = opens < spec['Moving Average']
+    spec['SELL'] = spec['Sell1'] & spec['Sell2']
+    if regime:
+        spec['SELL'] = spec['SELL'] & column("Regime")
+
+    # Daily % return series for stock, multiplied by 1 if we are long and -1 if we are short
+    spec['Pct Change'] = (close - opens) / opens
+    spec['Rets'] = where(spec['SELL'], -spec['Pct Change'], where(spec['BUY'], spec['Pct Change'], 0))
+    return Strategy(spec)
+
+def _bollinger_spec() -> Strategy:
+    '''
+
+        Bollinger bands of BollingerBands.cal_moving_avg for every day at once
+
+    '''
+    close = column("Close")
+    return Strategy({
+        # Today's band over the 20 closes before today, yesterday's over the 20 closes before yesterday
+        "Today": close,
+        "Yesterday": close.shift(1),
+        "Yesterday SMA": close.shift(2).rolling_mean(20),
+        "Yesterday Std": close.shift(2).rolling_std(20),
+        "Today SMA": close.shift(1).rolling_mean(20),
+        "Today Std": close.shift(1).rolling_std(20),
+    })
+
+
 class MinhsAlgo(Algo):
+    #> Rows of history a row's signals depend on: the 90 day stdev window and the shifted low/high
+    WARM_UP = 90
+    SPEC = _minhs_spec()
+    GATED_SPEC = _minhs_spec(regime=True)
+
     def set_highest(self) -> None:
         self.highest = -10000
 
@@ -136,6 +301,11 @@ class MinhsAlgo(Algo):
         '''
 
             Implement my mean reversion trading algorithm
+
+            With a precision mode packing masks, such as Precision.COMPACT, the BUY, SELL and other
+            boolean columns are moved out of total_price_data into signal_masks: read them with
+            get_signal("BUY"), as total_price_data["BUY"] raises a KeyError.
+
             :return: void
             :rtype: void
 
@@ -143,42 +313,43 @@ class MinhsAlgo(Algo):
 
         try:
             # The historical data of the stock is stored in the self.total_price_data attribute. type: pd.self.total_price_data
-            
-            # Create a new column to hold our 90 day rolling stdev
-            self.total_price_data['Stdev'] = self.total_price_data['Close'].rolling(window=90).std()
-
-            # Create a new column to hold our 20 day moving average
-            self.total_price_data['Moving Average'] = self.total_price_data['Close'].rolling(window=20).mean()
-
-            # Buy: 1st signal
-            self.total_price_data['Buy1'] = (self.total_price_data['Open'] - self.total_price_data['Low'].shift(1)) < -self.total_price_data['Stdev']
-
-            # Buy: 2nd signal
-            self.total_price_data['Buy2'] = self.total_price_data['Open'] > self.total_price_data['Moving Average']
+            self.signals(self.total_price_data, self.precision.price_dtype, self.regime_mask)
+            if self.precision.pack_masks:
+                self.signal_masks = Precision.pack_signals(self.total_price_data)
 
-            # Column to indicate if buy
-            self.total_price_data['BUY'] = self.total_price_data['Buy1'] & self.total_price_data['Buy2']
-
-            # Sell: 1st signal
-            self.total_price_data['Sell1'] = (self.total_price_data['Open'] - self.total_price_data['High'].shift(1)) > self.total_price_data['Stdev']
+        except Exception as err:
+            print(err)
 
-            # Sell: 2nd signal
-            self.total_price_data['Sell2'] = self.total_price_data['Open'] < self.total_price_data['Moving Average']
+    @staticmethod
+    def signals(frame, dtype=np.float64, regime=None) -> None:
+        '''
 
-            # Column to indicate if sell
-            self.total_price_data['SELL'] = self.total_price_data['Sell1'] & self.total_price_data['Sell2']
+            Adds the signal and return columns of the algorithm to a frame of daily OHLC bars
 
-            # Calculate daily % return series for stock
-            self.total_price_data['Pct Change'] = (self.total_price_data['Close'] - self.total_price_data['Open']) / self.total_price_data['Open']
+            Every row only depends on the MinhsAlgo.WARM_UP rows before it, so a frame can be
+            processed in chunks that overlap by that many rows.
 
-            # Calculate the strategy's return series by using the daily stock returns mutliplied by 1 if we are long and -1 if we are short
-            self.total_price_data['Rets'] = np.where(self.total_price_data['BUY'], self.total_price_data['Pct Change'], 0)
-            self.total_price_data['Rets'] = np.where(self.total_price_data['SELL'], -self.total_price_data['Pct Change'], self.total_price_data['Rets'])
+            :param frame: Daily bars with Open, High, Low and Close columns
+            :type frame: pd.DataFrame
+            :param dtype: Floating point type of the indicator and return columns
+            :type dtype: np.dtype
+            :param regime: Boolean mask of the rows BUY and SELL may fire on, or None for every row
+            :type regime: np.ndarray or None
+            :return: void
+            :rtype: void
 
-        except Exception as err:
-            print(err)
+        '''
+        if regime is None:
+            outputs = MinhsAlgo.SPEC.evaluate(frame, dtype)
+        else:
+            data = {col: frame[col] for col in MinhsAlgo.SPEC.columns}
+            data["Regime"] = np.asarray(regime, dtype=bool)
+            outputs = MinhsAlgo.GATED_SPEC.evaluate(data, dtype)
+        for name, values in outputs.items():
+            frame[name] = values
 
 class BollingerBands(Algo):
+    SPEC = _bollinger_spec()
 
     def set_highest(self) -> None:
         self.highest = -10000
@@ -231,10 +402,12 @@ class BollingerBands(Algo):
         y_sma, y_upper1, y_upper2, y_lower1, y_lower2 = self.cal_moving_avg(0, -2)
         # Today's bollinger band
         t_sma, t_upper1, t_upper2, t_lower1, t_lower2 = self.cal_moving_avg(1, -1)
+        # Entries are only taken on days the regime mask allows
+        allowed = self._regime_allows(day)
 
         # If current close is in between upper and lower bollinger band (ABOVE SMA)
         # and previous close was below lower band and above sma, create position
-        if (today <= t_upper2) and (today >= t_upper1) and (yesterday <= y_upper1) and (yesterday >= y_sma):
+        if allowed and (today <= t_upper2) and (today >= t_upper1) and (yesterday <= y_upper1) and (yesterday >= y_sma):
             if not self.get_long():
                 self.is_long = True
                 self.is_short = False
@@ -242,7 +415,7 @@ class BollingerBands(Algo):
 
         # If current close in between upper and lower bollinger band (BELOW SMA)
         # and previous close was above lower band and below sma, create position
-        if (today <= t_lower1) and (today >= t_lower2) and (yesterday <= y_sma) and (yesterday >= y_lower1):
+        if allowed and (today <= t_lower1) and (today >= t_lower2) and (yesterday <= y_sma) and (yesterday >= y_lower1):
             if not self.get_short():
                 self.is_short = True
                 self.is_long = False
@@ -272,5 +445,33 @@ class BollingerBands(Algo):
                 self.is_short = False
                 self.lowest = 10000
 
+    def positions(self, start: int = 1) -> tuple:
+        '''
+
+            Runs the strategy over the whole history at once, as calling run_algo on every day from start would
+
+            The bands of every day come from one evaluation of BollingerBands.SPEC, and only the entry
+            and exit state machine steps through the days.
+
+            :param start: Row of total_price_data of the first day the strategy runs on
+            :type start: int
+            :return: Boolean arrays, one row per day, of whether the strategy is long and whether it is short
+            :rtype: tuple[np.ndarray]
+
+        '''
+        bands = BollingerBands.SPEC.evaluate(self.total_price_data)
+        n = len(self.total_price_data.index)
+        is_long = np.zeros(n, dtype=bool)
+        is_short = np.zeros(n, dtype=bool)
+
+        allowed = np.ones(n, dtype=bool) if self.regime_mask is None else self.regime_mask
+
+        decider = BollingerDecider([self.ticker])
+        for row in range(start, n):
+            is_long[row], is_short[row] = [states[0] for states in decider.decide(
+                *[bands[name][row:row + 1] for name in ["Today", "Yesterday", "Yesterday SMA", "Yesterday Std", "Today SMA", "Today Std"]],
+                allowed=allowed[row:row + 1])]
+        return is_long, is_short
+
 if __name__ == "__main__":
     BollingerBands("MSFT")
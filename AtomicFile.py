@@ -0,0 +1,40 @@
+import os
+import uuid
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(filestring: str, mode: str = "wb", permissions: int = 0o666):
+    '''
+
+        Writes a file under a temporary name, then renames it over the target, so readers see either the old or the new file
+
+        The temporary name is unique to the writer, so concurrent writers of the same file never
+        interleave. The data is flushed to disk before the rename, so a crash never leaves a
+        truncated file under the target's name. If the block raises, the temporary file is removed
+        and the target is left untouched.
+
+        :param filestring: File being written
+        :type filestring: str
+        :param mode: "wb" for bytes or "w" for text
+        :type mode: str
+        :param permissions: Permission bits of a new file, before the umask is applied
+        :type permissions: int
+        :raises ValueError: If the mode does not write a whole file
+
+    '''
+    if mode not in ("w", "wb"):
+        raise ValueError("Unsupported mode " + mode)
+    temp = filestring + "." + uuid.uuid4().hex[:12] + ".tmp"
+    descriptor = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, permissions)
+    try:
+        with os.fdopen(descriptor, mode) as pfile:
+            yield pfile
+            pfile.flush()
+            os.fsync(pfile.fileno())
+        os.replace(temp, filestring)
+    except BaseException:
+        #* The descriptor is closed by fdopen, even if the block raised
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
@@ -33,12 +33,7 @@ class Backtest:
             #> Placement of closing prices into hist_positions dataframe 
             start_stamp = pd.to_datetime('today').normalize() - pd.Timedelta(years_back*365, "d")
 
-            while True:
-                try:
-                    start_iloc = self.algo.total_price_data.index.get_loc(start_stamp)
-                    break
-                except KeyError:
-                    start_stamp = start_stamp - pd.Timedelta(1,"d")
+            start_iloc = self.algo.calendar.previous_session(start_stamp)
 
             self.hist_positions = self.algo.total_price_data[["Close"]].iloc[start_iloc:].copy()
             n = len(self.hist_positions.index)
@@ -46,21 +41,25 @@ class Backtest:
             #> Create columns in hist_positions dataframe
             #>      Positions initalized to None
             #>      On first day of backtest all capital is stored as cash
-
-            self.hist_positions["Position"] = [None for i in range(0,n)]
-            self.hist_positions["Cash"] = [capital if i == 0 else 0 for i in range(0,n)]
-            self.hist_positions["Equity"] = [0 for i in range(0,n)]
-            self.hist_positions["Capital"] = [capital if i == 0 else 0 for i in range(0,n)]
-            self.hist_positions["Volume"] = [0 for i in range(0,n)]
+            #>      Money is accumulated in float64 whatever the precision of the price data
+
+            self.hist_positions["Position"] = np.full(n, None, dtype=object)
+            self.hist_positions["Cash"] = np.zeros(n)
+            self.hist_positions["Equity"] = np.zeros(n)
+            self.hist_positions["Capital"] = np.zeros(n)
+            self.hist_positions["Volume"] = np.zeros(n, dtype=np.int64)
+            self.hist_positions.iloc[0, [2, 4]] = capital
             
             #> Establish and randomly generated ID for the backtest
             self.ID = uuid.uuid4()
 
-    def run_backtest(self,debug_filestring=None) -> None:
+    def run_backtest(self,debug_filestring=None, sizing=None) -> None:
         ''' 
 
             Runs the backtest on the algorithm provided in the self.algo attribute
 
+            :param sizing: Fraction of cash and equity committed by an entry on every day, all of it when None
+            :type sizing: pd.Series indexed by date, np.ndarray with one value per day of hist_positions, or None
             :returns: Value indicating successful backtest
             :rtype: bool
 
@@ -74,11 +73,12 @@ class Backtest:
 
 
         prevTimestamp = self.hist_positions.index[0] 
+        fractions = self._fractions(sizing)
 
         #> 0: Close     1: Position     2:Cash     3:Equity     4: Capital      5: Volume
         # for row in range(1, len(self.hist_positions.index)):
 
-        for curTimestamp in self.hist_positions.index[1:]:
+        for row, curTimestamp in enumerate(self.hist_positions.index[1:], start=1):
             prevClose, prevPosition, prevCash, prevEquity, prevCapital, prevVol  = dfRowReadTimestamp(self.hist_positions, prevTimestamp)
             curClose, curPosition, curCash, curEquity, curCapital, curVol = dfRowReadTimestamp(self.hist_positions, curTimestamp)
 
@@ -104,7 +104,7 @@ class Backtest:
                 if  curPosition == "Long":
                     #> Step 1: Clear off previous equity, compute volume
                     curCash = prevCash + prevEquity
-                    curVol = curCash // curClose
+                    curVol = (curCash * fractions[row]) // curClose
 
                     #> Step 2: Make Purchase
                     curCash = curCash - curClose * curVol
@@ -113,7 +113,7 @@ class Backtest:
                 elif  curPosition == "Short":
                     #> Step 1: Clear off previous equity, compute volume 
                     curCash = prevCash + prevEquity
-                    curVol = curCash // curClose
+                    curVol = (curCash * fractions[row]) // curClose
                     #> Step 2: Make Purchase
                     curCash = curCash + curClose * curVol
                     curEquity = -1 * curClose * curVol
@@ -160,6 +160,69 @@ class Backtest:
             
         return True
 
+    def run_backtest_vectorized(self, sizing=None) -> bool:
+        '''
+
+            Runs the backtest with the array kernel simulate, giving the hist_positions run_backtest would
+
+            Positions come from the algorithm's positions method when it has one, such as
+            BollingerBands.positions, and from calling run_algo on every day otherwise.
+
+            :param sizing: Fractions as in run_backtest, or a function of the closes and position codes returning them, such as Sizing.kelly_fractions
+            :type sizing: pd.Series, np.ndarray, callable or None
+            :returns: Value indicating successful backtest
+            :rtype: bool
+
+        '''
+        n = len(self.hist_positions.index)
+        start = len(self.algo.total_price_data.index) - n
+        if hasattr(self.algo, "positions"):
+            is_long, is_short = [states[start:] for states in self.algo.positions(start=start + 1)]
+        else:
+            is_long, is_short = np.zeros(n, dtype=bool), np.zeros(n, dtype=bool)
+            for row in range(1, n):
+                self.algo.run_algo(pd.Timestamp(self.hist_positions.index[row]))
+                is_long[row], is_short[row] = self.algo.get_long(), self.algo.get_short()
+
+        if (is_long & is_short).any():
+            print(self.hist_positions.index[np.argmax(is_long & is_short)])
+            raise ValueError("Algorithm says to go both long and short")
+
+        codes = is_long.astype(np.int8) - is_short.astype(np.int8)
+        close = self.hist_positions["Close"].to_numpy()
+        if callable(sizing):
+            sizing = sizing(close, codes)
+        cash, equity, capital, volume = simulate(close, codes, self.hist_positions.iloc[0, 4], self._fractions(sizing))
+        self.hist_positions["Position"] = pd.Series(np.array([None, "Long", "Short"], dtype=object)[codes],
+                                                    index=self.hist_positions.index, dtype=object)
+        self.hist_positions["Cash"] = cash
+        self.hist_positions["Equity"] = equity
+        self.hist_positions["Capital"] = capital
+        self.hist_positions["Volume"] = volume.astype(np.int64)
+        self.capital = capital[-1]
+        return True
+
+    def _fractions(self, sizing) -> np.ndarray:
+        '''
+
+            Aligns the fractions of a sizing rule with the days of hist_positions
+
+            :returns: Fraction of every day of hist_positions
+            :rtype: np.ndarray
+
+        '''
+        n = len(self.hist_positions.index)
+        if sizing is None:
+            return np.ones(n)
+        if isinstance(sizing, pd.Series):
+            sizing = sizing.reindex(self.hist_positions.index)
+        fractions = np.asarray(sizing, dtype=np.float64)
+        if fractions.shape != (n,):
+            raise ValueError("Sizing has " + str(len(fractions)) + " fractions for " + str(n) + " days")
+        if np.isnan(fractions).any():
+            raise ValueError("Sizing has no fraction for " + str(self.hist_positions.index[np.argmax(np.isnan(fractions))]))
+        return fractions
+
     def __add_to_capital(self, amt: float) -> None:
         '''
 
@@ -251,6 +314,8 @@ class Backtest:
         img_filename = 'backtest_portfolio_graph_{}.png'.format(self.ticker)
         plt.tight_layout()
         plt.savefig(img_filename)
+        #* Closed once saved, otherwise every report of a sweep keeps its figure alive
+        plt.close()
         return img_filename
     
     def _profit_control(self) -> float:
@@ -268,13 +333,13 @@ class Backtest:
         percentange_pl = (final - start) / start * 100
         return percentange_pl
 
-    def _pl_ratios_and_kelley_and_sharpe(self) -> tuple:
-        ''' 
+    def _trade_pl(self) -> np.ndarray:
+        '''
 
-            Computes P/L ratios, Kelley criterion, and Sharpe ratio
+            Builds the trade ledger as the fractional change in capital over each position held
 
-            :returns: Average P/L ratio across all trades, average P/L ratio across all non-outlier trades, kelley criterion, sharpe ratio
-            :rtype: tupple[floats]
+            :returns: P/L ratio of every trade in the order the trades were taken
+            :rtype: np.ndarray
 
         '''
         pl = []
@@ -293,7 +358,18 @@ class Backtest:
         if self.hist_positions.iloc[-1, 1] is not None:
             pl.append((self.hist_positions.iloc[-1, 4] - cp) / cp)
 
-        pl = np.array(pl)
+        return np.array(pl)
+
+    def _pl_ratios_and_kelley_and_sharpe(self) -> tuple:
+        ''' 
+
+            Computes P/L ratios, Kelley criterion, and Sharpe ratio
+
+            :returns: Average P/L ratio across all trades, average P/L ratio across all non-outlier trades, kelley criterion, sharpe ratio
+            :rtype: tupple[floats]
+
+        '''
+        pl = self._trade_pl()
         avg_pl = np.mean(pl)
         std = np.std(pl)
         dist_avg_pl = np.abs(pl - avg_pl)
@@ -339,6 +415,66 @@ class Backtest:
         return  position_count
 
 
+def simulate(close, codes, capital: float, fractions=None) -> tuple:
+    '''
+
+        Array kernel of Backtest.run_backtest for a known sequence of positions
+
+        Only the bars where the position changes are stepped through. Cash, equity and volume are set
+        for each run of bars holding the same position at once, and capital is the running sum of the
+        daily profit and loss, added in the same order as run_backtest adds it.
+
+        :param close: Closing price of every bar
+        :type close: np.ndarray
+        :param codes: Position held on every bar, 1 long, -1 short and 0 neutral, the first bar being neutral
+        :type codes: np.ndarray
+        :param capital: Capital balance on the first bar, all held as cash
+        :type capital: float
+        :param fractions: Fraction of cash and equity committed by an entry on every bar, all of it when None
+        :type fractions: np.ndarray or None
+        :returns: Cash, equity, capital and volume of every bar
+        :rtype: tuple[np.ndarray]
+
+    '''
+    close = np.asarray(close, dtype=np.float64)
+    codes = np.asarray(codes, dtype=np.int8)
+    n = len(close)
+    cash = np.empty(n)
+    equity = np.zeros(n)
+    volume = np.zeros(n)
+    pnl = np.zeros(n)
+
+    bounds = np.concatenate([[0], np.flatnonzero(codes[1:] != codes[:-1]) + 1, [n]])
+    prev_cash, prev_equity, prev_volume = capital, 0.0, 0.0
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        code = codes[start]
+        if start == 0:
+            cur_cash, cur_volume = capital, 0.0
+        elif code != 0:
+            #> Entering a position: clear off previous equity, compute volume, make purchase
+            cur_cash = prev_cash + prev_equity
+            cur_volume = (cur_cash * (1.0 if fractions is None else fractions[start])) // close[start]
+            cur_cash = cur_cash - code * (close[start] * cur_volume)
+            equity[start] = code * close[start] * cur_volume
+        else:
+            #> Going neutral: the previous position is sold at today's close
+            prev_code = codes[start - 1]
+            cur_cash = prev_cash + prev_code * (close[start] * prev_volume)
+            pnl[start] = prev_code * (close[start] - close[start - 1]) * prev_volume
+            cur_volume = 0.0
+
+        cash[start:end] = cur_cash
+        volume[start:end] = cur_volume
+        if code != 0:
+            #> Holding a position: equity follows the close and capital grows by each day's move
+            equity[start + 1:end] = code * close[start + 1:end] * cur_volume
+            pnl[start + 1:end] = code * (close[start + 1:end] - close[start:end - 1]) * cur_volume
+        prev_cash, prev_equity, prev_volume = cur_cash, equity[end - 1], cur_volume
+
+    pnl[0] = capital
+    return cash, equity, np.cumsum(pnl), volume
+
+
 if __name__ == "__main__":
     import Bollinger_Algorithm
     import Algo
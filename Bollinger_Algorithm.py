@@ -1,6 +1,7 @@
 import numpy as np
 import pandas as pd
 import yfinance as yf
+from TradingCalendar import TradingCalendar
 
 
 class BollingerBands:
@@ -33,6 +34,7 @@ class BollingerBands:
         self.highest = -10000
         self.lowest = 10000
         self.total_price_data = yf.download(tickers=self.ticker,interval = "1d",    )
+        self.calendar = TradingCalendar(self.total_price_data.index)
 
     def get_current_data(self, period, day=None):
         """
@@ -47,10 +49,9 @@ class BollingerBands:
         #! This must be fixed in future versions 
 
         if day is not None:
-            end_stamp = pd.Timestamp(day)
-            start_index = self.total_price_data.index.get_loc(end_stamp) - 21
-            start_stamp = self.total_price_data.index[start_index] 
-            data = self.total_price_data.loc[start_stamp:end_stamp]
+            end_iloc = self.calendar.get_loc(day)
+            start_iloc = self.calendar.sessions_back(day, 21)
+            data = self.total_price_data.iloc[start_iloc:end_iloc + 1]
 
         else:
             interval = "1d"
@@ -189,24 +190,21 @@ class BollingerBands:
 
 if __name__ == "__main__":
 
-    #Ticker data from https://dumbstockapi.com 
-    import csv
-    tickerCSVfile = open('/Users/iain/Documents/ENCF/Programming/backtest-framework/dumbstockapi.csv')
-    tickerReader = csv.reader(tickerCSVfile)
-    tickerData = list(tickerReader)
-    tickerCSVfile.close()
+    #* Tickers of the cached Russell 3000 constituent list, unfiltered: Universe.named("russell3000")...
+    #* ...would also drop the non-equity and zero-price rows
+    from Universe import Universe
+    tickers = list(Universe.load())
 
-    #* Remoging the heder and focusuing on the tickers themselves in this listcomp
-    tickers = [i[0] for i in tickerData if i[0] != 'ticker']
-
-    #! This will terminate at ticker symbol "EAI", as there is over a year between...
-    #! ...The most recent day of trading and the second most recent day of trading...
-    #! ...this is not a likely case for when we will be carrying out backtesting...
-    #! ...so I am not overly concerned
+    #* Tickers such as "EAI", with over a year between the most recent day of trading and...
+    #* ...the second most recent day of trading, are found through the calendar and skipped
     
     for ticker in tickers:
         try:
             A = BollingerBands(ticker) 
+            recent_gaps = A.calendar.gaps(min_days=30)
+            if len(recent_gaps.index) > 0 and recent_gaps["End"].iloc[-1] >= A.calendar.timestamp(-22):
+                print("Gap in the last 22 sessions of ticker: " + str(ticker))
+                continue
             A.get_current_data("22d")
             depreciated_data = A.price_data
             A.get_current_data("22d", day=pd.to_datetime('2020-06-26')) 
@@ -0,0 +1,181 @@
+import tracemalloc
+from contextlib import nullcontext
+import numpy as np
+import pandas as pd
+import Algo
+from MinuteStore import COLUMNS
+
+#> Memory held while MinhsAlgo.signals processes a chunk, measure_chunk_bytes giving about 125 bytes per row and 1 MB...
+#> ...whatever the length, mostly rolling window temporaries bounded by SignalSpec.ROLLING_BLOCK_BYTES; both with headroom
+BYTES_PER_ROW = 192
+FIXED_BYTES = 2**21
+
+
+class ChunkedPipeline:
+
+    def __init__(self, store, memory_budget: int = 256 * 2**20, signals=Algo.MinhsAlgo.signals,
+                 warm_up: int = Algo.MinhsAlgo.WARM_UP, bytes_per_row: int = BYTES_PER_ROW, fixed_bytes: int = FIXED_BYTES):
+        '''
+
+            Runs the signal and return pipeline over histories streamed from disk in time chunks
+
+            Each chunk is read together with the warm_up rows before it, so its rolling windows see the
+            same history as an in-memory run, and those rows are dropped once the signals are computed.
+            The chunk length follows from the memory budget rather than from the length of the history,
+            and tickers are processed one after another.
+
+            :param store: Store of daily or minute bars, read through its memory mapped columns
+            :type store: MinuteStore.MinuteStore
+            :param memory_budget: Bytes a chunk may occupy while it is processed
+            :type memory_budget: int
+            :param signals: Function adding the signal columns, including Rets, to a frame of bars
+            :type signals: callable
+            :param warm_up: Rows of history a row's signals depend on
+            :type warm_up: int
+            :param bytes_per_row: Bytes held per row while a chunk is processed
+            :type bytes_per_row: int
+            :param fixed_bytes: Bytes held while a chunk is processed whatever its length
+            :type fixed_bytes: int
+
+        '''
+        self.store = store
+        self.signals = signals
+        self.warm_up = warm_up
+        self.chunk_rows = (memory_budget - fixed_bytes) // bytes_per_row - warm_up
+        if self.chunk_rows <= 0:
+            raise ValueError("Memory budget of " + str(memory_budget) + " bytes cannot hold the warm-up rows of a chunk")
+
+    def iter_chunks(self, ticker: str):
+        '''
+
+            Yields a ticker's bars with their signal columns, one chunk at a time
+
+            :param ticker: Ticker being processed
+            :type ticker: str
+            :returns: Generator of frames covering consecutive, non-overlapping ranges of rows
+            :rtype: Iterator[pd.DataFrame]
+
+        '''
+        columns = self.store.columns(ticker)
+        n = len(columns["Date"])
+        for start in range(0, n, self.chunk_rows):
+            lo = max(0, start - self.warm_up)
+            stop = min(n, start + self.chunk_rows)
+            frame = pd.DataFrame({col: np.array(columns[col][lo:stop]) for col in COLUMNS},
+                                 index=pd.DatetimeIndex(np.array(columns["Date"][lo:stop]).astype("datetime64[ns]")))
+            self.signals(frame)
+            yield frame.iloc[start - lo:]
+
+    def iter_backtest(self, ticker: str, capital: float):
+        '''
+
+            Yields a ticker's chunks with the capital of compounding Rets, carried across chunk boundaries
+
+            :param ticker: Ticker being backtested
+            :type ticker: str
+            :param capital: Capital at the start of the history
+            :type capital: float
+            :returns: Generator of frames with an added Capital column
+            :rtype: Iterator[pd.DataFrame]
+
+        '''
+        carry = capital
+        for chunk in self.iter_chunks(ticker):
+            #* The carried capital leads the product, so chunked and in-memory runs multiply in the same order
+            chunk = chunk.assign(Capital=np.cumprod(np.concatenate([[carry], 1 + chunk["Rets"].to_numpy()]))[1:])
+            carry = chunk["Capital"].iloc[-1]
+            yield chunk
+
+    def run(self, tickers: list, capital: float = 1.0, sink=None, profiler=None) -> pd.DataFrame:
+        '''
+
+            Streams every ticker and aggregates the equally weighted daily return as in main.ipynb
+
+            :param tickers: Tickers being processed
+            :type tickers: list[str]
+            :param capital: Capital at the start of each ticker's history
+            :type capital: float
+            :param sink: Callable receiving (ticker, chunk) for every processed chunk, such as a writer to disk, or None
+            :type sink: callable or None
+            :param profiler: Profiler sampling the chunks of every ticker as one stage and one iteration, or None
+            :type profiler: MemoryProfile.MemoryProfiler or None
+            :returns: Daily Total, Count and Return of the strategy across tickers
+            :rtype: pd.DataFrame
+
+        '''
+        total = pd.Series(dtype=np.float64)
+        count = pd.Series(dtype=np.float64)
+        for ticker in tickers:
+            try:
+                with profiler.stage("chunks", ticker) if profiler is not None else nullcontext():
+                    for chunk in self.iter_backtest(ticker, capital):
+                        if sink is not None:
+                            sink(ticker, chunk)
+                        rets = chunk["Rets"].fillna(0)
+                        total = total.add(rets, fill_value=0)
+                        count = count.add((rets != 0).astype(np.float64), fill_value=0)
+            except MemoryError:
+                raise
+            except Exception as err:
+                print(err)
+            if profiler is not None:
+                profiler.end_iteration(ticker)
+
+        master = pd.DataFrame({"Total": total, "Count": count})
+        master["Return"] = master["Total"] / master["Count"]
+        return master
+
+
+def chunk_peak(rows: int, signals=Algo.MinhsAlgo.signals, seed: int = 0) -> int:
+    '''
+
+        Peak of traced memory while a chunk of random bars is built and its signals computed
+
+        :param rows: Length of the chunk
+        :type rows: int
+        :param signals: Function adding the signal columns to a frame of bars, as given to ChunkedPipeline
+        :type signals: callable
+        :param seed: Seed of the random bars
+        :type seed: int
+        :returns: Bytes allocated at the peak, above what was allocated before the chunk
+        :rtype: int
+
+    '''
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    columns = {"Open": close * np.exp(rng.normal(0, 0.01, rows)), "High": close * 1.01, "Low": close * 0.99,
+               "Close": close, "Volume": rng.integers(1000, 100000, rows).astype(np.float64)}
+    dates = np.datetime64("1970-01-01", "ns") + np.arange(rows) * np.timedelta64(1, "D")
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        #* The columns are copied in as iter_chunks copies them out of the memory mapped store
+        frame = pd.DataFrame({col: np.array(values) for col, values in columns.items()}, index=pd.DatetimeIndex(dates))
+        signals(frame)
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        if started:
+            tracemalloc.stop()
+
+
+def measure_chunk_bytes(signals=Algo.MinhsAlgo.signals, rows: tuple = (1000, 3000, 10000, 20000, 80000)) -> tuple:
+    '''
+
+        Measures the memory a chunk holds while it is processed, from its peak at several chunk lengths
+
+        :param signals: Function adding the signal columns to a frame of bars, as given to ChunkedPipeline
+        :type signals: callable
+        :param rows: Increasing chunk lengths, the last two long enough for the per row cost to dominate
+        :type rows: tuple[int]
+        :returns: Bytes per row, from the growth of the peak between the last two lengths, and the most bytes any length holds beyond them
+        :rtype: tuple[int]
+
+    '''
+    #* A first chunk only warms up lazy imports and caches, which would otherwise be counted as chunk memory
+    chunk_peak(rows[0], signals)
+    peaks = [chunk_peak(n, signals) for n in rows]
+    per_row = (peaks[-1] - peaks[-2]) / (rows[-1] - rows[-2])
+    return int(np.ceil(per_row)), int(max(max(peak - per_row * n for n, peak in zip(rows, peaks)), 0))
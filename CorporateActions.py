@@ -0,0 +1,254 @@
+import os
+import numpy as np
+import pandas as pd
+from AtomicFile import atomic_write
+from MinuteStore import BarAggregator, MinuteStore, NS_PER_DAY
+
+#> One record per ex-date: Split is the number of new shares per old share, Dividend the cash paid per old share
+ACTION_DTYPE = np.dtype([("Date", "<i8"), ("Split", "<f8"), ("Dividend", "<f8")])
+PRICE_COLUMNS = ["Open", "High", "Low", "Close"]
+
+
+class ActionTable:
+
+    def __init__(self, path: str):
+        '''
+
+            On-disk table of the splits and dividends of every ticker
+
+            Each ticker's actions are a small record array sorted by ex-date, with a version incremented
+            whenever they change, so adjusted prices and the indicators computed from them can be
+            invalidated one ticker at a time.
+
+            :param path: Directory holding the table, created if it does not exist
+            :type path: str
+
+        '''
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+    def _filestring(self, ticker: str, name: str) -> str:
+        return os.path.join(self.path, ticker, name)
+
+    def version(self, ticker: str) -> int:
+        '''
+
+            :returns: Version of a ticker's actions, 0 if none were ever written
+            :rtype: int
+
+        '''
+        try:
+            with open(self._filestring(ticker, "VERSION"), "r") as pfile:
+                return int(pfile.read())
+        except FileNotFoundError:
+            return 0
+
+    def actions(self, ticker: str) -> np.ndarray:
+        '''
+
+            :returns: Actions of a ticker sorted by ex-date, empty if it has none
+            :rtype: np.ndarray of ACTION_DTYPE
+
+        '''
+        if self.version(ticker) == 0:
+            return np.empty(0, dtype=ACTION_DTYPE)
+        return np.load(self._filestring(ticker, "actions.npy"))
+
+    def write(self, actions: pd.DataFrame) -> list:
+        '''
+
+            Merges new actions into the table, an action on the same ticker and ex-date being replaced
+
+            Tickers whose actions end up unchanged keep their version, so re-sending a full action
+            history only invalidates the tickers that actually had a new action.
+
+            :param actions: One row per action with Ticker, Date, Split (1 when none) and Dividend (0 when none) columns
+            :type actions: pd.DataFrame
+            :returns: Tickers whose actions changed
+            :rtype: list[str]
+
+        '''
+        changed = []
+        for ticker, group in actions.groupby("Ticker", sort=True):
+            new = np.empty(len(group.index), dtype=ACTION_DTYPE)
+            new["Date"] = pd.DatetimeIndex(group["Date"]).normalize().values.astype("datetime64[ns]").astype(np.int64)
+            new["Split"] = group["Split"].to_numpy(dtype=np.float64) if "Split" in group else 1.0
+            new["Dividend"] = group["Dividend"].to_numpy(dtype=np.float64) if "Dividend" in group else 0.0
+
+            old = self.actions(ticker)
+            merged = np.concatenate([old[~np.isin(old["Date"], new["Date"])], new])
+            merged = merged[np.argsort(merged["Date"], kind="stable")]
+            if np.array_equal(merged, old):
+                continue
+
+            os.makedirs(os.path.join(self.path, ticker), exist_ok=True)
+            with atomic_write(self._filestring(ticker, "actions.npy")) as pfile:
+                np.save(pfile, merged)
+            version = self.version(ticker) + 1
+            with open(self._filestring(ticker, "VERSION"), "w") as pfile:
+                pfile.write(str(version))
+            changed.append(ticker)
+        return changed
+
+    def add(self, ticker: str, date, split: float = 1.0, dividend: float = 0.0) -> bool:
+        '''
+
+            Records a single action
+
+            :returns: Whether the ticker's actions changed
+            :rtype: bool
+
+        '''
+        frame = pd.DataFrame({"Ticker": [ticker], "Date": [pd.Timestamp(date)], "Split": [split], "Dividend": [dividend]})
+        return len(self.write(frame)) > 0
+
+
+def adjustment_factors(actions: np.ndarray, dates: np.ndarray, closes: np.ndarray) -> tuple:
+    '''
+
+        Cumulative adjustment factors as step functions of time
+
+        A split of ratio r divides every earlier price by r and multiplies every earlier volume by r;
+        a dividend D multiplies every earlier price by 1 - D / c, c being the last raw close before the
+        ex-date, as Yahoo's adjusted prices do. The factor of a timestamp t is the product of the
+        factors of every ex-date after t.
+
+        :param actions: Actions of a ticker sorted by ex-date
+        :type actions: np.ndarray of ACTION_DTYPE
+        :param dates: Raw daily bar timestamps as int64 nanoseconds, sorted
+        :type dates: np.ndarray
+        :param closes: Raw daily closes
+        :type closes: np.ndarray
+        :returns: Ex-dates, price factors and volume factors, factor k applying to timestamps before ex-date k and on or after ex-date k - 1
+        :rtype: tuple[np.ndarray]
+
+    '''
+    price = 1 / actions["Split"]
+    volume = actions["Split"].copy()
+
+    #* Dividends before the first bar have no close to be measured against and are left out
+    previous = np.searchsorted(dates, actions["Date"], side="left") - 1
+    paid = (actions["Dividend"] != 0) & (previous >= 0)
+    price[paid] *= 1 - actions["Dividend"][paid] / closes[previous[paid]]
+
+    #* Suffix products, with a final factor of 1 for timestamps after the last ex-date
+    price_factors = np.append(np.cumprod(price[::-1])[::-1], 1.0)
+    volume_factors = np.append(np.cumprod(volume[::-1])[::-1], 1.0)
+    return actions["Date"], price_factors, volume_factors
+
+
+class AdjustedBars(BarAggregator):
+
+    def __init__(self, store: MinuteStore, actions: ActionTable, session=None):
+        '''
+
+            Serves split and dividend adjusted bars from raw bars and an action table
+
+            Raw bars are never rewritten: adjustments are applied on read by multiplying prices and
+            volumes with cumulative factors. Adjusted bars and indicators are cached per ticker and
+            recomputed only once the ticker's raw bars or actions change. Usable as the bar_source
+            of an Algo.
+
+            :param store: Store of raw bars, daily bars being stored at midnight
+            :type store: MinuteStore
+            :param actions: Splits and dividends of the stored tickers
+            :type actions: ActionTable
+            :param session: Session of intraday bars, None (the default) for stores of daily bars
+            :type session: tuple[str] or None
+
+        '''
+        super().__init__(store, session)
+        self.actions = actions
+        self._factors = {}
+        self._adjusted = {}
+        self._indicators = {}
+
+    def _versions(self, ticker: str) -> tuple:
+        return (self.store.version(ticker), self.actions.version(ticker))
+
+    def factors(self, ticker: str) -> tuple:
+        '''
+
+            :returns: Ex-dates, price factors and volume factors of a ticker, as adjustment_factors
+            :rtype: tuple[np.ndarray]
+
+        '''
+        versions = self._versions(ticker)
+        if ticker not in self._factors or self._factors[ticker][0] != versions:
+            daily = super().bars(ticker, "1d")
+            dates = daily.index.values.astype("datetime64[ns]").astype(np.int64)
+            self._factors[ticker] = (versions, adjustment_factors(self.actions.actions(ticker), dates, daily["Close"].to_numpy()))
+        return self._factors[ticker][1]
+
+    def bars(self, ticker: str, rule: str = "1d", session="default") -> pd.DataFrame:
+        '''
+
+            Aggregates a ticker's raw bars and adjusts them for splits and dividends
+
+            :param ticker: Ticker of the bars
+            :type ticker: str
+            :param rule: "Nmin", "Nh", "1d" or "1wk"
+            :type rule: str
+            :param session: Session overriding the aggregator's own, None for every minute
+            :type session: tuple[str] or None
+            :returns: Adjusted OHLCV bars labelled by the start of each period
+            :rtype: pd.DataFrame
+
+        '''
+        key = (ticker, rule, session)
+        versions = self._versions(ticker)
+        if key in self._adjusted and self._adjusted[key][0] == versions:
+            return self._adjusted[key][1]
+
+        ex_dates, price_factors, volume_factors = self.factors(ticker)
+        raw = super().bars(ticker, rule, session)
+        #* A bar is adjusted by every ex-date after the day it starts on
+        days = raw.index.values.astype("datetime64[ns]").astype(np.int64) // NS_PER_DAY * NS_PER_DAY
+        step = np.searchsorted(ex_dates, days, side="right")
+
+        adjusted = raw.copy()
+        for col in PRICE_COLUMNS:
+            adjusted[col] = raw[col].to_numpy() * price_factors[step]
+        adjusted["Volume"] = raw["Volume"].to_numpy() * volume_factors[step]
+        self._adjusted[key] = (versions, adjusted)
+        return adjusted
+
+    def indicators(self, ticker: str, signals) -> pd.DataFrame:
+        '''
+
+            Adjusted daily bars with the columns added by a signal function, cached until the ticker changes
+
+            :param ticker: Ticker of the bars
+            :type ticker: str
+            :param signals: Function adding indicator and signal columns to a frame in place, such as MinhsAlgo.signals
+            :type signals: function
+            :returns: Daily bars and indicators
+            :rtype: pd.DataFrame
+
+        '''
+        key = (ticker, signals)
+        versions = self._versions(ticker)
+        if key not in self._indicators or self._indicators[key][0] != versions:
+            frame = self.bars(ticker, "1d").copy()
+            signals(frame)
+            self._indicators[key] = (versions, frame)
+        return self._indicators[key][1]
+
+    def refresh(self, tickers: list, signals) -> list:
+        '''
+
+            Brings the cached indicators of many tickers up to date, recomputing only the stale ones
+
+            :param tickers: Tickers being refreshed
+            :type tickers: list[str]
+            :param signals: Function adding indicator and signal columns, as in indicators
+            :type signals: function
+            :returns: Tickers whose indicators were recomputed
+            :rtype: list[str]
+
+        '''
+        stale = [ticker for ticker in tickers
+                 if (ticker, signals) not in self._indicators or self._indicators[(ticker, signals)][0] != self._versions(ticker)]
+        for ticker in stale:
+            self.indicators(ticker, signals)
+        return stale
@@ -0,0 +1,370 @@
+import os
+import json
+import html
+import time
+import queue
+import threading
+from contextlib import contextmanager
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+import numpy as np
+import pandas as pd
+from AtomicFile import atomic_write
+
+#> Columns shown on the leaderboard when the results carry them, the first one ranking the tickers
+LEADERBOARD = ["Sharpe Ratio", "Return", "Final Capital", "Max Drawdown", "Positions Taken"]
+
+PAGE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta http-equiv="refresh" content="{refresh}">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; margin-bottom: 2em; }}
+th, td {{ border: 1px solid #ccc; padding: 0.2em 0.6em; text-align: right; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+{body}
+</body>
+</html>
+'''
+
+
+def _jsonable(value):
+    '''
+
+        Converts numpy scalars and non-finite floats so the state can be written as strict JSON
+
+    '''
+    if isinstance(value, dict):
+        return {str(key): _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, (np.integer, np.bool_)):
+        return value.item()
+    if isinstance(value, (float, np.floating)):
+        return float(value) if np.isfinite(value) else None
+    return value
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+
+    def log_message(self, *args) -> None:
+        #* Browsers reload the page every few seconds, which would flood the runner's output
+        pass
+
+
+class Dashboard:
+
+    def __init__(self, path: str, refresh: float = 2.0, top: int = 25, metric: str = "Sharpe Ratio",
+                 title: str = "Sweep", port=None, host: str = "127.0.0.1"):
+        '''
+
+            Live state of a sweep, rewritten as state.json and index.html while the sweep runs
+
+            Runners post events with post, which only puts them on an in-process queue, so monitoring
+            never blocks a worker. A background thread drains the queue, aggregates throughput, stage
+            timings, errors and a leaderboard of the results, and rewrites both files every refresh
+            seconds. The files are replaced atomically, so a browser or another process never reads
+            half a file. With a port, the directory is also served over HTTP.
+
+            Events are "start" (total, optional), "stage" (ticker, stage, seconds), "result"
+            (ticker, stats dict, seconds), "done" (ticker), "error" (ticker, error) and "finish". A
+            sweep running a ticker with several params also posts the task's ID, and params with its
+            result, so results are kept by ID, defaulting to the ticker, and every run is ranked.
+            Errors are kept by ticker as posted, but only the tasks given up on count as failed: an
+            error posted with given_up False is retried, and the task is completed only if it
+            succeeds. A "done" ticker counts as completed only if none of its stages failed. The
+            stage and end_iteration methods mirror MemoryProfile.MemoryProfiler, so a dashboard can
+            be passed as the profiler of ChunkedPipeline.run.
+
+            :param path: Directory the files are written to, created if missing
+            :type path: str
+            :param refresh: Seconds between rewrites of the files, also the reload period of the page
+            :type refresh: float
+            :param top: Number of tickers shown on the leaderboard
+            :type top: int
+            :param metric: Result statistic the leaderboard is ranked by, highest first
+            :type metric: str
+            :param title: Title of the page
+            :type title: str
+            :param port: Port the directory is served on, 0 picking a free one, or None to only write the files
+            :type port: int or None
+            :param host: Address the server listens on
+            :type host: str
+
+        '''
+        self.path = path
+        self.refresh = refresh
+        self.top = top
+        self.metric = metric
+        self.title = title
+        os.makedirs(self.path, exist_ok=True)
+
+        self.total = None
+        self.started = None
+        self.finished = None
+        self.completed = 0
+        self.results = {}
+        self.errors = {}
+        #> IDs, or tickers, of the tasks given up on
+        self.failed = set()
+        self.stages = {}
+        #* Completion times of the last results, for the recent throughput
+        self._recent = []
+
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._server = None
+        self.address = None
+        if port is not None:
+            self._server = ThreadingHTTPServer((host, port), partial(_QuietHandler, directory=self.path))
+            self.address = self._server.server_address
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def start(self) -> None:
+        '''
+
+            Starts draining events in the background, and serving the files if a port was given
+
+            :return: No return
+            :rtype: None
+
+        '''
+        self.write()
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+        if self._server is not None:
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        '''
+
+            Applies the events still queued, writes the files a last time and stops the server
+
+            :return: No return
+            :rtype: None
+
+        '''
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        else:
+            self._apply_queued()
+        self.write()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def post(self, event: str, **fields) -> None:
+        '''
+
+            Queues an event without waiting for it to be applied
+
+            :param event: One of "start", "stage", "result", "done", "error" or "finish"
+            :type event: str
+            :return: No return
+            :rtype: None
+
+        '''
+        self._queue.put((event, time.time(), fields))
+
+    @contextmanager
+    def stage(self, name: str, ticker=None):
+        '''
+
+            Times the block run inside the context as a stage, and posts its exception as an error
+
+            :param name: Name of the stage
+            :type name: str
+            :param ticker: Ticker the stage is run for, or None
+
+        '''
+        start = time.perf_counter()
+        try:
+            yield self
+        except Exception as err:
+            self.post("error", ticker=ticker, error=repr(err), stage=name)
+            raise
+        finally:
+            self.post("stage", ticker=ticker, stage=name, seconds=time.perf_counter() - start)
+
+    def end_iteration(self, ticker=None) -> None:
+        '''
+
+            Counts a ticker as done, for runners that report no statistics, unless it posted an error
+
+        '''
+        self.post("done", ticker=ticker)
+
+    def _apply(self, event: str, stamp: float, fields: dict) -> None:
+        if self.started is None:
+            self.started = stamp
+        if event == "start":
+            self.started = stamp
+            self.total = fields.get("total", self.total)
+        elif event == "stage":
+            timing = self.stages.setdefault(fields["stage"], {"Count": 0, "Total Seconds": 0.0, "Max Seconds": 0.0})
+            timing["Count"] += 1
+            timing["Total Seconds"] += fields["seconds"]
+            timing["Max Seconds"] = max(timing["Max Seconds"], fields["seconds"])
+        elif event == "result":
+            self.completed += 1
+            self._recent = self._recent[-99:] + [stamp]
+            self.failed.discard(fields.get("ID", str(fields["ticker"])))
+            if fields.get("stats"):
+                params = fields.get("params")
+                self.results[fields.get("ID", fields["ticker"])] = dict(
+                    fields["stats"], Ticker=fields["ticker"], Seconds=fields.get("seconds"),
+                    Params=json.dumps(params, sort_keys=True) if params is not None else None)
+        elif event == "done":
+            #* A stage that raised was posted as a final error, so its iteration is already counted as failed
+            if str(fields["ticker"]) not in self.failed:
+                self.completed += 1
+                self._recent = self._recent[-99:] + [stamp]
+        elif event == "error":
+            self.errors.setdefault(str(fields["ticker"]), []).append(
+                {key: value for key, value in fields.items() if key != "ticker"})
+            #* Runners without retries, like the stage context, post no given_up flag and every error is final
+            if fields.get("given_up", True):
+                self.failed.add(fields.get("ID", str(fields["ticker"])))
+        elif event == "finish":
+            self.finished = stamp
+        else:
+            raise ValueError("Unknown event " + str(event))
+
+    def _apply_queued(self) -> bool:
+        '''
+
+            Applies every queued event
+
+            :returns: Whether the sentinel queued by close was met
+            :rtype: bool
+
+        '''
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return False
+            if item is None:
+                return True
+            self._apply(*item)
+
+    def _drain(self) -> None:
+        deadline = time.monotonic() + self.refresh
+        while True:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                item = ()
+            if item is None:
+                return
+            #? A malformed event or a full disk must not kill the thread, the next rewrite may succeed
+            try:
+                if item:
+                    self._apply(*item)
+                if time.monotonic() >= deadline:
+                    deadline = time.monotonic() + self.refresh
+                    self.write()
+            except Exception as err:
+                print(err)
+
+    def leaderboard(self) -> pd.DataFrame:
+        '''
+
+            :returns: The top results by metric, keyed by ID, with their ticker, params and the LEADERBOARD statistics they carry
+            :rtype: pd.DataFrame
+
+        '''
+        frame = pd.DataFrame.from_dict(self.results, orient="index")
+        if not len(frame.index):
+            return frame
+        columns = ["Ticker", "Params", self.metric] + [name for name in LEADERBOARD + ["Seconds"] if name != self.metric]
+        frame = frame[[name for name in columns if name in frame.columns]]
+        if self.metric in frame.columns:
+            frame = frame.sort_values(self.metric, ascending=False, na_position="last")
+        return frame.head(self.top)
+
+    def state(self) -> dict:
+        '''
+
+            Aggregated state of the sweep, as written to state.json
+
+            :returns: Progress, tasks given up, throughput in tickers per second overall and over the last 100 results, stage timings, errors and leaderboard
+            :rtype: dict
+
+        '''
+        now = self.finished if self.finished is not None else time.time()
+        elapsed = now - self.started if self.started is not None else 0.0
+        recent = self._recent
+        stages = {name: dict(timing, **{"Mean Seconds": timing["Total Seconds"] / timing["Count"]})
+                  for name, timing in self.stages.items()}
+        leaderboard = self.leaderboard()
+        return _jsonable({
+            "Title": self.title,
+            "Updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "Finished": self.finished is not None,
+            "Total": self.total,
+            "Completed": self.completed,
+            "Failed": len(self.failed),
+            "Elapsed Seconds": elapsed,
+            "Throughput": self.completed / elapsed if elapsed > 0 else None,
+            "Recent Throughput": (len(recent) - 1) / (recent[-1] - recent[0]) if len(recent) > 1 and recent[-1] > recent[0] else None,
+            "Stages": stages,
+            "Errors": self.errors,
+            "Leaderboard": list(leaderboard.to_dict(orient="index").values()),
+        })
+
+    def html(self, state=None) -> str:
+        '''
+
+            Renders the state as a page reloading itself every refresh seconds
+
+        '''
+        state = state or self.state()
+        progress = str(state["Completed"]) + ("" if state["Total"] is None else " / " + str(state["Total"]))
+        summary = pd.DataFrame({"Value": [progress, state["Failed"], state["Elapsed Seconds"], state["Throughput"],
+                                          state["Recent Throughput"], "Finished" if state["Finished"] else "Running"]},
+                               index=["Tickers done", "Tickers given up", "Elapsed seconds", "Tickers per second",
+                                      "Tickers per second, last 100", "Status"])
+        body = ["<p>Updated " + state["Updated"] + "</p>", summary.to_html(na_rep="")]
+        if state["Stages"]:
+            body += ["<h2>Stages</h2>", pd.DataFrame.from_dict(state["Stages"], orient="index").to_html(float_format="%.3f")]
+        if state["Leaderboard"]:
+            body += ["<h2>Leaderboard</h2>", pd.DataFrame(state["Leaderboard"]).to_html(index=False, float_format="%.4f", na_rep="")]
+        if state["Errors"]:
+            errors = pd.DataFrame([{"Ticker": ticker, "Errors": len(errs), "Last Error": errs[-1]["error"]}
+                                   for ticker, errs in state["Errors"].items()])
+            body += ["<h2>Errors</h2>", errors.to_html(index=False)]
+        return PAGE.format(refresh=max(int(round(self.refresh)), 1), title=html.escape(self.title), body="\n".join(body))
+
+    def _replace(self, name: str, text: str) -> None:
+        #* Browsers and other processes see either the old or the new file
+        with atomic_write(os.path.join(self.path, name), "w") as pfile:
+            pfile.write(text)
+
+    def write(self) -> None:
+        '''
+
+            Rewrites state.json and index.html from the events applied so far
+
+            :return: No return
+            :rtype: None
+
+        '''
+        state = self.state()
+        self._replace("state.json", json.dumps(state, indent=1))
+        self._replace("index.html", self.html(state))
@@ -0,0 +1,411 @@
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import Algo
+import Backtest
+from ChunkedPipeline import ChunkedPipeline, BYTES_PER_ROW, FIXED_BYTES
+from MinuteStore import MinuteStore
+from TradingCalendar import TradingCalendar
+
+#> Rows shown on each side of the first diverging bar
+CONTEXT = 3
+
+
+def random_bars(n: int, seed: int) -> pd.DataFrame:
+    '''
+
+        Random walk daily OHLCV bars ending today, with opens gapping away from the previous close
+
+        :param n: Number of bars
+        :type n: int
+        :param seed: Seed of the random number generator
+        :type seed: int
+        :returns: Bars indexed by business day
+        :rtype: pd.DataFrame
+
+    '''
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, n)))
+    opens = close * np.exp(rng.normal(0, 0.02, n))
+    return pd.DataFrame({"Open": opens, "High": np.maximum(opens, close) * (1 + 0.01 * rng.random(n)),
+                         "Low": np.minimum(opens, close) * (1 - 0.01 * rng.random(n)), "Close": close,
+                         "Volume": rng.integers(1000, 100000, n).astype(np.float64)},
+                        index=pd.bdate_range(end=pd.to_datetime("today").normalize(), periods=n))
+
+
+def random_minutes(n_days: int, seed: int, start: str = "2020-01-02", session: int = 390) -> pd.DataFrame:
+    '''
+
+        Random walk minute bars of regular sessions opening at 9:30, with gaps between sessions
+
+        :param n_days: Number of sessions
+        :type n_days: int
+        :param seed: Seed of the random number generator
+        :type seed: int
+        :param start: First session
+        :type start: str
+        :param session: Number of bars in every session
+        :type session: int
+        :returns: Bars indexed by exchange local minute
+        :rtype: pd.DataFrame
+
+    '''
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range(start, periods=n_days)
+    index = pd.DatetimeIndex((days.values[:, None] + np.timedelta64(570, "m") + np.arange(session) * np.timedelta64(1, "m")).ravel())
+    steps = rng.normal(0, 0.001, (n_days, session))
+    steps[:, 0] += rng.normal(0, 0.02, n_days)
+    close = 100 * np.exp(np.cumsum(steps.ravel()))
+    opens = np.concatenate([[100.0], close[:-1]])
+    return pd.DataFrame({"Open": opens, "High": np.maximum(opens, close) * (1 + 0.0005 * rng.random(len(close))),
+                         "Low": np.minimum(opens, close) * (1 - 0.0005 * rng.random(len(close))), "Close": close,
+                         "Volume": rng.integers(100, 10000, len(close)).astype(np.float64)}, index=index)
+
+
+def random_positions(n: int, seed: int, mean_hold: float = 5.0) -> np.ndarray:
+    '''
+
+        Random sequence of positions held for geometrically distributed runs of bars
+
+        :param n: Number of bars
+        :type n: int
+        :param seed: Seed of the random number generator
+        :type seed: int
+        :param mean_hold: Average number of bars a position is held
+        :type mean_hold: float
+        :returns: Position code of every bar, 1 long, -1 short and 0 neutral, starting neutral
+        :rtype: np.ndarray
+
+    '''
+    rng = np.random.default_rng(seed)
+    runs = rng.geometric(1 / mean_hold, n)
+    codes = np.repeat(rng.integers(-1, 2, n).astype(np.int8), runs)[:n]
+    codes[0] = 0
+    return codes
+
+
+class ReplayAlgo(Algo.Algo):
+
+    def __init__(self, frame: pd.DataFrame, codes: np.ndarray):
+        '''
+
+            Algorithm replaying a given sequence of positions, to drive a Backtest without any strategy
+
+            :param frame: Daily bars the backtest runs over
+            :type frame: pd.DataFrame
+            :param codes: Position of every bar, 1 long, -1 short and 0 neutral
+            :type codes: np.ndarray
+
+        '''
+        self.ticker = "REPLAY"
+        self.bar_source = None
+        self.total_price_data = frame
+        self.calendar = TradingCalendar(frame.index)
+        self.codes = np.asarray(codes, dtype=np.int8)
+        self.is_long = False
+        self.is_short = False
+        self.entry = 0
+        self.set_highest()
+        self.set_lowest()
+
+    def set_highest(self) -> None:
+        self.highest = -10000
+
+    def set_lowest(self) -> None:
+        self.lowest = 10000
+
+    def __name__(self) -> str:
+        return "ReplayAlgo"
+
+    def run_algo(self, day=None) -> None:
+        code = self.codes[self.calendar.get_loc(day)]
+        self.is_long = code == 1
+        self.is_short = code == -1
+
+    def positions(self, start: int = 1) -> tuple:
+        is_long, is_short = self.codes == 1, self.codes == -1
+        is_long[:start] = False
+        is_short[:start] = False
+        return is_long, is_short
+
+
+def offline_algo(cls, frame: pd.DataFrame, precision=None):
+    '''
+
+        Builds an algorithm over given bars without downloading them
+
+        :param cls: Subclass of Algo being built, such as Algo.BollingerBands
+        :type cls: type
+        :param frame: Daily bars standing in for the downloaded history
+        :type frame: pd.DataFrame
+        :param precision: Storage types applied to the bars, as by Algo's constructor, defaults to Precision.FULL
+        :type precision: Precision.PrecisionMode or None
+        :returns: Algorithm in the state its constructor leaves it in
+        :rtype: Algo.Algo
+
+    '''
+    algo = cls.__new__(cls)
+    algo.ticker = "TEST"
+    algo.bar_source = None
+    algo.precision = Algo.Precision.FULL if precision is None else precision
+    algo.signal_masks = {}
+    algo.price_data = pd.Series(data=[0])
+    algo.is_long = False
+    algo.is_short = False
+    algo.entry = 0
+    algo.total_price_data = frame
+    if algo.precision is not Algo.Precision.FULL:
+        algo.total_price_data = Algo.Precision.compact_prices(frame, algo.precision)
+    algo.calendar = TradingCalendar(frame.index)
+    algo.set_highest()
+    algo.set_lowest()
+    return algo
+
+
+def backtest_case(bars: pd.DataFrame, seed: int) -> tuple:
+    '''
+
+        Backtest.run_backtest against the simulate kernel of run_backtest_vectorized, on random positions and sizes
+
+    '''
+    algo = ReplayAlgo(bars, random_positions(len(bars.index), seed))
+    #* Years back reaching the second bar, so the backtest covers the whole history
+    years_back = (pd.to_datetime("today").normalize() - bars.index[1]).days / 365
+    reference, fast = Backtest.Backtest(algo, 100000.0, years_back), Backtest.Backtest(algo, 100000.0, years_back)
+    #* Odd seeds size every entry with a random fraction instead of going all in
+    sizing = None
+    if seed % 2:
+        sizing = np.random.default_rng(seed).uniform(0.1, 1.0, len(reference.hist_positions.index))
+
+    def run_reference():
+        reference.run_backtest(sizing=sizing)
+        return reference.hist_positions
+
+    def run_fast():
+        fast.run_backtest_vectorized(sizing=sizing)
+        return fast.hist_positions
+
+    return run_reference, run_fast
+
+
+def bollinger_case(bars: pd.DataFrame, seed: int) -> tuple:
+    '''
+
+        BollingerBands.run_algo called on every day against BollingerBands.positions
+
+    '''
+    start = 21
+
+    def run_reference():
+        algo = offline_algo(Algo.BollingerBands, bars)
+        states = np.zeros((len(bars.index), 2), dtype=bool)
+        for row in range(start, len(bars.index)):
+            algo.run_algo(bars.index[row])
+            states[row] = algo.get_long(), algo.get_short()
+        return pd.DataFrame(states, index=bars.index, columns=["Long", "Short"])
+
+    def run_fast():
+        is_long, is_short = offline_algo(Algo.BollingerBands, bars).positions(start=start)
+        return pd.DataFrame({"Long": is_long, "Short": is_short}, index=bars.index)
+
+    return run_reference, run_fast
+
+
+def reference_minhs(bars: pd.DataFrame) -> pd.DataFrame:
+    '''
+
+        MinhsAlgo's signals computed bar by bar from the definitions in main.ipynb
+
+        :returns: Signal and return columns of MinhsAlgo.SPEC, one row per bar
+        :rtype: pd.DataFrame
+
+    '''
+    opens, high, low, close = [bars[col].to_numpy(dtype=np.float64) for col in ["Open", "High", "Low", "Close"]]
+    rows = []
+    for i in range(len(bars.index)):
+        stdev = np.std(close[i - 89:i + 1], ddof=1) if i >= 89 else np.nan
+        average = np.mean(close[i - 19:i + 1]) if i >= 19 else np.nan
+        buy1 = i > 0 and (opens[i] - low[i - 1]) < -stdev
+        buy2 = opens[i] > average
+        sell1 = i > 0 and (opens[i] - high[i - 1]) > stdev
+        sell2 = opens[i] < average
+        pct_change = (close[i] - opens[i]) / opens[i]
+        buy, sell = buy1 and buy2, sell1 and sell2
+        rets = -pct_change if sell else (pct_change if buy else 0.0)
+        rows.append([stdev, average, buy1, buy2, buy, sell1, sell2, sell, pct_change, rets])
+    frame = pd.DataFrame(rows, index=bars.index, columns=list(Algo.MinhsAlgo.SPEC.outputs))
+    return frame.astype({col: bool for col in ["Buy1", "Buy2", "BUY", "Sell1", "Sell2", "SELL"]})
+
+
+def minhs_case(bars: pd.DataFrame, seed: int) -> tuple:
+    '''
+
+        The bar by bar definition of MinhsAlgo's signals against MinhsAlgo.signals
+
+    '''
+    def run_fast():
+        frame = bars.copy()
+        Algo.MinhsAlgo.signals(frame)
+        return frame[list(Algo.MinhsAlgo.SPEC.outputs)]
+
+    return lambda: reference_minhs(bars), run_fast
+
+
+def chunked_case(bars: pd.DataFrame, seed: int) -> tuple:
+    '''
+
+        In-memory signals and compounded capital against ChunkedPipeline, with chunks of a quarter of the bars
+
+    '''
+    #* The directory is removed once the fast path ran, or when the case is collected if it never runs
+    directory = tempfile.TemporaryDirectory(prefix="differential")
+    store = MinuteStore(directory.name)
+    store.write("TEST", bars)
+    pipeline = ChunkedPipeline(store, memory_budget=FIXED_BYTES + (len(bars.index) // 4 + Algo.MinhsAlgo.WARM_UP) * BYTES_PER_ROW)
+
+    def run_reference():
+        frame = bars.copy()
+        Algo.MinhsAlgo.signals(frame)
+        frame["Capital"] = np.cumprod(np.concatenate([[1.0], 1 + frame["Rets"].to_numpy()]))[1:]
+        return frame
+
+    def run_fast():
+        try:
+            return pd.concat(list(pipeline.iter_backtest("TEST", 1.0)))
+        finally:
+            directory.cleanup()
+
+    return run_reference, run_fast
+
+
+#> Reference and fast paths compared by run, each built from random bars and a seed
+CASES = {
+    "Backtest": backtest_case,
+    "BollingerBands": bollinger_case,
+    "MinhsAlgo": minhs_case,
+    "ChunkedPipeline": chunked_case,
+}
+
+
+def first_divergence(reference: pd.DataFrame, fast: pd.DataFrame, rtol: float = 0.0, atol: float = 0.0):
+    '''
+
+        Finds the first bar where two runs disagree
+
+        Numbers agree within rtol and atol; other values must be equal. Missing values agree with each other.
+
+        :param reference: Output of the reference implementation, one row per bar
+        :type reference: pd.DataFrame
+        :param fast: Output of the fast implementation, with the same rows and columns
+        :type fast: pd.DataFrame
+        :param rtol: Relative tolerance of numeric columns
+        :type rtol: float
+        :param atol: Absolute tolerance of numeric columns
+        :type atol: float
+        :returns: Row, Date, Column, Reference and Fast values of the first divergence and the bars around it as Context, or None
+        :rtype: dict or None
+
+    '''
+    n = min(len(reference.index), len(fast.index))
+    first, column = (n, "Length") if len(reference.index) != len(fast.index) else (None, None)
+    for col in reference.columns:
+        if col not in fast.columns:
+            first, column = 0, col
+            break
+        a, b = reference[col].to_numpy()[:n], fast[col].to_numpy()[:n]
+        if a.dtype.kind in "fiu" and b.dtype.kind in "fiu":
+            a, b = a.astype(np.float64), b.astype(np.float64)
+            mismatch = ~(np.isclose(a, b, rtol=rtol, atol=atol) | (np.isnan(a) & np.isnan(b)))
+        else:
+            mismatch = np.array([x != y and not (pd.isna(x) and pd.isna(y)) for x, y in zip(a, b)], dtype=bool)
+        if mismatch.any() and (first is None or np.argmax(mismatch) < first):
+            first, column = int(np.argmax(mismatch)), col
+
+    if first is None:
+        return None
+    row = min(first, n - 1)
+    window = slice(max(0, row - CONTEXT), row + CONTEXT + 1)
+    return {
+        "Row": first,
+        "Date": reference.index[row] if n > 0 else None,
+        "Column": column,
+        "Reference": reference[column].iloc[first] if column in reference.columns and first < len(reference.index) else None,
+        "Fast": fast[column].iloc[first] if column in fast.columns and first < len(fast.index) else None,
+        "Context": pd.concat({"Reference": reference.iloc[window], "Fast": fast.iloc[window]}, axis=1),
+    }
+
+
+def compare(case: str, n: int = 500, seed: int = 0, rtol: float = 0.0, atol: float = 0.0) -> dict:
+    '''
+
+        Runs the reference and fast paths of a case on one random history
+
+        :param case: Key of CASES
+        :type case: str
+        :param n: Number of random bars
+        :type n: int
+        :param seed: Seed of the random bars and positions
+        :type seed: int
+        :returns: Timings, speed ratio and first divergence, None when the paths agree on every bar
+        :rtype: dict
+
+    '''
+    run_reference, run_fast = CASES[case](random_bars(n, seed), seed)
+    start = time.perf_counter()
+    reference = run_reference()
+    reference_time = time.perf_counter() - start
+    start = time.perf_counter()
+    fast = run_fast()
+    fast_time = time.perf_counter() - start
+
+    return {
+        "Case": case,
+        "Seed": seed,
+        "Bars": n,
+        "Reference (s)": reference_time,
+        "Fast (s)": fast_time,
+        "Speed Ratio": reference_time / fast_time,
+        "Divergence": first_divergence(reference, fast, rtol, atol),
+    }
+
+
+def run(cases=None, seeds=range(5), n: int = 500, rtol: float = 0.0, atol: float = 0.0) -> list:
+    '''
+
+        Compares every case on every seed
+
+        :param cases: Keys of CASES, defaults to every case
+        :type cases: list[str] or None
+        :returns: Result of compare for every case and seed
+        :rtype: list[dict]
+
+    '''
+    return [compare(case, n, seed, rtol, atol) for case in (cases or list(CASES)) for seed in seeds]
+
+
+def report(results: list) -> str:
+    '''
+
+        Formats comparison results as a markdown table, followed by the context of every divergence
+
+        :returns: Markdown report
+        :rtype: str
+
+    '''
+    lines = ["|**Case**|**Seed**|**Bars**|**Reference (s)**|**Fast (s)**|**Speed Ratio**|**First Divergence**|",
+             "| ----------- | ----------- | ----------- | ----------- | ----------- | ----------- | ----------- |"]
+    details = []
+    for result in results:
+        divergence = result["Divergence"]
+        where = "None" if divergence is None else "bar {} ({}) in {}".format(divergence["Row"], divergence["Date"], divergence["Column"])
+        lines.append("| {} | {} | {} | {:.4f} | {:.4f} | {:.1f} | {} |".format(
+            result["Case"], result["Seed"], result["Bars"], result["Reference (s)"], result["Fast (s)"], result["Speed Ratio"], where))
+        if divergence is not None:
+            details += ["", "{} seed {}: reference {!r}, fast {!r}".format(result["Case"], result["Seed"], divergence["Reference"], divergence["Fast"]),
+                        "", divergence["Context"].to_string()]
+    return "\n".join(lines + details)
+
+
+if __name__ == "__main__":
+    print(report(run()))
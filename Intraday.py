@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+
+SESSION_BARS = 390
+
+
+class IntradayBacktest:
+
+    def __init__(self, minute_data: pd.DataFrame, stdev_window: int = 90, ma_window: int = 20, entry_start: int = 0,
+                 entry_end=None, stop_loss=None, take_profit=None, chunk_days: int = 250, session=("09:30", "16:00")):
+        '''
+
+            Runs the MinhsAlgo signals on minute bars, entering and exiting at any bar of the session
+
+            The daily reference levels are those of MinhsAlgo, the 90 day standard deviation and 20 day
+            moving average of daily closes plus the previous day's low and high, but are taken from the
+            previous session so nothing computed during a session uses that session's close. A position
+            is opened at the close of the first bar inside the entry window that signals, and closed at
+            the first later bar that hits the stop loss or take profit, otherwise at the session close.
+
+            :param minute_data: Minute bars with Open, High, Low, Close columns and a DatetimeIndex
+            :type minute_data: pd.DataFrame
+            :param stdev_window: Window of the rolling standard deviation of daily closes
+            :type stdev_window: int
+            :param ma_window: Window of the moving average of daily closes
+            :type ma_window: int
+            :param entry_start: First bar of the session, counted from zero, at which a position may be opened
+            :type entry_start: int
+            :param entry_end: Bar of the session from which no new position is opened, or None for the whole session
+            :type entry_end: int or None
+            :param stop_loss: Fractional loss that closes the position early, or None
+            :type stop_loss: float or None
+            :param take_profit: Fractional gain that closes the position early, or None
+            :type take_profit: float or None
+            :param chunk_days: Number of sessions evaluated at once, which bounds memory use
+            :type chunk_days: int
+            :param session: Start (inclusive) and end (exclusive) of the trading session as HH:MM, as for MinuteStore.BarAggregator, or None for every minute
+            :type session: tuple[str] or None
+
+        '''
+        #* Exchange local wall time, as MinuteStore.write stores it, so sessions line up with daily frames
+        index = pd.DatetimeIndex(minute_data.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+            minute_data = minute_data.set_axis(index)
+        #* Pre-market and after-hours minutes would otherwise be laid out as bars of the session
+        if session is not None:
+            time_of_day = index - index.normalize()
+            start, end = [pd.Timedelta(t + ":00") for t in session]
+            minute_data = minute_data[(time_of_day >= start) & (time_of_day < end)]
+        self.minute_data = minute_data.sort_index()
+        self.session = session
+        self.stdev_window = stdev_window
+        self.ma_window = ma_window
+        self.entry_start = entry_start
+        self.entry_end = entry_end
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.chunk_days = chunk_days
+
+        #> Sessions and the row at which each one starts in minute_data
+        session_days = self.minute_data.index.normalize()
+        self.days, self.day_starts = np.unique(session_days.values, return_index=True)
+        self.day_ends = np.append(self.day_starts[1:], len(session_days))
+
+    def daily_levels(self) -> pd.DataFrame:
+        '''
+
+            Aggregates the minute bars into daily bars and computes the reference level of every session
+
+            :returns: Daily OHLC along with Stdev, Moving Average, Prev Low and Prev High known before each session opens
+            :rtype: pd.DataFrame
+
+        '''
+        opens = self.minute_data["Open"].to_numpy(dtype=np.float64)
+        closes = self.minute_data["Close"].to_numpy(dtype=np.float64)
+        daily = pd.DataFrame({
+            "Open": opens[self.day_starts],
+            "High": np.maximum.reduceat(self.minute_data["High"].to_numpy(dtype=np.float64), self.day_starts),
+            "Low": np.minimum.reduceat(self.minute_data["Low"].to_numpy(dtype=np.float64), self.day_starts),
+            "Close": closes[self.day_ends - 1],
+        }, index=pd.DatetimeIndex(self.days))
+
+        daily["Stdev"] = daily["Close"].rolling(window=self.stdev_window).std().shift(1)
+        daily["Moving Average"] = daily["Close"].rolling(window=self.ma_window).mean().shift(1)
+        daily["Prev Low"] = daily["Low"].shift(1)
+        daily["Prev High"] = daily["High"].shift(1)
+        return daily
+
+    def run(self) -> pd.DataFrame:
+        '''
+
+            Evaluates every session, one chunk of sessions at a time
+
+            :returns: Daily Side (1 long, -1 short, 0 flat), Entry Bar, Entry, Exit Bar, Exit and Rets
+            :rtype: pd.DataFrame
+
+        '''
+        levels = self.daily_levels()
+        closes = self.minute_data["Close"].to_numpy(dtype=np.float64)
+        chunks = []
+        for start in range(0, len(self.days), self.chunk_days):
+            stop = min(start + self.chunk_days, len(self.days))
+            chunks.append(self._run_chunk(closes, levels.iloc[start:stop], start, stop))
+        return pd.concat(chunks)
+
+    def _session_matrix(self, closes: np.ndarray, start: int, stop: int) -> tuple:
+        '''
+
+            Lays the closes of sessions [start, stop) out as a (sessions x bars) matrix padded with nan
+
+            :returns: Matrix of closes and the number of bars in each session
+            :rtype: tuple[np.ndarray]
+
+        '''
+        lengths = self.day_ends[start:stop] - self.day_starts[start:stop]
+        matrix = np.full((stop - start, max(SESSION_BARS, lengths.max())), np.nan)
+        rows = np.repeat(np.arange(stop - start), lengths)
+        cols = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        matrix[rows, cols] = closes[self.day_starts[start]:self.day_ends[stop - 1]]
+        return matrix, lengths
+
+    def _run_chunk(self, closes: np.ndarray, levels: pd.DataFrame, start: int, stop: int) -> pd.DataFrame:
+        '''
+
+            Vectorized evaluation of the entries and exits of sessions [start, stop)
+
+            :returns: The rows of run's result for these sessions
+            :rtype: pd.DataFrame
+
+        '''
+        prices, lengths = self._session_matrix(closes, start, stop)
+        n_days, n_bars = prices.shape
+        bar = np.arange(n_bars)
+
+        stdev = levels["Stdev"].to_numpy()[:, None]
+        moving_average = levels["Moving Average"].to_numpy()[:, None]
+        with np.errstate(invalid="ignore"):
+            buy = ((prices - levels["Prev Low"].to_numpy()[:, None]) < -stdev) & (prices > moving_average)
+            sell = ((prices - levels["Prev High"].to_numpy()[:, None]) > stdev) & (prices < moving_average)
+
+        #> The last bar of the session only closes positions
+        entry_end = n_bars if self.entry_end is None else self.entry_end
+        window = (bar >= self.entry_start) & (bar < entry_end)
+        signal = (buy | sell) & window & (bar < (lengths - 1)[:, None])
+
+        traded = signal.any(axis=1)
+        rows = np.arange(n_days)
+        entry_bar = np.where(traded, signal.argmax(axis=1), -1)
+        side = np.where(traded, np.where(buy[rows, entry_bar], 1, -1), 0)
+        entry = np.where(traded, prices[rows, entry_bar], np.nan)
+
+        #> Exit at the first bar after entry that hits a threshold, otherwise at the session's last bar
+        exit_bar = np.where(traded, lengths - 1, -1)
+        if self.stop_loss is not None or self.take_profit is not None:
+            with np.errstate(invalid="ignore"):
+                move = side[:, None] * (prices - entry[:, None]) / entry[:, None]
+                hit = np.zeros_like(signal)
+                if self.stop_loss is not None:
+                    hit |= move <= -self.stop_loss
+                if self.take_profit is not None:
+                    hit |= move >= self.take_profit
+            hit &= bar > entry_bar[:, None]
+            early = traded & hit.any(axis=1)
+            exit_bar = np.where(early, hit.argmax(axis=1), exit_bar)
+
+        exit_price = np.where(traded, prices[rows, exit_bar], np.nan)
+        rets = np.where(traded, side * (exit_price - entry) / entry, 0)
+
+        return pd.DataFrame({"Side": side, "Entry Bar": entry_bar, "Entry": entry, "Exit Bar": exit_bar,
+                             "Exit": exit_price, "Rets": rets}, index=levels.index)
+
+
+def run_universe(load_minutes, tickers: list, **kwargs) -> pd.DataFrame:
+    '''
+
+        Runs the intraday backtest over a universe, holding the minute bars of one ticker at a time
+
+        :param load_minutes: Callable returning the minute bars of a ticker
+        :type load_minutes: callable
+        :param tickers: Tickers being backtested
+        :type tickers: list[str]
+        :returns: Daily strategy returns with one column per ticker, as the masterFrame of main.ipynb, empty if every ticker failed
+        :rtype: pd.DataFrame
+
+    '''
+    frames = []
+    for ticker in tickers:
+        try:
+            rets = IntradayBacktest(load_minutes(ticker), **kwargs).run()["Rets"]
+            frames.append(rets.rename(ticker))
+        except Exception as err:
+            print(err)
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, axis=1)
@@ -0,0 +1,264 @@
+import time
+import numpy as np
+
+#> BollingerBands.run_algo looks at 22 closes: a 20 close band for today, one for yesterday, and the two closes themselves
+WINDOW = 22
+BAND = WINDOW - 2
+
+
+class BollingerDecider:
+
+    def __init__(self, tickers: list):
+        '''
+
+            Low-latency Bollinger Bands decisions for many tickers at once
+
+            Mirrors BollingerBands.run_algo but keeps the last 22 closes of every ticker in a
+            preallocated ring buffer and evaluates all tickers with numpy on every tick, so no
+            pandas object and no download is touched between a bar arriving and the decision.
+
+            :param tickers: Tickers being traded, in the column order of the closes fed to on_bar
+            :type tickers: list[str]
+
+        '''
+        self.tickers = list(tickers)
+        n = len(self.tickers)
+
+        #* Every close is written twice, WINDOW apart, so the last WINDOW closes are always a contiguous view
+        self.buffer = np.zeros((n, 2 * WINDOW))
+        self.head = WINDOW - 1
+        self.count = 0
+
+        self.is_long = np.zeros(n, dtype=bool)
+        self.is_short = np.zeros(n, dtype=bool)
+        self.entry = np.zeros(n)
+        self.highest = np.full(n, -10000.0)
+        self.lowest = np.full(n, 10000.0)
+
+        #* Scratch space reused on every tick
+        self._squares = np.empty((n, WINDOW))
+        self._sums = np.empty((n, WINDOW + 1))
+        self._square_sums = np.empty((n, WINDOW + 1))
+        self._mask = np.empty(n, dtype=bool)
+        self._tmp = np.empty(n, dtype=bool)
+
+    @classmethod
+    def from_algo(cls, algo):
+        '''
+
+            Builds a single ticker decider warmed up with an algorithm's history and state
+
+            :param algo: BollingerBands instance whose total_price_data holds at least 22 closes
+            :type algo: BollingerBands
+            :returns: Decider whose next on_bar call continues where the algorithm left off
+            :rtype: BollingerDecider
+
+        '''
+        decider = cls([algo.get_ticker()])
+        for close in np.asarray(algo.total_price_data["Close"], dtype=np.float64).reshape(-1)[-WINDOW:]:
+            decider._push(np.array([close]))
+        decider.is_long[0] = algo.get_long()
+        decider.is_short[0] = algo.get_short()
+        decider.entry[0] = algo.entry
+        decider.highest[0] = algo.highest
+        decider.lowest[0] = algo.lowest
+        return decider
+
+    def _push(self, closes: np.ndarray) -> np.ndarray:
+        '''
+
+            Writes one close per ticker into the ring buffer
+
+            :returns: View of the last WINDOW closes of every ticker, oldest first
+            :rtype: np.ndarray
+
+        '''
+        self.head = (self.head + 1) % WINDOW
+        self.buffer[:, self.head] = closes
+        self.buffer[:, self.head + WINDOW] = closes
+        self.count += 1
+        return self.buffer[:, self.head + 1:self.head + WINDOW + 1]
+
+    def on_bar(self, closes: np.ndarray) -> tuple:
+        '''
+
+            Consumes the latest close of every ticker and updates the long/short decisions
+
+            :param closes: Latest close of every ticker, in the order of self.tickers
+            :type closes: np.ndarray
+            :returns: Boolean arrays of the tickers to be long and the tickers to be short
+            :rtype: tuple[np.ndarray]
+
+        '''
+        window = self._push(closes)
+        if self.count < WINDOW:
+            return self.is_long, self.is_short
+
+        #> Band statistics of closes [0, 20) for yesterday and [1, 21) for today from cumulative sums
+        np.multiply(window, window, out=self._squares)
+        self._sums[:, 0] = 0
+        self._square_sums[:, 0] = 0
+        np.cumsum(window, axis=1, out=self._sums[:, 1:])
+        np.cumsum(self._squares, axis=1, out=self._square_sums[:, 1:])
+
+        y_sma, y_std = self._band(0)
+        t_sma, t_std = self._band(1)
+        return self.decide(window[:, -1], window[:, -2], y_sma, y_std, t_sma, t_std)
+
+    def decide(self, today, yesterday, y_sma, y_std, t_sma, t_std, allowed=None) -> tuple:
+        '''
+
+            Applies the BollingerBands.run_algo entry and exit rules to every ticker given its bands
+
+            :param today: Today's close of every ticker
+            :type today: np.ndarray
+            :param yesterday: Yesterday's close of every ticker
+            :type yesterday: np.ndarray
+            :param y_sma: Moving average of the 20 closes before yesterday
+            :type y_sma: np.ndarray
+            :param y_std: Standard deviation of the 20 closes before yesterday
+            :type y_std: np.ndarray
+            :param t_sma: Moving average of the 20 closes before today
+            :type t_sma: np.ndarray
+            :param t_std: Standard deviation of the 20 closes before today
+            :type t_std: np.ndarray
+            :param allowed: Whether each ticker may enter a position today, such as a regime mask, or None for every ticker
+            :type allowed: np.ndarray or None
+            :returns: Boolean arrays of the tickers to be long and the tickers to be short
+            :rtype: tuple[np.ndarray]
+
+        '''
+        #> Entry logic, long then short, as in BollingerBands.run_algo
+        go_long = (today <= t_sma + 2 * t_std) & (today >= t_sma + t_std) & (yesterday <= y_sma + y_std) & (yesterday >= y_sma)
+        if allowed is not None:
+            go_long &= allowed
+        np.logical_and(go_long, ~self.is_long, out=self._mask)
+        self.is_long |= self._mask
+        self.is_short &= ~self._mask
+        self.entry[self._mask] = today[self._mask]
+
+        go_short = (today <= t_sma - t_std) & (today >= t_sma - 2 * t_std) & (yesterday <= y_sma) & (yesterday >= y_sma - y_std)
+        if allowed is not None:
+            go_short &= allowed
+        np.logical_and(go_short, ~self.is_short, out=self._mask)
+        self.is_short |= self._mask
+        self.is_long &= ~self._mask
+        self.entry[self._mask] = today[self._mask]
+
+        #> Exit logic when longing: stop loss, then trailing stop once the second upper band was reached
+        np.copyto(self._mask, self.is_long)
+        np.copyto(self.highest, np.maximum(self.highest, today), where=self._mask)
+        np.logical_and(self._mask, self.entry - today >= 0.001, out=self._tmp)
+        self.is_long &= ~self._tmp
+        self.highest[self._tmp] = -10000
+        np.logical_and(self._mask, (self.highest - today >= 0.001) & (self.highest >= t_sma + 2 * t_std), out=self._tmp)
+        self.is_long &= ~self._tmp
+        self.highest[self._tmp] = -10000
+
+        #> Exit logic when shorting
+        np.copyto(self._mask, self.is_short)
+        np.copyto(self.lowest, np.minimum(self.lowest, today), where=self._mask)
+        np.logical_and(self._mask, today - self.entry >= 0.001, out=self._tmp)
+        self.is_short &= ~self._tmp
+        self.lowest[self._tmp] = 10000
+        np.logical_and(self._mask, (today - self.lowest >= 0.001) & (self.lowest <= t_sma - 2 * t_std), out=self._tmp)
+        self.is_short &= ~self._tmp
+        self.lowest[self._tmp] = 10000
+
+        return self.is_long, self.is_short
+
+    def _band(self, start: int) -> tuple:
+        '''
+
+            Mean and sample standard deviation of the BAND closes starting at position start of the window
+
+            :returns: Moving average and standard deviation of every ticker
+            :rtype: tuple[np.ndarray]
+
+        '''
+        total = self._sums[:, start + BAND] - self._sums[:, start]
+        square_total = self._square_sums[:, start + BAND] - self._square_sums[:, start]
+        sma = total / BAND
+        var = np.maximum(square_total - total * sma, 0) / (BAND - 1)
+        return sma, np.sqrt(var)
+
+
+class SimulatedFeed:
+
+    def __init__(self, n_tickers: int, n_bars: int, seed=None):
+        '''
+
+            Local stand-in for a live bar feed, replaying random walk closes for every ticker
+
+            :param n_tickers: Number of tickers in every bar
+            :type n_tickers: int
+            :param n_bars: Number of bars replayed
+            :type n_bars: int
+            :param seed: Seed of the random number generator
+            :type seed: int or None
+
+        '''
+        rng = np.random.default_rng(seed)
+        self.closes = 100 * np.cumprod(1 + rng.normal(0, 0.01, size=(n_bars, n_tickers)), axis=0)
+
+    def __iter__(self):
+        '''
+
+            Yields the arrival time of every bar, stamped as it is handed over, along with its closes
+
+        '''
+        for closes in self.closes:
+            yield time.perf_counter_ns(), closes
+
+
+def measure_latency(n_tickers: int, n_bars: int = 5000, seed=None) -> dict:
+    '''
+
+        Measures the latency from bar arrival to the long/short decision
+
+        :param n_tickers: Number of tickers decided on every bar
+        :type n_tickers: int
+        :param n_bars: Number of bars replayed, the first 22 of which only warm up the buffers
+        :type n_bars: int
+        :param seed: Seed of the simulated feed
+        :type seed: int or None
+        :returns: Latency percentiles in microseconds
+        :rtype: dict
+
+    '''
+    decider = BollingerDecider(["SIM" + str(i) for i in range(n_tickers)])
+    latencies = np.empty(n_bars, dtype=np.int64)
+    for i, (arrival, closes) in enumerate(SimulatedFeed(n_tickers, n_bars, seed)):
+        decider.on_bar(closes)
+        latencies[i] = time.perf_counter_ns() - arrival
+
+    latencies = latencies[WINDOW:] / 1000
+    return {
+        "Tickers": n_tickers,
+        "Bars": len(latencies),
+        "p50 (us)": np.percentile(latencies, 50),
+        "p99 (us)": np.percentile(latencies, 99),
+        "Max (us)": latencies.max(),
+    }
+
+
+def latency_report(ticker_counts=(1, 500), n_bars: int = 5000) -> str:
+    '''
+
+        Runs the latency harness for every ticker count and formats the results as a markdown table
+
+        :returns: Markdown table with one row per ticker count
+        :rtype: str
+
+    '''
+    lines = ["|**Tickers**|**Bars**|**p50 (us)**|**p99 (us)**|**Max (us)**|",
+             "| ----------- | ----------- | ----------- | ----------- | ----------- |"]
+    for n_tickers in ticker_counts:
+        result = measure_latency(n_tickers, n_bars)
+        lines.append("| {} | {} | {:.1f} | {:.1f} | {:.1f} |".format(
+            result["Tickers"], result["Bars"], result["p50 (us)"], result["p99 (us)"], result["Max (us)"]))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(latency_report())
@@ -0,0 +1,299 @@
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+import pandas as pd
+
+
+def rss() -> int:
+    '''
+
+        Resident set size of the current process
+
+        :returns: Bytes resident in memory, from /proc where available and the peak from getrusage otherwise
+        :rtype: int
+
+    '''
+    try:
+        with open("/proc/self/statm", "r") as pfile:
+            return int(pfile.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        #* ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemoryProfiler:
+
+    def __init__(self, top: int = 10, ceiling=None, leak_iterations: int = 3, frames: int = 1):
+        '''
+
+            Samples memory by stage and by ticker during a sweep, and flags what stays alive across iterations
+
+            Each stage records the RSS before and after it, the peak of traced memory and the allocation
+            sites that grew the most. At the end of each iteration, normally one ticker, live objects are
+            counted by type and traced memory by allocation site; a type or site that grows for
+            leak_iterations iterations in a row is flagged as retained.
+
+            :param top: Number of allocation sites recorded per stage
+            :type top: int
+            :param ceiling: RSS in bytes above which a MemoryError is raised, or None
+            :type ceiling: int or None
+            :param leak_iterations: Number of consecutive iterations of growth that flags a type or site
+            :type leak_iterations: int
+            :param frames: Number of frames stored per traced allocation
+            :type frames: int
+
+        '''
+        self.top = top
+        self.ceiling = ceiling
+        self.leak_iterations = leak_iterations
+        self.frames = frames
+        self.stages = []
+        self.allocators = []
+        self.iterations = []
+        self.retained = {}
+        self._started = False
+        self.baseline = rss()
+        self._counts = None
+        self._sizes = None
+        self._streaks = {}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        '''
+
+            Starts tracing allocations, unless tracemalloc was already started elsewhere
+
+            :return: No return
+            :rtype: None
+
+        '''
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started = True
+        self.baseline = rss()
+
+    def stop(self) -> None:
+        '''
+
+            Stops tracing allocations if this profiler started it
+
+            :return: No return
+            :rtype: None
+
+        '''
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def _snapshot_traces(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+
+    def _check_ceiling(self, current: int, where: str) -> None:
+        if self.ceiling is not None and current > self.ceiling:
+            raise MemoryError("RSS of " + str(current) + " bytes " + where + " exceeds the ceiling of " + str(self.ceiling) + " bytes")
+
+    @contextmanager
+    def stage(self, name: str, ticker=None):
+        '''
+
+            Profiles the block run inside the context, including a block that raised, whose error is recorded
+
+            :param name: Name of the stage, such as "download", "signals" or "backtest"
+            :type name: str
+            :param ticker: Ticker the stage is run for, or None
+            :type ticker: str or None
+            :raises MemoryError: If the RSS after the stage exceeds the ceiling, in place of the error of a stage that raised
+
+        '''
+        before = self._snapshot_traces()
+        rss_before = rss()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield self
+        except Exception as err:
+            error = repr(err)
+            raise
+        finally:
+            #* A failed stage, say a download dying halfway, may have allocated the most, so it is measured too
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            rss_after = rss()
+
+            for stat in self._snapshot_traces().compare_to(before, "lineno")[:self.top]:
+                frame = stat.traceback[0]
+                self.allocators.append({"Stage": name, "Ticker": ticker, "Site": frame.filename + ":" + str(frame.lineno),
+                                        "Size Diff": stat.size_diff, "Count Diff": stat.count_diff})
+            self.stages.append({"Stage": name, "Ticker": ticker, "Seconds": seconds, "RSS Before": rss_before,
+                                "RSS After": rss_after, "RSS Diff": rss_after - rss_before, "Traced Peak": peak, "Error": error})
+            self._check_ceiling(rss_after, "after stage " + name + ("" if ticker is None else " of " + str(ticker)))
+
+    def end_iteration(self, ticker=None) -> None:
+        '''
+
+            Closes one iteration of the sweep, counting what is still alive against the previous iteration
+
+            :param ticker: Ticker of the iteration, or None
+            :type ticker: str or None
+            :return: No return
+            :rtype: None
+            :raises MemoryError: If the RSS exceeds the ceiling
+
+        '''
+        gc.collect()
+        #* Traces are taken before the profiler allocates its own counts
+        snapshot = self._snapshot_traces()
+        counts = {}
+        for obj in gc.get_objects():
+            name = _type_name(type(obj))
+            counts[name] = counts.get(name, 0) + 1
+        sizes = {}
+        for stat in snapshot.statistics("lineno"):
+            frame = stat.traceback[0]
+            sizes["site " + frame.filename + ":" + str(frame.lineno)] = stat.size
+
+        current = rss()
+        self.iterations.append({"Ticker": ticker, "RSS": current, "Traced": tracemalloc.get_traced_memory()[0],
+                                "Objects": sum(counts.values())})
+
+        if self._counts is not None:
+            grown = [("type " + name, counts[name] - self._counts.get(name, 0)) for name in counts if counts[name] > self._counts.get(name, 0)]
+            grown += [(site, sizes[site] - self._sizes.get(site, 0)) for site in sizes if sizes[site] > self._sizes.get(site, 0)]
+            grown_keys = set(key for key, _ in grown)
+            for key in list(self._streaks):
+                if key not in grown_keys:
+                    del self._streaks[key]
+            for key, growth in grown:
+                self._streaks[key] = self._streaks.get(key, 0) + 1
+                if self._streaks[key] >= self.leak_iterations:
+                    entry = self.retained.setdefault(key, {"First Flagged": ticker, "Iterations": 0, "Growth": 0})
+                    entry["Iterations"] = self._streaks[key]
+                    entry["Growth"] += growth
+        self._counts, self._sizes = counts, sizes
+        self._check_ceiling(current, "at the end of " + ("an iteration" if ticker is None else str(ticker)))
+
+    def stage_frame(self) -> pd.DataFrame:
+        '''
+
+            :returns: One row per profiled stage, with the error of the stages that raised
+            :rtype: pd.DataFrame
+
+        '''
+        return pd.DataFrame(self.stages, columns=["Stage", "Ticker", "Seconds", "RSS Before", "RSS After", "RSS Diff", "Traced Peak", "Error"])
+
+    def report(self) -> str:
+        '''
+
+            Formats the samples as a markdown report: stages, tickers, top allocators and retained objects
+
+            :returns: Markdown report
+            :rtype: str
+
+        '''
+        stages = self.stage_frame()
+        iterations = pd.DataFrame(self.iterations, columns=["Ticker", "RSS", "Traced", "Objects"])
+        peak = max([self.baseline] + list(stages["RSS After"]) + list(iterations["RSS"]))
+        lines = ["# Memory profile", "",
+                 "Peak RSS: {} bytes, ceiling: {}".format(peak, "none" if self.ceiling is None else str(self.ceiling) + " bytes")]
+
+        tables = {}
+        if len(stages.index):
+            tables["By stage"] = stages.groupby("Stage", sort=False).agg(
+                {"Seconds": "sum", "RSS Diff": "sum", "Traced Peak": "max", "RSS After": "max", "Error": "count"}).rename(columns={"Error": "Errors"})
+            tables["By ticker"] = stages.dropna(subset=["Ticker"]).groupby("Ticker", sort=False).agg(
+                {"Seconds": "sum", "RSS Diff": "sum", "Traced Peak": "max"})
+        if len(iterations.index):
+            tables["By iteration"] = iterations.set_index("Ticker")
+        if self.allocators:
+            allocators = pd.DataFrame(self.allocators).groupby(["Stage", "Site"]).agg({"Size Diff": "sum", "Count Diff": "sum"})
+            tables["Top allocators"] = allocators.sort_values("Size Diff", ascending=False).head(self.top)
+        if self.retained:
+            tables["Retained across iterations"] = pd.DataFrame.from_dict(self.retained, orient="index").sort_values("Growth", ascending=False)
+
+        for title, table in tables.items():
+            lines += ["", "## " + title, "", "```", table.to_string(), "```"]
+        if not self.retained:
+            lines += ["", "## Retained across iterations", "", "None"]
+        return "\n".join(lines) + "\n"
+
+    def write(self, filestring: str) -> None:
+        '''
+
+            Writes the markdown report to a file
+
+            :return: No return
+            :rtype: None
+
+        '''
+        with open(filestring, "w") as pfile:
+            pfile.write(self.report())
+
+
+def _type_name(cls) -> str:
+    #* A few extension types hold a descriptor rather than a string in __module__
+    module = getattr(cls, "__module__", None)
+    return (module if isinstance(module, str) else "builtins") + "." + cls.__name__
+
+
+def profile_backtests(tickers: list, profiler: MemoryProfiler, algo_class=None, capital: float = 10000,
+                      years_back: int = 5, bar_source=None, graphs: bool = True) -> MemoryProfiler:
+    '''
+
+        Runs the per-ticker backtest loop of main.ipynb under a profiler, one iteration per ticker
+
+        :param tickers: Tickers being backtested
+        :type tickers: list[str]
+        :param profiler: Profiler sampling every stage
+        :type profiler: MemoryProfiler
+        :param algo_class: Subclass of Algo being backtested, defaults to Algo.BollingerBands
+        :type algo_class: type or None
+        :param capital: Capital at the start of every backtest
+        :type capital: float
+        :param years_back: Years back from the current date the backtests start
+        :type years_back: int
+        :param bar_source: Bar source handed to the algorithm instead of downloading, or None
+        :type bar_source: MinuteStore.BarAggregator or None
+        :param graphs: Whether the portfolio graph of every backtest is drawn
+        :type graphs: bool
+        :returns: The profiler
+        :rtype: MemoryProfiler
+
+    '''
+    import Algo
+    import Backtest
+    algo_class = Algo.BollingerBands if algo_class is None else algo_class
+    with profiler:
+        for ticker in tickers:
+            try:
+                with profiler.stage("download", ticker):
+                    algo = algo_class(ticker, bar_source=bar_source)
+                with profiler.stage("signals", ticker):
+                    algo.run_algo()
+                with profiler.stage("backtest", ticker):
+                    back = Backtest.Backtest(algo, capital, years_back)
+                    back.run_backtest_vectorized()
+                if graphs:
+                    with profiler.stage("graph", ticker):
+                        os.remove(back._graph_portfolio())
+            except MemoryError:
+                raise
+            except Exception as err:
+                print(err)
+            algo = back = None
+            profiler.end_iteration(ticker)
+    return profiler
@@ -0,0 +1,254 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+from AtomicFile import atomic_write
+
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+NS_PER_MINUTE = 60 * 10**9
+NS_PER_DAY = 24 * 60 * NS_PER_MINUTE
+
+
+class MinuteStore:
+
+    def __init__(self, path: str):
+        '''
+
+            On-disk store of minute bars, one directory per ticker holding one .npy file per column
+
+            Timestamps are stored as int64 nanoseconds of exchange local time. Columns are memory mapped
+            on read, so a slice of history only pages in the rows it touches.
+
+            :param path: Directory holding the store, created if it does not exist
+            :type path: str
+
+        '''
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+    def _filestring(self, ticker: str, name: str) -> str:
+        return os.path.join(self.path, ticker, name + ".npy")
+
+    def tickers(self) -> list:
+        '''
+
+            Lists the tickers held in the store
+
+            :returns: Sorted ticker names
+            :rtype: list[str]
+
+        '''
+        return sorted(name for name in os.listdir(self.path) if os.path.isfile(self._filestring(name, "Date")))
+
+    def version(self, ticker: str) -> int:
+        '''
+
+            Version of a ticker's minutes, incremented on every write
+
+            :returns: Version number, 0 if the ticker was never written
+            :rtype: int
+
+        '''
+        try:
+            with open(os.path.join(self.path, ticker, "VERSION"), "r") as pfile:
+                return int(pfile.read())
+        except FileNotFoundError:
+            return 0
+
+    def write(self, ticker: str, frame: pd.DataFrame) -> None:
+        '''
+
+            Merges minute bars into the store, bars already stored at the same timestamps being replaced
+
+            :param ticker: Ticker of the minute bars
+            :type ticker: str
+            :param frame: Minute bars with Open, High, Low, Close, Volume columns and a DatetimeIndex
+            :type frame: pd.DataFrame
+            :return: No return
+            :rtype: None
+
+        '''
+        index = pd.DatetimeIndex(frame.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        new = frame[COLUMNS].set_axis(index)
+
+        if self.version(ticker) > 0:
+            old = self.read(ticker)
+            new = pd.concat([old[~old.index.isin(new.index)], new])
+        new = new.sort_index()
+
+        os.makedirs(os.path.join(self.path, ticker), exist_ok=True)
+        arrays = {"Date": new.index.values.astype("datetime64[ns]").astype(np.int64)}
+        arrays.update({col: new[col].to_numpy(dtype=np.float64) for col in COLUMNS})
+        for name, values in arrays.items():
+            #* Memory mapped readers keep a consistent file
+            with atomic_write(self._filestring(ticker, name)) as pfile:
+                np.save(pfile, values)
+
+        version = self.version(ticker) + 1
+        with open(os.path.join(self.path, ticker, "VERSION"), "w") as pfile:
+            pfile.write(str(version))
+
+    def columns(self, ticker: str, mmap: bool = True) -> dict:
+        '''
+
+            Opens the stored columns of a ticker without copying them into memory
+
+            :returns: Date and OHLCV arrays keyed by column name
+            :rtype: dict
+
+        '''
+        mode = "r" if mmap else None
+        return {name: np.load(self._filestring(ticker, name), mmap_mode=mode) for name in ["Date"] + COLUMNS}
+
+    def read(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        '''
+
+            Reads the minute bars of a ticker between two timestamps, both inclusive
+
+            :returns: Minute bars indexed by timestamp
+            :rtype: pd.DataFrame
+
+        '''
+        columns = self.columns(ticker)
+        dates = columns["Date"]
+        lo = 0 if start is None else np.searchsorted(dates, pd.Timestamp(start).value, side="left")
+        hi = len(dates) if end is None else np.searchsorted(dates, pd.Timestamp(end).value, side="right")
+        return pd.DataFrame({col: np.array(columns[col][lo:hi]) for col in COLUMNS},
+                            index=pd.DatetimeIndex(np.array(dates[lo:hi]).astype("datetime64[ns]")))
+
+
+class BarAggregator:
+
+    def __init__(self, store: MinuteStore, session=("09:30", "16:00")):
+        '''
+
+            Derives daily, weekly and intraday OHLCV bars from a minute store on demand
+
+            Aggregated bars are cached per ticker, rule and session, and recomputed once the store's
+            version of the ticker changes.
+
+            :param store: Store of minute bars
+            :type store: MinuteStore
+            :param session: Start (inclusive) and end (exclusive) of the trading session as HH:MM, or None for every minute
+            :type session: tuple[str] or None
+
+        '''
+        self.store = store
+        self.session = session
+        self._cache = {}
+
+    def bars(self, ticker: str, rule: str = "1d", session="default") -> pd.DataFrame:
+        '''
+
+            Aggregates a ticker's minutes into bars
+
+            :param ticker: Ticker of the bars
+            :type ticker: str
+            :param rule: "Nmin", "Nh", "1d" or "1wk"
+            :type rule: str
+            :param session: Session overriding the aggregator's own, None for every minute
+            :type session: tuple[str] or None
+            :returns: OHLCV bars labelled by the start of each period
+            :rtype: pd.DataFrame
+
+        '''
+        if session == "default":
+            session = self.session
+        key = (ticker, rule, session)
+        version = self.store.version(ticker)
+        if key in self._cache and self._cache[key][0] == version:
+            return self._cache[key][1]
+
+        bars = aggregate(self.store.columns(ticker), rule, session)
+        self._cache[key] = (version, bars)
+        return bars
+
+    def period(self, ticker: str, period: str, end=None) -> pd.DataFrame:
+        '''
+
+            Serves the period argument of Algo.get_current_data from daily bars
+
+            :param ticker: Ticker of the bars
+            :type ticker: str
+            :param period: "Nd" for the last N sessions, "Nwk", "Nmo" or "Ny" for calendar spans, "ytd" or "max"
+            :type period: str
+            :param end: Last day of the period, defaults to the last stored session
+            :type end: str or pd.Timestamp or None
+            :returns: Daily OHLCV bars
+            :rtype: pd.DataFrame
+
+        '''
+        daily = self.bars(ticker, "1d")
+        if end is not None:
+            daily = daily.loc[:pd.Timestamp(end)]
+        if period == "max":
+            return daily
+        if period == "ytd":
+            return daily.loc[pd.Timestamp(year=daily.index[-1].year, month=1, day=1):]
+
+        match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+        if match is None:
+            raise ValueError("Unsupported period " + period)
+        n, unit = int(match.group(1)), match.group(2)
+        if unit == "d":
+            return daily.iloc[-n:]
+        offset = {"wk": pd.DateOffset(weeks=n), "mo": pd.DateOffset(months=n), "y": pd.DateOffset(years=n)}[unit]
+        return daily.loc[daily.index[-1] - offset + pd.Timedelta(1, "D"):]
+
+
+def aggregate(columns: dict, rule: str, session=None) -> pd.DataFrame:
+    '''
+
+        Aggregates minute columns into OHLCV bars with one reduceat pass per column
+
+        :param columns: Date (int64 ns) and OHLCV arrays sorted by date, as returned by MinuteStore.columns
+        :type columns: dict
+        :param rule: "Nmin", "Nh", "1d" or "1wk"
+        :type rule: str
+        :param session: Start (inclusive) and end (exclusive) of the session as HH:MM, or None
+        :type session: tuple[str] or None
+        :returns: OHLCV bars labelled by the start of each period
+        :rtype: pd.DataFrame
+
+    '''
+    dates = np.asarray(columns["Date"])
+    keep = slice(None)
+    if session is not None:
+        start, end = [pd.Timedelta(t + ":00").value for t in session]
+        time_of_day = dates % NS_PER_DAY
+        keep = (time_of_day >= start) & (time_of_day < end)
+        dates = dates[keep]
+
+    match = re.fullmatch(r"(\d+)(min|h|d|wk)", rule)
+    if match is None:
+        raise ValueError("Unsupported rule " + rule)
+    n, unit = int(match.group(1)), match.group(2)
+    if unit in ("min", "h"):
+        width = n * NS_PER_MINUTE * (60 if unit == "h" else 1)
+        keys = dates // width
+        labels = keys * width
+    elif unit == "d" and n == 1:
+        keys = dates // NS_PER_DAY
+        labels = keys * NS_PER_DAY
+    elif unit == "wk" and n == 1:
+        #* Day 0 of the epoch is a Thursday, shifting by 3 days starts every week on a Monday
+        keys = (dates // NS_PER_DAY + 3) // 7
+        labels = (keys * 7 - 3) * NS_PER_DAY
+    else:
+        raise ValueError("Unsupported rule " + rule)
+
+    if len(dates) == 0:
+        return pd.DataFrame(columns=COLUMNS, index=pd.DatetimeIndex([]))
+
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(keys)) + 1])
+    ends = np.append(starts[1:], len(dates))
+    values = {col: np.asarray(columns[col])[keep] for col in COLUMNS}
+    return pd.DataFrame({
+        "Open": values["Open"][starts],
+        "High": np.maximum.reduceat(values["High"], starts),
+        "Low": np.minimum.reduceat(values["Low"], starts),
+        "Close": values["Close"][ends - 1],
+        "Volume": np.add.reduceat(values["Volume"], starts),
+    }, index=pd.DatetimeIndex(labels[starts].astype("datetime64[ns]")))
@@ -0,0 +1,189 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+TRADING_DAYS = 252
+#> Number of paths drawn from one child seed
+SEED_BLOCK = 100
+STATISTICS = ["Sharpe Ratio", "Kelley Criterion", "Max Drawdown", "Final Capital"]
+
+
+class MonteCarlo:
+
+    def __init__(self, trade_pl, daily_returns, capital: float, paths: int = 10000, block_size=None, chunk_size: int = 1000, workers=None, seed=None):
+        '''
+
+            Bootstrap resampling engine over the trade ledger and daily returns of a backtest
+
+            :param trade_pl: P/L ratio of every trade, as returned by Backtest._trade_pl
+            :type trade_pl: array-like of float
+            :param daily_returns: Daily fractional change in capital over the backtest
+            :type daily_returns: array-like of float
+            :param capital: Capital balance at the start of every resampled path
+            :type capital: float
+            :param paths: Number of resampled paths
+            :type paths: int
+            :param block_size: Length of the blocks drawn by the circular block bootstrap, or None for an i.i.d. bootstrap
+            :type block_size: int or None
+            :param chunk_size: Number of paths held in memory at once
+            :type chunk_size: int
+            :param workers: Number of worker processes, or None to run in the current process
+            :type workers: int or None
+            :param seed: Seed of the random number generator
+            :type seed: int or None
+
+        '''
+        self.trade_pl = np.asarray(trade_pl, dtype=np.float64)
+        self.daily_returns = np.asarray(daily_returns, dtype=np.float64)
+        if len(self.trade_pl) == 0:
+            raise ValueError("Cannot resample a backtest that took no trades")
+        if len(self.daily_returns) < 2:
+            raise ValueError("At least two daily returns are needed to resample the Sharpe ratio")
+        if block_size is not None and block_size < 1:
+            raise ValueError("Block size must be a positive integer")
+
+        self.capital = capital
+        self.paths = paths
+        self.block_size = block_size
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.seed = seed
+
+    @classmethod
+    def from_backtest(cls, backtest, **kwargs):
+        '''
+
+            Builds the resampling engine from a backtest that has already been run
+
+            :param backtest: Backtest whose run_backtest method has been called
+            :type backtest: Backtest
+            :returns: Resampling engine over the backtest's trades and daily capital returns
+            :rtype: MonteCarlo
+
+        '''
+        capital = backtest.hist_positions["Capital"].astype(np.float64)
+        daily_returns = capital.pct_change().iloc[1:].to_numpy()
+        return cls(backtest._trade_pl(), daily_returns, float(capital.iloc[0]), **kwargs)
+
+    def run(self, confidence: float = 0.95) -> pd.DataFrame:
+        '''
+
+            Resamples the backtest and computes confidence intervals of its statistics
+
+            :param confidence: Two sided confidence level of the intervals
+            :type confidence: float
+            :returns: Realized estimate, bootstrap mean and interval bounds for each statistic
+            :rtype: pd.DataFrame
+
+        '''
+        samples = self.samples()
+        estimate = path_statistics(self.trade_pl[None, :], self.daily_returns[None, :], self.capital)
+
+        alpha = (1 - confidence) / 2 * 100
+        rows = []
+        for i, statistic in enumerate(STATISTICS):
+            column = samples[:, i]
+            rows.append([estimate[0, i], np.nanmean(column), np.nanpercentile(column, alpha), np.nanpercentile(column, 100 - alpha)])
+
+        return pd.DataFrame(rows, index=STATISTICS, columns=["Estimate", "Mean", "Lower", "Upper"])
+
+    def samples(self) -> np.ndarray:
+        '''
+
+            Computes the statistics of every resampled path, one chunk of paths at a time
+
+            :returns: Matrix of shape (paths, 4) with columns ordered as STATISTICS
+            :rtype: np.ndarray
+
+        '''
+        #> Paths are seeded in fixed blocks of SEED_BLOCK, so results depend neither on the chunk size nor on the number of workers
+        seeds = np.random.SeedSequence(self.seed).spawn(-(-self.paths // SEED_BLOCK))
+        jobs = []
+        for start in range(0, self.paths, self.chunk_size):
+            stop = min(start + self.chunk_size, self.paths)
+            blocks = seeds[start // SEED_BLOCK:-(-stop // SEED_BLOCK)]
+            jobs.append((self.trade_pl, self.daily_returns, self.capital, start % SEED_BLOCK, stop - start, self.block_size, blocks))
+
+        if self.workers is None:
+            chunks = [_resample_chunk(*job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                chunks = list(executor.map(_resample_chunk, *zip(*jobs)))
+
+        return np.concatenate(chunks, axis=0)
+
+
+def _resample_indices(rng, n_obs: int, n_paths: int, length: int, block_size) -> np.ndarray:
+    '''
+
+        Draws a (paths x length) matrix of observation indices
+
+        :returns: Indices drawn i.i.d. or as wrapped contiguous blocks
+        :rtype: np.ndarray
+
+    '''
+    if block_size is None or block_size == 1:
+        return rng.integers(0, n_obs, size=(n_paths, length))
+
+    n_blocks = -(-length // block_size)
+    starts = rng.integers(0, n_obs, size=(n_paths, n_blocks, 1))
+    idx = (starts + np.arange(block_size)) % n_obs
+    return idx.reshape(n_paths, -1)[:, :length]
+
+
+def _resample_chunk(trade_pl, daily_returns, capital, offset, n_paths, block_size, seeds) -> np.ndarray:
+    '''
+
+        Resamples one chunk of paths and reduces each path to its statistics
+
+        :param offset: Position of the chunk's first path in the first seed block
+        :param seeds: Seeds of the blocks of SEED_BLOCK paths the chunk overlaps
+        :returns: Matrix of shape (n_paths, 4) with columns ordered as STATISTICS
+        :rtype: np.ndarray
+
+    '''
+    trades, days = [], []
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        trades.append(_resample_indices(rng, len(trade_pl), SEED_BLOCK, len(trade_pl), block_size))
+        days.append(_resample_indices(rng, len(daily_returns), SEED_BLOCK, len(daily_returns), block_size))
+    #* Whole seed blocks are drawn, then trimmed to the paths of the chunk
+    trades = trade_pl[np.concatenate(trades)[offset:offset + n_paths]]
+    days = daily_returns[np.concatenate(days)[offset:offset + n_paths]]
+    return path_statistics(trades, days, capital)
+
+
+def path_statistics(trades: np.ndarray, days: np.ndarray, capital: float) -> np.ndarray:
+    '''
+
+        Computes the statistics of a matrix of paths with one path per row
+
+        :param trades: (paths x trades) matrix of trade P/L ratios
+        :type trades: np.ndarray
+        :param days: (paths x days) matrix of daily returns
+        :type days: np.ndarray
+        :param capital: Capital at the start of every path
+        :type capital: float
+        :returns: Matrix of shape (paths, 4) with columns ordered as STATISTICS
+        :rtype: np.ndarray
+
+    '''
+    #* Sharpe ratio of daily returns, annualized as in main.ipynb
+    std = days.std(axis=1, ddof=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(std > 0, days.mean(axis=1) * TRADING_DAYS / (std * np.sqrt(TRADING_DAYS)), np.nan)
+
+    #* Kelley criterion as computed by Backtest._pl_ratios_and_kelley_and_sharpe, nan when it is undefined
+    wins = (trades > 0).sum(axis=1)
+    losses = (trades < 0).sum(axis=1)
+    win_prob = wins / trades.shape[1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        kelley = win_prob - (1 - win_prob) / (wins / losses)
+    kelley[(wins == 0) | (losses == 0)] = np.nan
+
+    #* Capital compounded trade by trade, with the starting capital as the first peak
+    equity = capital * np.cumprod(1 + trades, axis=1)
+    peaks = np.maximum(np.maximum.accumulate(equity, axis=1), capital)
+    max_drawdown = ((peaks - equity) / peaks).max(axis=1)
+
+    return np.column_stack([sharpe, kelley, max_drawdown, equity[:, -1]])
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Adj Close"]
+
+
+class PrecisionMode:
+
+    def __init__(self, price_dtype=np.float64, volume_dtype=np.int64, pack_masks: bool = False, tolerance: float = 0.0):
+        '''
+
+            Storage types of price panels, indicators, volumes and signal masks
+
+            Only storage is downcast: capital, cash and equity are always accumulated in float64.
+
+            :param price_dtype: Type of prices and of the indicators computed from them
+            :type price_dtype: np.dtype
+            :param volume_dtype: Type of traded volumes, kept at int64 for any ticker whose volume does not fit
+            :type volume_dtype: np.dtype
+            :param pack_masks: Whether boolean signal columns are bit packed
+            :type pack_masks: bool
+            :param tolerance: Relative error of prices and indicators against a float64 run, and absolute error of returns
+            :type tolerance: float
+
+        '''
+        self.price_dtype = np.dtype(price_dtype)
+        self.volume_dtype = np.dtype(volume_dtype)
+        self.pack_masks = pack_masks
+        self.tolerance = tolerance
+
+
+#> float32 rounds a price to within 2**-24 (6e-8) of its value and keeps the 90 day stdev and 20 day...
+#> ...moving average within a relative 1e-5 of float64; Pct Change and Rets, being differences of...
+#> ...prices, are within an absolute 1e-6. A signal can only differ from a float64 run when the two...
+#> ...sides of its comparison are that close
+FULL = PrecisionMode()
+COMPACT = PrecisionMode(np.float32, np.int32, pack_masks=True, tolerance=1e-5)
+
+
+class PackedMask:
+
+    def __init__(self, mask):
+        '''
+
+            Boolean signal column stored at one bit per bar
+
+            :param mask: Boolean values being packed
+            :type mask: array-like of bool
+
+        '''
+        mask = np.asarray(mask, dtype=bool)
+        self.length = len(mask)
+        self.bits = np.packbits(mask)
+
+    def __len__(self) -> int:
+        return self.length
+
+    @property
+    def nbytes(self) -> int:
+        return self.bits.nbytes
+
+    def unpack(self) -> np.ndarray:
+        '''
+
+            :returns: The boolean values that were packed
+            :rtype: np.ndarray
+
+        '''
+        return np.unpackbits(self.bits, count=self.length).astype(bool)
+
+
+def compact_prices(frame: pd.DataFrame, mode: PrecisionMode) -> pd.DataFrame:
+    '''
+
+        Casts the price and volume columns of a frame of bars to the types of a precision mode
+
+        :param frame: Bars with any of the Open, High, Low, Close, Adj Close and Volume columns
+        :type frame: pd.DataFrame
+        :param mode: Precision mode being applied
+        :type mode: PrecisionMode
+        :returns: Frame with cast columns, other columns untouched
+        :rtype: pd.DataFrame
+
+    '''
+    frame = frame.copy()
+    for col in frame.columns:
+        name = col[0] if isinstance(col, tuple) else col
+        if name in PRICE_COLUMNS:
+            frame[col] = frame[col].astype(mode.price_dtype)
+        elif name == "Volume":
+            volume = frame[col].fillna(0)
+            fits = volume.max() <= np.iinfo(mode.volume_dtype).max
+            frame[col] = volume.astype(mode.volume_dtype if fits else np.int64)
+    return frame
+
+
+def pack_signals(frame: pd.DataFrame) -> dict:
+    '''
+
+        Moves the boolean columns of a frame into bit packed masks
+
+        The columns are deleted from the frame, so they are read back through Algo.get_signal rather
+        than by indexing the frame, which raises a KeyError.
+
+        :param frame: Frame whose boolean columns are removed in place
+        :type frame: pd.DataFrame
+        :returns: Packed mask of every boolean column keyed by column name
+        :rtype: dict
+
+    '''
+    masks = {}
+    for col in [col for col in frame.columns if frame[col].dtype == bool]:
+        masks[col] = PackedMask(frame[col].to_numpy())
+        del frame[col]
+    return masks
@@ -0,0 +1,86 @@
+import numpy as np
+from SignalSpec import Strategy, column, where
+
+#> Regime labels: Unknown until every feature has a full window of history
+UNKNOWN, CALM, VOLATILE, VOLUME_SPIKE = -1, 0, 1, 2
+LABELS = {UNKNOWN: "Unknown", CALM: "Calm", VOLATILE: "Volatile", VOLUME_SPIKE: "Volume Spike"}
+
+
+def regime_spec(window: int = 20, baseline: int = 90, z_threshold: float = 2.0) -> Strategy:
+    '''
+
+        Volatility and volume regime features of daily OHLCV bars, as one signal program
+
+        Mean reversion is allowed in the calm regime, when the Garman-Klass volatility is at or below
+        its average over the baseline window and volume is not spiking, i.e. when noise dies out.
+
+        :param window: Bars of the rolling volatilities and of the volume z-score
+        :type window: int
+        :param baseline: Bars the Garman-Klass volatility is averaged over to tell calm from volatile
+        :type baseline: int
+        :param z_threshold: Volume z-score above which volume is spiking
+        :type z_threshold: float
+        :returns: Program adding the Realized Vol, Volume Z, Parkinson Vol, Garman-Klass Vol, Regime and Mean Reversion columns
+        :rtype: Strategy
+
+    '''
+    opens, high, low, close, volume = [column(name) for name in ["Open", "High", "Low", "Close", "Volume"]]
+    log_range = (high / low).log()
+    log_body = (close / opens).log()
+    spec = {}
+
+    # Close to close volatility of log returns
+    spec['Realized Vol'] = (close / close.shift(1)).log().rolling_std(window)
+    spec['Volume Z'] = (volume - volume.rolling_mean(window)) / volume.rolling_std(window)
+
+    # Range volatilities from the high, low, open and close of every bar
+    spec['Parkinson Vol'] = ((log_range * log_range).rolling_mean(window) / (4 * np.log(2))).sqrt()
+    spec['Garman-Klass Vol'] = (0.5 * log_range * log_range - (2 * np.log(2) - 1) * log_body * log_body).rolling_mean(window).sqrt()
+
+    # Comparisons with a nan feature are False, which leaves the warm-up bars Unknown
+    average = spec['Garman-Klass Vol'].rolling_mean(baseline)
+    spike = spec['Volume Z'] > z_threshold
+    calm = (spec['Garman-Klass Vol'] <= average) & (spec['Volume Z'] <= z_threshold)
+    volatile = (spec['Garman-Klass Vol'] > average) & (spec['Volume Z'] <= z_threshold)
+    spec['Regime'] = where(spike, VOLUME_SPIKE, where(volatile, VOLATILE, where(calm, CALM, UNKNOWN)))
+    spec['Mean Reversion'] = calm
+    return Strategy(spec)
+
+
+SPEC = regime_spec()
+
+
+def signals(frame, dtype=np.float64) -> None:
+    '''
+
+        Adds the regime features of SPEC to a frame of daily OHLCV bars
+
+        Has the signature of MinhsAlgo.signals, so the features can be cached alongside other
+        indicators, for instance by CorporateActions.AdjustedBars.indicators.
+
+        :param frame: Daily bars with Open, High, Low, Close and Volume columns
+        :type frame: pd.DataFrame
+        :param dtype: Floating point type of the features
+        :type dtype: np.dtype
+        :return: void
+        :rtype: void
+
+    '''
+    for name, values in SPEC.evaluate(frame, dtype).items():
+        frame[name] = values
+
+
+def mask(data, strategy: Strategy = SPEC) -> np.ndarray:
+    '''
+
+        Whether each bar is in a regime where mean reversion is allowed
+
+        :param data: Daily OHLCV bars of a ticker, or mapping of column name to (bars x tickers) panel
+        :type data: pd.DataFrame or dict
+        :param strategy: Regime program, such as one built by regime_spec
+        :type strategy: Strategy
+        :returns: Boolean mask with the shape of the bars, for Algo.set_regime
+        :rtype: np.ndarray
+
+    '''
+    return strategy.evaluate(data)['Mean Reversion']
@@ -0,0 +1,240 @@
+import os
+import json
+import glob
+import time
+import uuid
+import numpy as np
+import pandas as pd
+from AtomicFile import atomic_write
+import MonteCarlo
+
+#> One record per bar of an equity curve, appended run after run to curves.bin
+CURVE_DTYPE = np.dtype([("Date", "<i8"), ("Capital", "<f8"), ("Equity", "<f8"), ("Cash", "<f8")])
+KEY_COLUMNS = ["ID", "Ticker", "Strategy", "Params"]
+
+
+class ResultsArchive:
+
+    def __init__(self, path: str, flush_every: int = 256):
+        '''
+
+            Append-only archive of backtest results
+
+            Summary statistics are written as columnar segments under summary/ and equity curves are
+            appended as contiguous binary chunks to curves.bin. The summary segments double as the
+            index: each row stores the offset and length of its run's chunk in curves.bin.
+
+            :param path: Directory holding the archive, created if it does not exist
+            :type path: str
+            :param flush_every: Number of buffered runs that triggers writing a new summary segment
+            :type flush_every: int
+
+        '''
+        self.path = path
+        self.flush_every = flush_every
+        os.makedirs(os.path.join(self.path, "summary"), exist_ok=True)
+        self.curve_filestring = os.path.join(self.path, "curves.bin")
+        self._buffer = []
+        self._index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.flush()
+
+    def __contains__(self, ID) -> bool:
+        '''
+
+            Checks whether a run was already appended, flushed or not, so repeated writes can be skipped
+
+        '''
+        ID = str(ID)
+        return any(row["ID"] == ID for row in self._buffer) or ID in self.index().index
+
+    def append(self, ID, ticker: str, strategy: str, params: dict, stats: dict, curve=None) -> None:
+        '''
+
+            Appends the result of one backtest
+
+            :param ID: Identifier of the backtest, such as Backtest.ID
+            :type ID: uuid.UUID or str
+            :param ticker: Ticker of the asset that was backtested
+            :type ticker: str
+            :param strategy: Name of the algorithm that was backtested
+            :type strategy: str
+            :param params: Parameters of the backtest, stored as sorted JSON
+            :type params: dict
+            :param stats: Summary statistics of the backtest keyed by name
+            :type stats: dict
+            :param curve: Frame indexed by date with Capital, Equity and Cash columns, or None
+            :type curve: pd.DataFrame or None
+            :return: No return
+            :rtype: None
+
+        '''
+        offset, length = -1, 0
+        if curve is not None:
+            records = np.empty(len(curve.index), dtype=CURVE_DTYPE)
+            records["Date"] = pd.DatetimeIndex(curve.index).values.astype("datetime64[ns]").astype(np.int64)
+            for col in ["Capital", "Equity", "Cash"]:
+                records[col] = curve[col].to_numpy(dtype=np.float64)
+            #* One append of the whole chunk, its offset read back after it, as another writer may have appended since the open
+            with open(self.curve_filestring, "ab") as pfile:
+                pfile.write(records.tobytes())
+                offset = pfile.tell() // CURVE_DTYPE.itemsize - len(records)
+            length = len(records)
+
+        row = {"ID": str(ID), "Ticker": ticker, "Strategy": strategy, "Params": json.dumps(params or {}, sort_keys=True)}
+        row.update({name: float(value) for name, value in stats.items()})
+        row.update({"Curve Offset": offset, "Curve Length": length})
+        self._buffer.append(row)
+
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+
+    def add_backtest(self, backtest, params=None) -> None:
+        '''
+
+            Appends a backtest that has already been run along with its summary statistics
+
+            :param backtest: Backtest whose run_backtest method has been called
+            :type backtest: Backtest
+            :param params: Parameters of the backtest, defaults to the capital and years back
+            :type params: dict or None
+            :return: No return
+            :rtype: None
+
+        '''
+        if params is None:
+            params = {"capital": backtest.initial_capital, "years_back": backtest.years_back}
+        self.append(backtest.ID, backtest.ticker, backtest.algo.__name__(), params,
+                    summarize_backtest(backtest), backtest.hist_positions)
+
+    def flush(self) -> None:
+        '''
+
+            Writes the buffered runs as a new summary segment
+
+            :return: No return
+            :rtype: None
+
+        '''
+        if not self._buffer:
+            return
+        frame = pd.DataFrame(self._buffer)
+        columns = {}
+        for col in frame.columns:
+            if col in KEY_COLUMNS:
+                columns[col] = frame[col].to_numpy(dtype=str)
+            else:
+                columns[col] = frame[col].to_numpy()
+
+        #* Named by time then a random suffix, so segments of concurrent writers never collide and still sort by age
+        segment_filestring = os.path.join(self.path, "summary", "seg_{:020d}_{}.npz".format(time.time_ns(), uuid.uuid4().hex))
+        #* Readers never see a partial segment
+        with atomic_write(segment_filestring) as pfile:
+            np.savez(pfile, **columns)
+
+        self._buffer = []
+        self._index = None
+
+    def index(self) -> pd.DataFrame:
+        '''
+
+            Loads the summary of every flushed run, without reading any equity curve
+
+            :returns: One row per run, indexed by ID
+            :rtype: pd.DataFrame
+
+        '''
+        if self._index is None:
+            segments = []
+            for segment_filestring in sorted(glob.glob(os.path.join(self.path, "summary", "seg_*.npz"))):
+                with np.load(segment_filestring) as segment:
+                    segments.append(pd.DataFrame({col: segment[col] for col in segment.files}))
+            if segments:
+                self._index = pd.concat(segments, ignore_index=True).set_index("ID")
+            else:
+                self._index = pd.DataFrame(columns=KEY_COLUMNS + ["Curve Offset", "Curve Length"]).set_index("ID")
+        return self._index
+
+    def query(self, **filters) -> pd.DataFrame:
+        '''
+
+            Filters the summary of every run
+
+            Each keyword names a column. A tuple (low, high) keeps rows within the inclusive range, with
+            None leaving a side open; a callable is applied to the column and must return a boolean mask;
+            any other value keeps rows equal to it.
+
+            :returns: Rows of the index matching every filter
+            :rtype: pd.DataFrame
+
+        '''
+        index = self.index()
+        mask = np.ones(len(index.index), dtype=bool)
+        for col, condition in filters.items():
+            values = index[col]
+            if isinstance(condition, tuple):
+                low, high = condition
+                if low is not None:
+                    mask &= (values >= low).to_numpy()
+                if high is not None:
+                    mask &= (values <= high).to_numpy()
+            elif callable(condition):
+                mask &= np.asarray(condition(values), dtype=bool)
+            else:
+                mask &= (values == condition).to_numpy()
+        return index[mask]
+
+    def load_curve(self, ID) -> pd.DataFrame:
+        '''
+
+            Reads the equity curve of a single run
+
+            :param ID: Identifier of the run
+            :type ID: uuid.UUID or str
+            :returns: Capital, Equity and Cash indexed by date
+            :rtype: pd.DataFrame
+
+        '''
+        row = self.index().loc[str(ID)]
+        if row["Curve Length"] == 0:
+            raise KeyError("No equity curve was archived for backtest " + str(ID))
+        records = np.fromfile(self.curve_filestring, dtype=CURVE_DTYPE, count=int(row["Curve Length"]),
+                              offset=int(row["Curve Offset"]) * CURVE_DTYPE.itemsize)
+        curve = pd.DataFrame({col: records[col] for col in ["Capital", "Equity", "Cash"]},
+                             index=pd.DatetimeIndex(records["Date"].astype("datetime64[ns]")))
+        return curve
+
+
+def summarize_backtest(backtest) -> dict:
+    '''
+
+        Computes the summary statistics archived for a backtest without any network access
+
+        :param backtest: Backtest whose run_backtest method has been called
+        :type backtest: Backtest
+        :returns: Summary statistics keyed by name
+        :rtype: dict
+
+    '''
+    capital = backtest.hist_positions["Capital"].to_numpy(dtype=np.float64)
+    daily_returns = np.diff(capital) / capital[:-1]
+    trade_pl = backtest._trade_pl()
+
+    sharpe, kelley = np.nan, np.nan
+    if len(daily_returns) > 1 and len(trade_pl) > 0:
+        sharpe, kelley, _, _ = MonteCarlo.path_statistics(trade_pl[None, :], daily_returns[None, :], capital[0])[0]
+
+    peaks = np.maximum.accumulate(capital)
+    return {
+        "Sharpe Ratio": sharpe,
+        "Kelley Criterion": kelley,
+        "Max Drawdown": ((peaks - capital) / peaks).max(),
+        "Final Capital": capital[-1],
+        "Return": (capital[-1] - capital[0]) / capital[0] * 100,
+        "Control P/L": backtest._profit_control(),
+        "Positions Taken": backtest._position_count(),
+    }
@@ -0,0 +1,275 @@
+import numpy as np
+
+#> Element-wise operators and the numpy function evaluating each of them
+BINARY = {
+    "add": np.add, "sub": np.subtract, "mul": np.multiply, "div": np.true_divide,
+    "lt": np.less, "le": np.less_equal, "gt": np.greater, "ge": np.greater_equal,
+    "and": np.logical_and, "or": np.logical_or,
+}
+UNARY = {"neg": np.negative, "not": np.logical_not, "abs": np.abs, "log": np.log, "sqrt": np.sqrt}
+
+
+#> Bytes of window temporaries a rolling statistic may hold at once, which bounds its memory to block x window
+ROLLING_BLOCK_BYTES = 2**20
+
+
+def _windows(values: np.ndarray, window: int) -> np.ndarray:
+    '''
+
+        Sliding windows over the first axis, laid out so every window is contiguous in memory
+
+        Reducing contiguous windows takes the same summation order whether a ticker is evaluated alone
+        or as a column of a panel, so both give bit for bit the same result.
+
+        :returns: View of shape (..., n - window + 1, window)
+        :rtype: np.ndarray
+
+    '''
+    series_last = np.ascontiguousarray(np.moveaxis(values, 0, -1))
+    return np.lib.stride_tricks.sliding_window_view(series_last, window, axis=-1)
+
+
+def _rolling(values: np.ndarray, window: int, reduce) -> np.ndarray:
+    '''
+
+        Reduces the sliding windows of values in blocks of rows, so temporaries never exceed ROLLING_BLOCK_BYTES
+
+        Every window is still reduced on its own, so the result does not depend on the block size.
+
+        :param reduce: Callable reducing a (..., rows, window) view to (..., rows)
+        :type reduce: callable
+        :returns: Reduced windows, nan for the first window - 1 rows
+        :rtype: np.ndarray
+
+    '''
+    out = np.full(values.shape, np.nan, dtype=values.dtype)
+    if len(values) < window:
+        return out
+    windows = _windows(values, window)
+    width = values[0].size * window * values.itemsize
+    block = max(ROLLING_BLOCK_BYTES // width, 1)
+    for start in range(0, windows.shape[-2], block):
+        stop = min(start + block, windows.shape[-2])
+        out[window - 1 + start:window - 1 + stop] = np.moveaxis(reduce(windows[..., start:stop, :]), -1, 0)
+    return out
+
+
+def rolling_mean_values(values: np.ndarray, window: int) -> np.ndarray:
+    '''
+
+        Rolling mean along the first axis, computed window by window
+
+        :param values: Series (n,) or panel (n, tickers) of values
+        :type values: np.ndarray
+        :param window: Number of rows in each window
+        :type window: int
+        :returns: Rolling mean, nan for the first window - 1 rows
+        :rtype: np.ndarray
+
+    '''
+    return _rolling(values, window, lambda windows: windows.mean(axis=-1))
+
+
+def rolling_std_values(values: np.ndarray, window: int) -> np.ndarray:
+    '''
+
+        Rolling sample standard deviation along the first axis, computed window by window
+
+        :param values: Series (n,) or panel (n, tickers) of values
+        :type values: np.ndarray
+        :param window: Number of rows in each window
+        :type window: int
+        :returns: Rolling standard deviation, nan for the first window - 1 rows
+        :rtype: np.ndarray
+
+    '''
+    return _rolling(values, window, lambda windows: windows.std(axis=-1, ddof=1))
+
+
+def shift_values(values: np.ndarray, periods: int) -> np.ndarray:
+    '''
+
+        Shifts values down the first axis as pandas' shift, filling with nan (False for masks)
+
+    '''
+    out = np.full(values.shape, False if values.dtype == bool else np.nan, dtype=values.dtype)
+    if periods == 0:
+        out[:] = values
+    elif periods > 0:
+        out[periods:] = values[:-periods]
+    else:
+        out[:periods] = values[-periods:]
+    return out
+
+
+class Expr:
+
+    def __init__(self, op: str, args=(), param=None):
+        '''
+
+            Node of a signal expression
+
+            Expressions are built with the column function, arithmetic, comparison and &, |, ~ operators,
+            the abs, log and sqrt methods, and the shift, rolling_mean and rolling_std methods. Two nodes built the same way share the
+            same key, which is what lets Strategy evaluate a common subexpression once.
+
+            :param op: Name of the operation
+            :type op: str
+            :param args: Operand expressions
+            :type args: tuple[Expr]
+            :param param: Column name, constant, shift or window of the operation
+            :type param: str or float or int or None
+
+        '''
+        self.op = op
+        self.args = tuple(_wrap(arg) for arg in args)
+        self.param = param
+        #* Constants are keyed with their type too, or 2 and 2.0 would be merged into whichever came first
+        self.key = (op, (type(param), param) if op == "const" else param, tuple(arg.key for arg in self.args))
+
+    def __repr__(self) -> str:
+        if self.op == "col":
+            return "col(" + repr(self.param) + ")"
+        if self.op == "const":
+            return repr(self.param)
+        return self.op + "(" + ", ".join([repr(arg) for arg in self.args] + ([repr(self.param)] if self.param is not None else [])) + ")"
+
+    def __add__(self, other): return Expr("add", (self, other))
+    def __radd__(self, other): return Expr("add", (other, self))
+    def __sub__(self, other): return Expr("sub", (self, other))
+    def __rsub__(self, other): return Expr("sub", (other, self))
+    def __mul__(self, other): return Expr("mul", (self, other))
+    def __rmul__(self, other): return Expr("mul", (other, self))
+    def __truediv__(self, other): return Expr("div", (self, other))
+    def __rtruediv__(self, other): return Expr("div", (other, self))
+    def __neg__(self): return Expr("neg", (self,))
+    def __lt__(self, other): return Expr("lt", (self, other))
+    def __le__(self, other): return Expr("le", (self, other))
+    def __gt__(self, other): return Expr("gt", (self, other))
+    def __ge__(self, other): return Expr("ge", (self, other))
+    def __and__(self, other): return Expr("and", (self, other))
+    def __rand__(self, other): return Expr("and", (other, self))
+    def __or__(self, other): return Expr("or", (self, other))
+    def __ror__(self, other): return Expr("or", (other, self))
+    def __invert__(self): return Expr("not", (self,))
+
+    def abs(self):
+        return Expr("abs", (self,))
+
+    def log(self):
+        return Expr("log", (self,))
+
+    def sqrt(self):
+        return Expr("sqrt", (self,))
+
+    def shift(self, periods: int = 1):
+        return Expr("shift", (self,), periods)
+
+    def rolling_mean(self, window: int):
+        return Expr("rolling_mean", (self,), window)
+
+    def rolling_std(self, window: int):
+        return Expr("rolling_std", (self,), window)
+
+
+def _wrap(value) -> Expr:
+    return value if isinstance(value, Expr) else Expr("const", (), value)
+
+
+def column(name: str) -> Expr:
+    '''
+
+        :returns: Expression reading a column of the evaluated data
+        :rtype: Expr
+
+    '''
+    return Expr("col", (), name)
+
+
+def where(condition, if_true, if_false) -> Expr:
+    '''
+
+        :returns: Expression taking if_true where condition holds and if_false elsewhere, as np.where
+        :rtype: Expr
+
+    '''
+    return Expr("where", (condition, if_true, if_false))
+
+
+class Strategy:
+
+    def __init__(self, outputs: dict):
+        '''
+
+            Compiles named signal expressions into a single program evaluated over whole arrays
+
+            Every distinct subexpression becomes one step of the program, however many outputs use it,
+            and intermediate arrays are released after their last use.
+
+            :param outputs: Expressions keyed by the name of the column they produce, in output order
+            :type outputs: dict
+
+        '''
+        self.outputs = dict(outputs)
+        self.steps = []
+        slots = {}
+
+        def visit(expr):
+            if expr.key not in slots:
+                arg_slots = tuple(visit(arg) for arg in expr.args)
+                slots[expr.key] = len(self.steps)
+                self.steps.append((expr.op, expr.param, arg_slots))
+            return slots[expr.key]
+
+        self.output_slots = {name: visit(_wrap(expr)) for name, expr in self.outputs.items()}
+        self.columns = sorted(set(param for op, param, _ in self.steps if op == "col"))
+
+        #* Last step reading each slot, outputs being kept to the end
+        self.last_use = {}
+        for i, (_, _, arg_slots) in enumerate(self.steps):
+            for slot in arg_slots:
+                self.last_use[slot] = i
+        for slot in self.output_slots.values():
+            self.last_use[slot] = len(self.steps)
+
+    def evaluate(self, data, dtype=np.float64) -> dict:
+        '''
+
+            Evaluates every output over a series or a panel
+
+            :param data: Frame with one row per bar, or mapping of column name to (bars,) or (bars x tickers) array
+            :type data: pd.DataFrame or dict
+            :param dtype: Floating point type columns are read as, which every numeric output then has
+            :type dtype: np.dtype
+            :returns: Array of every output keyed by name
+            :rtype: dict
+
+        '''
+        values = [None] * len(self.steps)
+        for i, (op, param, arg_slots) in enumerate(self.steps):
+            args = [values[slot] for slot in arg_slots]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                if op == "col":
+                    values[i] = np.asarray(data[param], dtype=dtype)
+                elif op == "const":
+                    values[i] = param
+                elif op in BINARY:
+                    values[i] = BINARY[op](*args)
+                elif op in UNARY:
+                    values[i] = UNARY[op](*args)
+                elif op == "where":
+                    values[i] = np.where(*args)
+                elif op == "shift":
+                    values[i] = shift_values(args[0], param)
+                elif op == "rolling_mean":
+                    values[i] = rolling_mean_values(args[0], param)
+                elif op == "rolling_std":
+                    values[i] = rolling_std_values(args[0], param)
+                else:
+                    raise ValueError("Unknown operation " + op)
+
+            for slot in arg_slots:
+                if self.last_use[slot] == i:
+                    values[slot] = None
+
+        return {name: values[slot] for name, slot in self.output_slots.items()}
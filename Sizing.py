@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+
+def trade_returns(close, codes) -> tuple:
+    '''
+
+        Return of every trade taken by a sequence of positions, independently of how it is sized
+
+        :param close: Closing price of every bar
+        :type close: np.ndarray
+        :param codes: Position held on every bar, 1 long, -1 short and 0 neutral
+        :type codes: np.ndarray
+        :returns: Bar every trade is closed on and its return, ordered by closing bar; a trade still open at the last bar is left out
+        :rtype: tuple[np.ndarray]
+
+    '''
+    close = np.asarray(close, dtype=np.float64)
+    codes = np.asarray(codes, dtype=np.int8)
+    changes = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+    #* Every change closes the position held before it and opens the one held after it
+    opens = np.concatenate([[0], changes])
+    held = codes[opens]
+    entries, exits, sides = opens[:-1], changes, held[:-1]
+    taken = sides != 0
+    entries, exits, sides = entries[taken], exits[taken], sides[taken]
+    return exits, sides * (close[exits] - close[entries]) / close[entries]
+
+
+def kelly_fractions(close, codes, window: int = 20, fraction: float = 0.5, default: float = 1.0, cap: float = 1.0) -> np.ndarray:
+    '''
+
+        Fractional Kelly sizing from the trades of a rolling window
+
+        On every bar, the Kelly fraction p - (1 - p) / r is computed from the last window trades closed
+        on or before it, p being the share of winning trades and r the ratio of the average win to the
+        average loss. Unlike the Kelley criterion reported by Backtest, which divides win and loss
+        counts, r weighs trades by their returns, as the fraction is meant to size positions.
+
+        :param close: Closing price of every bar
+        :type close: np.ndarray
+        :param codes: Position held on every bar, 1 long, -1 short and 0 neutral
+        :type codes: np.ndarray
+        :param window: Number of closed trades the fraction is estimated from
+        :type window: int
+        :param fraction: Share of the Kelly fraction taken, 0.5 for half Kelly
+        :type fraction: float
+        :param default: Fraction used until window trades were closed or while the Kelly fraction is undefined
+        :type default: float
+        :param cap: Largest fraction, 1 to never borrow
+        :type cap: float
+        :returns: Fraction of capital committed by an entry on every bar
+        :rtype: np.ndarray
+
+    '''
+    exits, returns = trade_returns(close, codes)
+    wins, losses = returns > 0, returns < 0
+    #* Running totals over the trades, so any window of trades is a difference of two entries
+    win_count = np.concatenate([[0], np.cumsum(wins)])
+    loss_count = np.concatenate([[0], np.cumsum(losses)])
+    win_total = np.concatenate([[0.0], np.cumsum(np.where(wins, returns, 0.0))])
+    loss_total = np.concatenate([[0.0], np.cumsum(np.where(losses, -returns, 0.0))])
+
+    closed = np.searchsorted(exits, np.arange(len(codes)), side="right")
+    first = np.maximum(closed - window, 0)
+    n_wins = win_count[closed] - win_count[first]
+    n_losses = loss_count[closed] - loss_count[first]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        payoff = ((win_total[closed] - win_total[first]) / n_wins) / ((loss_total[closed] - loss_total[first]) / n_losses)
+        kelly = n_wins / (closed - first) - (n_losses / (closed - first)) / payoff
+
+    fractions = np.clip(fraction * kelly, 0.0, cap)
+    return np.where((closed >= window) & (n_wins > 0) & (n_losses > 0), fractions, default)
+
+
+def inverse_volatility_fractions(close, stdev, target: float = 0.05, default: float = 1.0, cap: float = 1.0) -> np.ndarray:
+    '''
+
+        Volatility targeted sizing from the 90 day standard deviation of closes computed by MinhsAlgo
+
+        The standard deviation is in dollars, so it is divided by the close to be compared between
+        prices; positions are scaled so that this relative volatility times the fraction is the target.
+
+        :param close: Closing price of every bar
+        :type close: np.ndarray
+        :param stdev: Rolling standard deviation of closes, such as MinhsAlgo's Stdev column
+        :type stdev: np.ndarray
+        :param target: Relative volatility targeted by every position
+        :type target: float
+        :param default: Fraction used while the standard deviation is undefined
+        :type default: float
+        :param cap: Largest fraction, 1 to never borrow
+        :type cap: float
+        :returns: Fraction of capital committed by an entry on every bar
+        :rtype: np.ndarray
+
+    '''
+    volatility = np.asarray(stdev, dtype=np.float64) / np.asarray(close, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fractions = np.minimum(target / volatility, cap)
+    return np.where(volatility > 0, fractions, default)
+
+
+def equal_risk_fractions(volatility: pd.DataFrame, active=None, cap: float = 1.0) -> pd.DataFrame:
+    '''
+
+        Equal risk sizing across a portfolio, each ticker's weight being inversely proportional to its volatility
+
+        Weights are normalized over the tickers active on each bar, so they add up to one and every
+        active ticker contributes the same volatility. A weight above cap is cut to it and the excess is
+        redistributed among the uncapped tickers, in proportion to their inverse volatility, until none
+        exceeds it. The weights still add up to one, unless every active ticker is at the cap, in which
+        case the bar is under-invested. Each is the fraction of the portfolio's capital committed to
+        that ticker, so it is used with the backtest of every ticker starting from the whole capital.
+
+        :param volatility: Relative volatility of every ticker, one row per bar and one column per ticker
+        :type volatility: pd.DataFrame
+        :param active: Whether every ticker holds or may enter a position on every bar, defaults to every ticker with a volatility
+        :type active: pd.DataFrame or None
+        :param cap: Largest weight of a single ticker
+        :type cap: float
+        :returns: Weight of every ticker on every bar, 0 where inactive
+        :rtype: pd.DataFrame
+
+    '''
+    values = volatility.to_numpy(dtype=np.float64)
+    mask = values > 0
+    if active is not None:
+        mask &= np.asarray(active, dtype=bool)
+    with np.errstate(divide="ignore"):
+        inverse = np.where(mask, 1 / np.where(mask, values, 1.0), 0.0)
+
+    #* Every pass caps at least one more ticker of the bars still over the cap, so there are at most as many passes as tickers
+    capped = np.zeros(mask.shape, dtype=bool)
+    for _ in range(mask.shape[1] + 1):
+        free = np.where(capped, 0.0, inverse)
+        totals = free.sum(axis=1, keepdims=True)
+        budget = 1 - cap * capped.sum(axis=1, keepdims=True)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weights = np.where(capped, cap, np.where(totals > 0, free * budget / totals, 0.0))
+        over = weights > cap
+        if not over.any():
+            break
+        capped |= over
+    return pd.DataFrame(weights, index=volatility.index, columns=volatility.columns)
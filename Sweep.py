@@ -0,0 +1,457 @@
+import os
+import sys
+import time
+import json
+import uuid
+import secrets
+import argparse
+import importlib
+import threading
+from collections import deque
+from multiprocessing.connection import Listener, Client
+import numpy as np
+import pandas as pd
+from AtomicFile import atomic_write
+
+#> Run IDs are derived from the task, so a task re-run after a crash writes under the same ID
+SWEEP_NAMESPACE = uuid.UUID("5b0f4c3e-8a47-4a5e-9c35-0f1f2d6c7a10")
+#> Environment variable holding the hex authentication key of a sweep, read by workers started from the command line
+AUTHKEY_VARIABLE = "SWEEP_AUTHKEY"
+
+
+def load_authkey(filestring=None) -> bytes:
+    '''
+
+        Reads the key a worker presents to its coordinator, from a file or from the AUTHKEY_VARIABLE environment variable
+
+        :param filestring: File holding the key as hex, or None to read the environment variable
+        :type filestring: str or None
+        :raises KeyError: If no file is given and the environment variable is not set
+        :returns: Authentication key
+        :rtype: bytes
+
+    '''
+    if filestring is not None:
+        with open(filestring, "r") as pfile:
+            return bytes.fromhex(pfile.read().strip())
+    if AUTHKEY_VARIABLE not in os.environ:
+        raise KeyError("Pass --authkey-file or set " + AUTHKEY_VARIABLE + " to the key the coordinator printed or wrote to its --authkey-file")
+    return bytes.fromhex(os.environ[AUTHKEY_VARIABLE])
+
+
+def save_authkey(authkey: bytes, filestring=None) -> None:
+    '''
+
+        Hands a coordinator's key to the workers, as a file only the owner can read or printed as the AUTHKEY_VARIABLE assignment
+
+        :param authkey: Authentication key, the authkey attribute of the coordinator
+        :type authkey: bytes
+        :param filestring: File the key is written to as hex, on storage shared with the workers, or None to print it
+        :type filestring: str or None
+        :return: No return
+        :rtype: None
+
+    '''
+    if filestring is None:
+        print(AUTHKEY_VARIABLE + "=" + authkey.hex(), flush=True)
+        return
+    #* Workers polling the shared file never read half a key
+    with atomic_write(filestring, "w", permissions=0o600) as pfile:
+        pfile.write(authkey.hex() + "\n")
+
+
+def task_id(ticker: str, params: dict) -> str:
+    '''
+
+        Deterministic ID of a (ticker, params) task, used as the run ID in the results archive
+
+        :returns: UUID derived from the ticker and the sorted JSON of the params
+        :rtype: str
+
+    '''
+    return str(uuid.uuid5(SWEEP_NAMESPACE, ticker + json.dumps(params, sort_keys=True)))
+
+
+class SweepCoordinator:
+
+    def __init__(self, tasks: list, archive, strategy: str, address=("127.0.0.1", 0), authkey=None,
+                 lease_timeout: float = 600.0, max_attempts: int = 3, monitor=None, drain_timeout: float = 5.0):
+        '''
+
+            Hands (ticker, params) tasks out to workers over a socket and writes their results to an archive
+
+            A worker holds a lease on the task it was given. Leases that are not answered within
+            lease_timeout, or whose worker disconnects, go back to the queue and are handed out again.
+            Every lease counts as an attempt, so a task that keeps killing its workers is given up after
+            max_attempts like one that keeps raising. Results are written under the task's deterministic
+            ID only once, so a late answer from a worker presumed dead is dropped.
+
+            Messages are pickled, so anyone holding the key can run code on the coordinator and on the
+            workers: the key must stay secret, and is drawn at random unless one is given. save_authkey
+            hands it to the workers, which read it back with load_authkey. Run from the command line,
+            the coordinator does so itself.
+
+            :param tasks: (ticker, params) pairs being swept
+            :type tasks: list[tuple]
+            :param archive: Archive receiving the results
+            :type archive: ResultsArchive.ResultsArchive
+            :param strategy: Name of the strategy recorded in the archive
+            :type strategy: str
+            :param address: (host, port) the coordinator listens on, port 0 picking a free one
+            :type address: tuple
+            :param authkey: Key workers must present to connect, or None to draw a random one, shared with workers as authkey.hex()
+            :type authkey: bytes or None
+            :param lease_timeout: Seconds a worker may hold a task before it is handed to another
+            :type lease_timeout: float
+            :param max_attempts: Number of times a task raising an error is tried before it is given up
+            :type max_attempts: int
+            :param monitor: Receiver of start, stage, result, error and finish events through post(event, **fields), or None
+            :type monitor: Dashboard.Dashboard or None
+            :param drain_timeout: Seconds the finished sweep waits for idle workers to be told it is over
+            :type drain_timeout: float
+
+        '''
+        self.tasks = {task_id(ticker, params): (ticker, params) for ticker, params in tasks}
+        self.archive = archive
+        self.strategy = strategy
+        self.authkey = secrets.token_bytes(32) if authkey is None else authkey
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.monitor = monitor
+        self.drain_timeout = drain_timeout
+
+        #* Tasks already in the archive, say from an interrupted sweep, are not run again
+        self.pending = deque(ID for ID in self.tasks if ID not in self.archive)
+        self.leases = {}
+        self.attempts = {ID: 0 for ID in self.tasks}
+        self.completed = set(ID for ID in self.tasks if ID in self.archive)
+        self.errors = {}
+
+        self._lock = threading.Lock()
+        #* Notified whenever a worker connects, disconnects, takes a task or answers one
+        self._workers_changed = threading.Condition(self._lock)
+        #> Connected workers keyed by connection, True while one holds a task it has not answered
+        self._busy = {}
+        self._finished = threading.Event()
+        self._listener = Listener(address, authkey=self.authkey)
+        self.address = self._listener.address
+        if self._is_finished():
+            self._finished.set()
+
+    def _is_finished(self) -> bool:
+        return len(self.completed) + len(self.errors) == len(self.tasks)
+
+    def _post(self, event: str, **fields) -> None:
+        if self.monitor is not None:
+            self.monitor.post(event, **fields)
+
+    def _reclaim(self, worker=None) -> None:
+        '''
+
+            Puts leases that expired, or that are held by a disconnected worker, back on the queue
+
+        '''
+        now = time.monotonic()
+        for ID, (holder, deadline) in list(self.leases.items()):
+            if deadline < now or holder == worker:
+                del self.leases[ID]
+                if self.attempts[ID] < self.max_attempts:
+                    self.pending.append(ID)
+                    continue
+                #* Its lease was its last attempt, and lost, say because the task keeps crashing its worker
+                error = "Lease of " + str(holder) + (" expired" if deadline < now else " lost as the worker disconnected")
+                self.errors[ID] = error
+                self._post("error", ticker=self.tasks[ID][0], error=error, attempt=self.attempts[ID], given_up=True, worker=holder, ID=ID)
+        if self._is_finished():
+            self._finished.set()
+
+    def _next_message(self, worker: str) -> tuple:
+        '''
+
+            Leases the next task to a worker
+
+            :returns: ("task", ID, ticker, params), ("wait", seconds) while leases are outstanding, or ("done",)
+            :rtype: tuple
+
+        '''
+        with self._lock:
+            self._reclaim()
+            while self.pending:
+                ID = self.pending.popleft()
+                if ID in self.completed or ID in self.errors:
+                    continue
+                self.leases[ID] = (worker, time.monotonic() + self.lease_timeout)
+                self.attempts[ID] += 1
+                ticker, params = self.tasks[ID]
+                return ("task", ID, ticker, params)
+            if self._is_finished():
+                return ("done",)
+            return ("wait", min(1.0, self.lease_timeout / 4))
+
+    def _record(self, worker: str, message: tuple) -> None:
+        '''
+
+            Writes a worker's result to the archive, or re-queues the task after an error
+
+        '''
+        kind, ID = message[0], message[1]
+        with self._lock:
+            holder, deadline = self.leases.get(ID, (None, None))
+            if holder == worker:
+                del self.leases[ID]
+            if ID in self.completed or ID in self.errors:
+                return
+
+            ticker, params = self.tasks[ID]
+            #* Time the worker held its lease, unknown for a late answer to a lease already reclaimed
+            seconds = time.monotonic() - (deadline - self.lease_timeout) if holder == worker else None
+            if kind == "result":
+                stats, curve = message[2], message[3]
+                if ID not in self.archive:
+                    self.archive.append(ID, ticker, self.strategy, params, stats, curve)
+                self.completed.add(ID)
+                self._post("result", ticker=ticker, stats=stats, seconds=seconds, worker=worker, ID=ID, params=params)
+            else:
+                given_up = self.attempts[ID] >= self.max_attempts
+                if given_up:
+                    self.errors[ID] = message[2]
+                elif ID not in self.leases and ID not in self.pending:
+                    self.pending.append(ID)
+                self._post("error", ticker=ticker, error=message[2], attempt=self.attempts[ID], given_up=given_up, worker=worker, ID=ID)
+            if seconds is not None:
+                self._post("stage", ticker=ticker, stage="task", seconds=seconds)
+
+            if self._is_finished():
+                self._finished.set()
+
+    def _serve_connection(self, conn) -> None:
+        '''
+
+            Answers one worker until it disconnects
+
+        '''
+        worker = None
+        with self._lock:
+            self._busy[conn] = False
+        try:
+            worker = conn.recv()[1]
+            while True:
+                message = conn.recv()
+                if message[0] == "request":
+                    reply = self._next_message(worker)
+                    self._set_busy(conn, reply[0] == "task")
+                    conn.send(reply)
+                else:
+                    self._record(worker, message)
+                    self._set_busy(conn, False)
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+            with self._lock:
+                self._reclaim(worker)
+                del self._busy[conn]
+                self._workers_changed.notify_all()
+
+    def _set_busy(self, conn, busy: bool) -> None:
+        with self._lock:
+            self._busy[conn] = busy
+            self._workers_changed.notify_all()
+
+    def _watch_leases(self) -> None:
+        #* Workers only ask for work between tasks, so if every worker hangs, expired leases are only reclaimed here
+        while not self._finished.wait(min(1.0, self.lease_timeout / 4)):
+            with self._lock:
+                self._reclaim()
+
+    def _accept(self) -> None:
+        while not self._finished.is_set():
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+    def start(self) -> None:
+        '''
+
+            Starts accepting workers, and reclaiming expired leases, in the background
+
+            :return: No return
+            :rtype: None
+
+        '''
+        self._post("start", total=len(self.tasks) - len(self.completed), strategy=self.strategy)
+        threading.Thread(target=self._accept, daemon=True).start()
+        threading.Thread(target=self._watch_leases, daemon=True).start()
+
+    def wait(self, timeout=None) -> dict:
+        '''
+
+            Blocks until every task completed or was given up, then flushes the archive
+
+            :param timeout: Seconds to wait, or None to wait indefinitely
+            :type timeout: float or None
+            :raises TimeoutError: If the sweep did not finish in time
+            :returns: Number of completed tasks and the error of every task given up, keyed by ID
+            :rtype: dict
+
+        '''
+        finished = self._finished.wait(timeout)
+        with self._lock:
+            self.archive.flush()
+        if finished:
+            self._post("finish")
+        if not finished:
+            raise TimeoutError(str(len(self.tasks) - len(self.completed) - len(self.errors)) + " tasks still outstanding")
+        #* Idle workers are told the sweep is over on their next request, which is at most a wait away. Workers...
+        #* ...still busy with a task given to another are told when they answer, through their open connection
+        with self._workers_changed:
+            self._workers_changed.wait_for(lambda: all(self._busy.values()), timeout=self.drain_timeout)
+        self._listener.close()
+        return {"Completed": len(self.completed), "Errors": dict(self.errors)}
+
+    def run(self, timeout=None) -> dict:
+        '''
+
+            Runs the sweep to completion
+
+            :returns: Same as wait
+            :rtype: dict
+
+        '''
+        self.start()
+        return self.wait(timeout)
+
+
+def run_worker(address, authkey: bytes, task, name=None) -> int:
+    '''
+
+        Pulls tasks from a coordinator until the sweep is over
+
+        :param address: (host, port) of the coordinator
+        :type address: tuple
+        :param authkey: Key the coordinator expects
+        :type authkey: bytes
+        :param task: Callable taking (ticker, params) and returning (stats dict, curve frame or None)
+        :type task: callable
+        :param name: Name of the worker, defaults to a random one
+        :type name: str or None
+        :returns: Number of tasks run
+        :rtype: int
+
+    '''
+    name = name or "worker-" + uuid.uuid4().hex[:8]
+    conn = Client(tuple(address), authkey=authkey)
+    conn.send(("hello", name))
+    n_tasks = 0
+    try:
+        while True:
+            conn.send(("request",))
+            message = conn.recv()
+            if message[0] == "done":
+                return n_tasks
+            if message[0] == "wait":
+                time.sleep(message[1])
+                continue
+
+            _, ID, ticker, params = message
+            n_tasks += 1
+            try:
+                stats, curve = task(ticker, params)
+                conn.send(("result", ID, stats, curve))
+            except Exception as err:
+                conn.send(("error", ID, repr(err)))
+    except (EOFError, OSError):
+        #* The coordinator closed its listener once the sweep was over
+        return n_tasks
+    finally:
+        conn.close()
+
+
+def minhs_task(ticker: str, params: dict) -> tuple:
+    '''
+
+        Backtests MinhsAlgo on a ticker read from a bar store shared by every node
+
+        :param ticker: Ticker being backtested
+        :type ticker: str
+        :param params: "store" path of the MinuteStore of daily bars, and optional "capital" and "memory_budget"
+        :type params: dict
+        :returns: Summary statistics and the capital curve
+        :rtype: tuple
+
+    '''
+    import MinuteStore
+    import ChunkedPipeline
+
+    pipeline = ChunkedPipeline.ChunkedPipeline(MinuteStore.MinuteStore(params["store"]),
+                                               memory_budget=params.get("memory_budget", 256 * 2**20))
+    capital = params.get("capital", 10000.0)
+    history = pd.concat(chunk[["Rets", "Capital"]] for chunk in pipeline.iter_backtest(ticker, capital))
+
+    rets = history["Rets"].to_numpy()
+    peaks = np.maximum.accumulate(history["Capital"].to_numpy())
+    std = rets.std(ddof=1)
+    stats = {
+        "Sharpe Ratio": rets.mean() * 252 / (std * np.sqrt(252)) if std > 0 else np.nan,
+        "Max Drawdown": ((peaks - history["Capital"].to_numpy()) / peaks).max(),
+        "Final Capital": history["Capital"].iloc[-1],
+        "Return": (history["Capital"].iloc[-1] - capital) / capital * 100,
+        "Positions Taken": int((rets != 0).sum()),
+    }
+    #* Positions are opened at the open and closed at the close, so the portfolio is all cash at every close
+    curve = pd.DataFrame({"Capital": history["Capital"], "Equity": 0.0, "Cash": history["Capital"]})
+    return stats, curve
+
+
+def load_task(spec: str):
+    '''
+
+        Resolves a "module:function" string to the task function
+
+    '''
+    module, function = spec.split(":")
+    return getattr(importlib.import_module(module), function)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distributed universe sweep")
+    modes = parser.add_subparsers(dest="mode", required=True)
+
+    coordinator_parser = modes.add_parser("coordinator", help="Hand the tickers of a bar store out to workers and archive their results")
+    coordinator_parser.add_argument("archive", help="Directory of the ResultsArchive")
+    coordinator_parser.add_argument("store", help="MinuteStore of daily bars, readable by every worker at the same path")
+    coordinator_parser.add_argument("--tickers", nargs="*", default=None, help="Tickers swept, defaults to every ticker of the store")
+    coordinator_parser.add_argument("--capital", type=float, default=10000.0)
+    coordinator_parser.add_argument("--host", default="0.0.0.0")
+    coordinator_parser.add_argument("--port", type=int, default=0)
+    coordinator_parser.add_argument("--authkey-file", default=None, help="File the key is written to for the workers, instead of printing it")
+    coordinator_parser.add_argument("--lease-timeout", type=float, default=600.0)
+    coordinator_parser.add_argument("--max-attempts", type=int, default=3)
+
+    worker_parser = modes.add_parser("worker", help="Run the tasks of a coordinator")
+    worker_parser.add_argument("host")
+    worker_parser.add_argument("port", type=int)
+    worker_parser.add_argument("--authkey-file", default=None, help="File holding the coordinator's key as hex, instead of " + AUTHKEY_VARIABLE)
+    worker_parser.add_argument("--task", default="Sweep:minhs_task")
+    worker_parser.add_argument("--name", default=None)
+    args = parser.parse_args()
+
+    if args.mode == "coordinator":
+        import MinuteStore
+        import ResultsArchive
+
+        tickers = args.tickers or MinuteStore.MinuteStore(args.store).tickers()
+        tasks = [(ticker, {"store": os.path.abspath(args.store), "capital": args.capital}) for ticker in tickers]
+        coordinator = SweepCoordinator(tasks, ResultsArchive.ResultsArchive(args.archive), "MinhsAlgo", (args.host, args.port),
+                                       lease_timeout=args.lease_timeout, max_attempts=args.max_attempts)
+        save_authkey(coordinator.authkey, args.authkey_file)
+        print("Listening on " + str(coordinator.address[0]) + ":" + str(coordinator.address[1]) + " for " + str(len(tasks)) + " tasks", flush=True)
+        summary = coordinator.run()
+        print("Completed " + str(summary["Completed"]) + " tasks, gave up " + str(len(summary["Errors"])))
+        sys.exit(0 if not summary["Errors"] else 1)
+
+    n_tasks = run_worker((args.host, args.port), load_authkey(args.authkey_file), load_task(args.task), args.name)
+    print("Ran " + str(n_tasks) + " tasks")
+    sys.exit(0)
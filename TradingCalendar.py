@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+NS_PER_DAY = 24 * 60 * 60 * 10**9
+
+
+class TradingCalendar:
+
+    def __init__(self, index):
+        '''
+
+            Sorted trading sessions of one ticker as int64 day numbers, for O(log n) date lookups
+
+            Built once from the index of a ticker's price history and shared by everything that needs
+            to turn a calendar date into a row of that history.
+
+            :param index: Index of the ticker's daily price history
+            :type index: pd.DatetimeIndex
+
+        '''
+        index = pd.DatetimeIndex(index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        self.sessions = index.values.astype("datetime64[D]").astype(np.int64)
+        if len(self.sessions) > 1 and not (np.diff(self.sessions) > 0).all():
+            raise ValueError("Trading sessions must be unique and sorted")
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    @staticmethod
+    def day_number(day) -> int:
+        '''
+
+            Converts a date to the number of days since the epoch
+
+            :param day: Date being converted, any time of day is dropped
+            :type day: str or pd.Timestamp
+            :returns: Day number
+            :rtype: int
+
+        '''
+        stamp = pd.Timestamp(day)
+        if stamp.tz is not None:
+            stamp = stamp.tz_localize(None)
+        return stamp.value // NS_PER_DAY
+
+    def timestamp(self, position: int) -> pd.Timestamp:
+        '''
+
+            :returns: Date of the session at a position
+            :rtype: pd.Timestamp
+
+        '''
+        return pd.Timestamp(self.sessions[position] * NS_PER_DAY)
+
+    def get_loc(self, day) -> int:
+        '''
+
+            Position of the session held on a date
+
+            :raises KeyError: If the market was closed on that date
+            :returns: Position of the session
+            :rtype: int
+
+        '''
+        number = self.day_number(day)
+        position = np.searchsorted(self.sessions, number)
+        if position == len(self.sessions) or self.sessions[position] != number:
+            raise KeyError(str(pd.Timestamp(day)) + " is not a trading session")
+        return int(position)
+
+    def previous_session(self, day, max_gap=None) -> int:
+        '''
+
+            Position of the last session held on or before a date
+
+            :param day: Date being looked up
+            :type day: str or pd.Timestamp
+            :param max_gap: Largest number of calendar days allowed between the date and the session, or None
+            :type max_gap: int or None
+            :raises KeyError: If the date is before the first session
+            :raises ValueError: If the session found is further back than max_gap
+            :returns: Position of the session
+            :rtype: int
+
+        '''
+        number = self.day_number(day)
+        position = np.searchsorted(self.sessions, number, side="right") - 1
+        if position < 0:
+            raise KeyError(str(pd.Timestamp(day)) + " is before the first trading session")
+        if max_gap is not None and number - self.sessions[position] > max_gap:
+            raise ValueError("No trading session within " + str(max_gap) + " days before " + str(pd.Timestamp(day)))
+        return int(position)
+
+    def sessions_back(self, day, n: int) -> int:
+        '''
+
+            Position of the session n sessions before the session held on a date
+
+            :raises KeyError: If the market was closed on that date
+            :raises IndexError: If fewer than n sessions precede it
+            :returns: Position of the session
+            :rtype: int
+
+        '''
+        position = self.get_loc(day) - n
+        if position < 0:
+            raise IndexError("Fewer than " + str(n) + " sessions before " + str(pd.Timestamp(day)))
+        return position
+
+    def slice(self, start, end) -> slice:
+        '''
+
+            Positions of the sessions held between two dates, both inclusive
+
+            :returns: Slice usable with DataFrame.iloc
+            :rtype: slice
+
+        '''
+        lo = np.searchsorted(self.sessions, self.day_number(start), side="left")
+        hi = np.searchsorted(self.sessions, self.day_number(end), side="right")
+        return slice(int(lo), int(hi))
+
+    def gaps(self, min_days: int = 7) -> pd.DataFrame:
+        '''
+
+            Finds holes in the history, such as the multi-month one of "EAI"
+
+            :param min_days: Smallest number of calendar days between consecutive sessions reported
+            :type min_days: int
+            :returns: Last session before and first session after every gap, with its length in days
+            :rtype: pd.DataFrame
+
+        '''
+        lengths = np.diff(self.sessions)
+        where = np.flatnonzero(lengths >= min_days)
+        return pd.DataFrame({
+            "Start": pd.to_datetime(self.sessions[where] * NS_PER_DAY),
+            "End": pd.to_datetime(self.sessions[where + 1] * NS_PER_DAY),
+            "Days": lengths[where],
+        })
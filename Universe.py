@@ -0,0 +1,229 @@
+import os
+import numpy as np
+import pandas as pd
+from AtomicFile import atomic_write
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Russell_3000_stock_list.xlsx")
+HEADER_ROWS = 7
+#> Metadata kept in the cache: few-valued columns as integer codes, the rest as plain arrays
+CATEGORIES = ["Sector", "Asset Class", "Location", "Exchange"]
+NUMBERS = ["Market Value", "Weight (%)", "Shares", "Price"]
+TEXT = ["Name"]
+
+#> Named universes, as the filters and top arguments of Universe.subset
+UNIVERSES = {
+    "russell3000": {"filters": {"Asset Class": "Equity", "Price": (0.01, None)}},
+    "russell1000": {"filters": {"Asset Class": "Equity", "Price": (0.01, None)}, "top": 1000},
+}
+
+
+def convert(source: str = SOURCE, cache=None) -> str:
+    '''
+
+        Parses the constituent list once and writes it as a compact .npz cache
+
+        Rows without a ticker ("--") are dropped and a ticker listed twice keeps its largest holding,
+        the list being sorted by weight. The ID of a ticker is its row in the cache.
+
+        :param source: Spreadsheet of the iShares Russell 3000 holdings
+        :type source: str
+        :param cache: Path of the cache, defaults to the source with a .npz extension
+        :type cache: str or None
+        :returns: Path of the cache
+        :rtype: str
+
+    '''
+    if cache is None:
+        cache = os.path.splitext(source)[0] + ".npz"
+    stocks = pd.read_excel(source, skiprows=range(0, HEADER_ROWS))
+    stocks = stocks[stocks["Ticker"] != "--"].drop_duplicates("Ticker")
+
+    columns = {"Ticker": stocks["Ticker"].to_numpy(dtype=str)}
+    for col in TEXT:
+        columns[col] = stocks[col].to_numpy(dtype=str)
+    for col in NUMBERS:
+        columns[col] = stocks[col].to_numpy(dtype=np.float64)
+    for col in CATEGORIES:
+        codes, categories = pd.factorize(stocks[col], sort=True)
+        columns[col] = codes.astype(np.int16)
+        columns[col + " Categories"] = np.asarray(categories, dtype=str)
+
+    stat = os.stat(source)
+    columns["Source Stamp"] = np.array([stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+
+    #* Concurrent workers never load a partial cache
+    with atomic_write(cache) as pfile:
+        np.savez(pfile, **columns)
+    return cache
+
+
+class Universe:
+
+    def __init__(self, table: dict, rows=None):
+        '''
+
+            Set of tickers with integer IDs and constituent metadata, usable as the ticker index of a price panel
+
+            Subsets share the table of the universe they come from, so a ticker keeps its ID in every
+            subset and panels of different subsets can be aligned on IDs.
+
+            :param table: Columns of the cache, as loaded by Universe.load
+            :type table: dict
+            :param rows: Rows of the table in this universe, in order, defaults to every row
+            :type rows: np.ndarray or None
+
+        '''
+        self.table = table
+        self.rows = np.arange(len(table["Ticker"])) if rows is None else np.asarray(rows, dtype=np.int64)
+        self.tickers = table["Ticker"][self.rows]
+        self._positions = {ticker: i for i, ticker in enumerate(self.tickers)}
+
+    @classmethod
+    def load(cls, source: str = SOURCE, cache=None):
+        '''
+
+            Loads the cached constituent list, converting the spreadsheet first if the cache is missing or stale
+
+            Only the cache is needed once it exists: a worker without the spreadsheet or openpyxl
+            loads it as is.
+
+            :param source: Spreadsheet of the iShares Russell 3000 holdings
+            :type source: str
+            :param cache: Path of the cache, defaults to the source with a .npz extension
+            :type cache: str or None
+            :returns: Universe of every ticker in the list
+            :rtype: Universe
+
+        '''
+        if cache is None:
+            cache = os.path.splitext(source)[0] + ".npz"
+        if not os.path.isfile(cache):
+            convert(source, cache)
+        elif os.path.isfile(source):
+            stat = os.stat(source)
+            with np.load(cache) as stored:
+                fresh = list(stored["Source Stamp"]) == [stat.st_mtime_ns, stat.st_size]
+            if not fresh:
+                convert(source, cache)
+
+        with np.load(cache) as stored:
+            table = {col: stored[col] for col in stored.files}
+        return cls(table)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.tickers.tolist())
+
+    def __contains__(self, ticker) -> bool:
+        return ticker in self._positions
+
+    def ids(self, tickers=None) -> np.ndarray:
+        '''
+
+            :param tickers: Tickers being looked up, defaults to every ticker of the universe in order
+            :type tickers: list[str] or None
+            :returns: Integer ID of every ticker
+            :rtype: np.ndarray
+            :raises KeyError: If a ticker is not in the universe
+
+        '''
+        if tickers is None:
+            return self.rows.copy()
+        return self.rows[[self._positions[ticker] for ticker in tickers]]
+
+    def index(self) -> pd.Index:
+        '''
+
+            :returns: Tickers of the universe, for the columns of a price panel
+            :rtype: pd.Index
+
+        '''
+        return pd.Index(self.tickers, name="Ticker")
+
+    def column(self, name: str) -> np.ndarray:
+        '''
+
+            :param name: Metadata column, such as Sector or Market Value
+            :type name: str
+            :returns: Values of the column for every ticker of the universe, category names for categorical columns
+            :rtype: np.ndarray
+
+        '''
+        values = self.table[name][self.rows]
+        if name in CATEGORIES:
+            values = self.table[name + " Categories"][values]
+        return values
+
+    def frame(self) -> pd.DataFrame:
+        '''
+
+            :returns: Every metadata column, indexed by ticker, with categorical columns as pd.Categorical
+            :rtype: pd.DataFrame
+
+        '''
+        columns = {"ID": self.rows}
+        for col in TEXT + CATEGORIES + NUMBERS:
+            if col in CATEGORIES:
+                columns[col] = pd.Categorical.from_codes(self.table[col][self.rows], self.table[col + " Categories"])
+            else:
+                columns[col] = self.table[col][self.rows]
+        return pd.DataFrame(columns, index=self.index())
+
+    def subset(self, filters=None, top=None, tickers=None):
+        '''
+
+            Filters the universe, keeping the IDs of its tickers
+
+            Each key of filters names a metadata column. A tuple (low, high) keeps tickers within the
+            inclusive range, with None leaving a side open; a list keeps tickers whose value is in it;
+            a callable is applied to the column and must return a boolean mask; any other value keeps
+            tickers equal to it.
+
+            :param filters: Conditions on metadata columns
+            :type filters: dict or None
+            :param top: Number of largest tickers by market value kept after filtering
+            :type top: int or None
+            :param tickers: Tickers kept, in the order of the universe, unknown tickers being ignored
+            :type tickers: list[str] or None
+            :returns: Universe of the tickers matching every condition
+            :rtype: Universe
+
+        '''
+        mask = np.ones(len(self.rows), dtype=bool)
+        for col, condition in (filters or {}).items():
+            values = self.column(col)
+            if isinstance(condition, tuple):
+                low, high = condition
+                if low is not None:
+                    mask &= values >= low
+                if high is not None:
+                    mask &= values <= high
+            elif isinstance(condition, list):
+                mask &= np.isin(values, condition)
+            elif callable(condition):
+                mask &= np.asarray(condition(values), dtype=bool)
+            else:
+                mask &= values == condition
+        if tickers is not None:
+            mask &= np.isin(self.tickers, list(tickers))
+
+        rows = self.rows[mask]
+        if top is not None:
+            #* Stable sort so ties keep their order in the list
+            order = np.argsort(-self.table["Market Value"][rows], kind="stable")[:top]
+            rows = rows[np.sort(order)]
+        return Universe(self.table, rows)
+
+    def named(self, name: str):
+        '''
+
+            :param name: Key of UNIVERSES
+            :type name: str
+            :returns: Subset defined by the named universe
+            :rtype: Universe
+            :raises KeyError: If the name is not defined
+
+        '''
+        return self.subset(**UNIVERSES[name])
@@ -1,5 +1,6 @@
 import yfinance as yf
 import pandas as pd
+from TradingCalendar import TradingCalendar
 
 class SMA20:
 
@@ -9,6 +10,8 @@ class SMA20:
         self.ticker = ticker
         self.is_long = is_long
         self.is_short = is_short
+        self.ticker_hist = None
+        self.calendar = None
         
     def get_ticker(self):
         ''' Provides the ticker symbol of the asset 
@@ -19,6 +22,18 @@ class SMA20:
         '''
         return self.ticker
 
+    def get_history(self):
+        ''' Downloads the price history of the asset once and builds its trading calendar
+
+            :returns: The full price history of the asset
+            :rtype: pd.DataFrame
+
+        '''
+        if self.ticker_hist is None:
+            self.ticker_hist = yf.Ticker(self.get_ticker()).history(period="max")
+            self.calendar = TradingCalendar(self.ticker_hist.index)
+        return self.ticker_hist
+
     def run_algo(self,start,stop):
         ''' Changes booleans is_long and is_short by propogating SMA20 trading algorithm 
             
@@ -36,19 +51,17 @@ class SMA20:
         if not get_type_check({start:str,stop:str}):
             raise TypeError("Type mismatch during execution of run_algo")
 
-        ticker_hist = yf.Ticker(self.get_ticker()).history(period="max") 
+        ticker_hist = self.get_history()
         start_Timestamp = pd.Timestamp(start)  
         stop_Timestamp = pd.Timestamp(stop)
         cur_Timestamp = start_Timestamp
 
-        if start_Timestamp < ticker_hist.index[0]:
-            raise ValueError("Simple moving average of ticker " + self.get_ticker + " was evaluated at invalid range" + str(start_Timestamp))     
+        if TradingCalendar.day_number(start_Timestamp) < self.calendar.sessions[0]:
+            raise ValueError("Simple moving average of ticker " + self.get_ticker() + " was evaluated at invalid range" + str(start_Timestamp))     
         
         # * Following line will change the start in the event of a market closure, etc.    
-        while start_Timestamp not in ticker_hist.index:
-            start_Timestamp = start_Timestamp - pd.Timedelta('1 days')
-        start_hist_idx = ticker_hist.index.get_loc(start_Timestamp) 
-        stop_hist_idx = ticker_hist.index.get_loc(stop_Timestamp)
+        start_hist_idx = self.calendar.previous_session(start_Timestamp)
+        stop_hist_idx = self.calendar.get_loc(stop_Timestamp)
 
         # ? Would it be more appropriate to stop at stop_hist_idx + 1?
         for idx in range(start_hist_idx, stop_hist_idx):
@@ -91,18 +104,15 @@ class SMA20:
         
         if not get_type_check({start:str}):
             raise TypeError("Type mismatch during calculation of SMA20")
-        ticker_hist = yf.Ticker(self.get_ticker()).history(period="max") 
+        ticker_hist = self.get_history()
         start_Timestamp = pd.Timestamp(start) 
 
         # ! The following line assumes that ticker_hist has at least one data entry in the dataframe
-        if start_Timestamp < ticker_hist.index[0]:
-            raise ValueError("Simple moving average of ticker " + self.get_ticker + " was evaluated at invalid range" + str(start_Timestamp)) 
+        if TradingCalendar.day_number(start_Timestamp) < self.calendar.sessions[0]:
+            raise ValueError("Simple moving average of ticker " + self.get_ticker() + " was evaluated at invalid range" + str(start_Timestamp)) 
 
         # * Following line checks for market closures    
-        while start_Timestamp not in ticker_hist.index:
-            start_Timestamp = start_Timestamp - pd.Timedelta('1 days')
-        
-        start_hist_idx = ticker_hist.index.get_loc(start_Timestamp)
+        start_hist_idx = self.calendar.previous_session(start_Timestamp)
 
         if start_hist_idx > 19:
             return sum(list(ticker_hist.iloc[start_hist_idx-19:start_hist_idx+1,3]))/20
@@ -0,0 +1,30 @@
+import AtomicFile
+import os
+import numpy as np
+import pytest
+
+def test_replaces_or_leaves_untouched(tmp_path):
+    '''
+
+        Description: a completed write replaces the file, a failed one leaves it and no temporary file behind
+
+    '''
+    filestring = str(tmp_path / "values.npy")
+    with AtomicFile.atomic_write(filestring) as pfile:
+        np.save(pfile, np.arange(5))
+    assert (np.load(filestring) == np.arange(5)).all()
+
+    with pytest.raises(KeyError):
+        with AtomicFile.atomic_write(filestring) as pfile:
+            np.save(pfile, np.arange(10))
+            raise KeyError("interrupted")
+    assert (np.load(filestring) == np.arange(5)).all()
+    assert os.listdir(str(tmp_path)) == ["values.npy"]
+
+    with AtomicFile.atomic_write(str(tmp_path / "key"), "w", permissions=0o600) as pfile:
+        pfile.write("secret")
+    assert open(str(tmp_path / "key")).read() == "secret"
+    assert os.stat(str(tmp_path / "key")).st_mode & 0o777 == 0o600
+    with pytest.raises(ValueError):
+        with AtomicFile.atomic_write(filestring, "a"):
+            pass
@@ -0,0 +1,55 @@
+import Algo
+import ChunkedPipeline
+import Differential
+import MinuteStore
+import SignalSpec
+import numpy as np
+import pandas as pd
+import tracemalloc
+
+def test_chunks_match_in_memory(tmp_path):
+    '''
+
+        Description: chunked signals and capital are exactly those of an in-memory run
+
+    '''
+    store = MinuteStore.MinuteStore(str(tmp_path))
+    bars = {"AAA": Differential.random_bars(3000, 0), "BBB": Differential.random_bars(2500, 1)}
+    for ticker, frame in bars.items():
+        store.write(ticker, frame)
+
+    #* A budget of 300 rows per chunk including the 90 warm-up rows
+    pipeline = ChunkedPipeline.ChunkedPipeline(store, memory_budget=ChunkedPipeline.FIXED_BYTES + 300 * ChunkedPipeline.BYTES_PER_ROW)
+    assert pipeline.chunk_rows == 210
+
+    for ticker, frame in bars.items():
+        expected = frame.copy()
+        Algo.MinhsAlgo.signals(expected)
+        expected["Capital"] = np.cumprod(np.concatenate([[1.0], 1 + expected["Rets"].to_numpy()]))[1:]
+
+        chunked = pd.concat(pipeline.iter_backtest(ticker, 1.0))
+        pd.testing.assert_frame_equal(chunked, expected, check_exact=True, check_freq=False, check_index_type=False)
+
+    master = pipeline.run(list(bars.keys()))
+    rets = pd.concat([pd.concat(pipeline.iter_chunks(ticker))["Rets"] for ticker in bars], axis=1).fillna(0)
+    assert np.array_equal(master["Count"].to_numpy(), (rets != 0).sum(axis=1).to_numpy())
+
+def test_memory_within_measured_budget():
+    '''
+
+        Description: the chunk memory constants cover the measured peak, and rolling statistics of a panel stay bounded
+
+    '''
+    per_row, fixed = ChunkedPipeline.measure_chunk_bytes()
+    assert per_row <= ChunkedPipeline.BYTES_PER_ROW and fixed <= ChunkedPipeline.FIXED_BYTES
+    for rows in [200, 2000, 20000]:
+        assert ChunkedPipeline.chunk_peak(rows) <= ChunkedPipeline.FIXED_BYTES + rows * ChunkedPipeline.BYTES_PER_ROW
+
+    #* Window temporaries would take 5000 x 300 x 90 doubles, about 1 GB, without the row blocks
+    panel = np.random.default_rng(0).normal(size=(5000, 300)).cumsum(axis=0)
+    tracemalloc.start()
+    stdev = SignalSpec.rolling_std_values(panel, 90)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert peak <= 3 * panel.nbytes + 4 * SignalSpec.ROLLING_BLOCK_BYTES
+    assert np.allclose(stdev, pd.DataFrame(panel).rolling(90).std().to_numpy(), equal_nan=True)
@@ -0,0 +1,46 @@
+import Algo
+import CorporateActions
+import Differential
+import MinuteStore
+import numpy as np
+import pandas as pd
+
+def test_adjustments_and_incremental_refresh(tmp_path):
+    '''
+
+        Description: adjusted bars match a hand adjustment, and a new action only recomputes its own ticker
+
+    '''
+    store = MinuteStore.MinuteStore(str(tmp_path / "raw"))
+    raw = {"AAA": Differential.random_bars(400, 0), "BBB": Differential.random_bars(400, 1)}
+    for ticker, frame in raw.items():
+        store.write(ticker, frame)
+    table = CorporateActions.ActionTable(str(tmp_path / "actions"))
+    source = CorporateActions.AdjustedBars(store, table)
+
+    split_day, dividend_day = raw["AAA"].index[300], raw["AAA"].index[150]
+    table.write(pd.DataFrame({"Ticker": ["AAA", "AAA"], "Date": [split_day, dividend_day],
+                              "Split": [2.0, 1.0], "Dividend": [0.0, 1.5]}))
+
+    expected = raw["AAA"].copy()
+    factor = np.ones(400)
+    factor[:300] /= 2
+    factor[:150] *= 1 - 1.5 / expected["Close"].iloc[149]
+    for col in CorporateActions.PRICE_COLUMNS:
+        expected[col] = expected[col] * factor
+    expected["Volume"] = expected["Volume"] * np.where(np.arange(400) < 300, 2.0, 1.0)
+    pd.testing.assert_frame_equal(source.bars("AAA"), expected, check_freq=False, check_index_type=False)
+    pd.testing.assert_frame_equal(source.bars("BBB"), raw["BBB"], check_freq=False, check_index_type=False)
+
+    signals = Algo.MinhsAlgo.signals
+    assert source.refresh(["AAA", "BBB"], signals) == ["AAA", "BBB"]
+    assert source.refresh(["AAA", "BBB"], signals) == []
+    Algo.MinhsAlgo.signals(expected)
+    pd.testing.assert_frame_equal(source.indicators("AAA", signals), expected, check_freq=False, check_index_type=False)
+
+    #* Re-sending a known action changes nothing, a new one invalidates only its ticker
+    assert not table.add("AAA", split_day, split=2.0)
+    assert source.refresh(["AAA", "BBB"], signals) == []
+    assert table.add("BBB", raw["BBB"].index[200], split=3.0)
+    assert source.refresh(["AAA", "BBB"], signals) == ["BBB"]
+    assert np.isclose(source.bars("BBB")["Close"].iloc[0], raw["BBB"]["Close"].iloc[0] / 3)
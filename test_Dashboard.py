@@ -0,0 +1,103 @@
+import ChunkedPipeline
+import Dashboard
+import Differential
+import MinuteStore
+import ResultsArchive
+import Sweep
+import json
+import threading
+import urllib.request
+
+def sharpe_task(ticker, params):
+    '''
+
+        Description: toy task whose Sharpe ratio is its parameter, failing on one ticker
+
+    '''
+    if ticker == "BAD":
+        raise ValueError("no data")
+    return {"Sharpe Ratio": params["x"], "Return": 10.0 * params["x"]}, None
+
+def test_sweep_streams_to_dashboard(tmp_path):
+    '''
+
+        Description: a sweep's results, errors and task timings reach the files and the HTTP endpoint of its dashboard
+
+    '''
+    tasks = [("T" + str(x), {"x": x}) for x in range(30)] + [("BAD", {"x": -1})]
+    with Dashboard.Dashboard(str(tmp_path / "live"), refresh=0.05, top=5, port=0) as dashboard:
+        coordinator = Sweep.SweepCoordinator(tasks, ResultsArchive.ResultsArchive(str(tmp_path / "archive")), "Toy",
+                                             max_attempts=2, monitor=dashboard)
+        coordinator.start()
+        workers = [threading.Thread(target=Sweep.run_worker, args=(coordinator.address, coordinator.authkey, sharpe_task), daemon=True) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        summary = coordinator.wait(timeout=30)
+    assert summary["Completed"] == 30 and len(summary["Errors"]) == 1
+
+    state = json.load(open(str(tmp_path / "live" / "state.json")))
+    assert state["Finished"] and state["Total"] == 31 and state["Completed"] == 30
+    assert [row["Ticker"] for row in state["Leaderboard"]] == ["T29", "T28", "T27", "T26", "T25"]
+    assert state["Leaderboard"][0]["Return"] == 290.0
+    assert [err["given_up"] for err in state["Errors"]["BAD"]] == [False, True] and state["Failed"] == 1
+    assert state["Stages"]["task"]["Count"] == 32
+    assert state["Throughput"] > 0
+    assert "T29" in open(str(tmp_path / "live" / "index.html")).read()
+
+def test_served_and_fed_by_pipeline(tmp_path):
+    '''
+
+        Description: the dashboard serves its files while running, and times the tickers of ChunkedPipeline.run as its profiler, a failed ticker not counting as completed
+
+    '''
+    store = MinuteStore.MinuteStore(str(tmp_path / "store"))
+    for i in range(3):
+        store.write("T" + str(i), Differential.random_bars(500, i))
+    pipeline = ChunkedPipeline.ChunkedPipeline(store)
+
+    with Dashboard.Dashboard(str(tmp_path / "live"), refresh=0.05, port=0) as dashboard:
+        dashboard.post("start", total=4)
+        pipeline.run(store.tickers() + ["MISSING"], profiler=dashboard)
+        dashboard.post("finish")
+        url = "http://%s:%d/" % dashboard.address
+        assert b"<h1>Sweep</h1>" in urllib.request.urlopen(url).read()
+    state = dashboard.state()
+    assert state["Completed"] == 3 and state["Failed"] == 1
+    assert state["Stages"]["chunks"]["Count"] == 4
+    assert list(state["Errors"]) == ["MISSING"]
+
+def test_every_run_of_a_ticker_ranked(tmp_path):
+    '''
+
+        Description: runs of a ticker with different params are ranked side by side rather than overwriting each other
+
+    '''
+    dashboard = Dashboard.Dashboard(str(tmp_path / "live"))
+    for x in [3, 1, 2]:
+        params = {"x": x}
+        dashboard.post("result", ticker="AAPL", stats={"Sharpe Ratio": float(x)}, seconds=0.1,
+                       ID=Sweep.task_id("AAPL", params), params=params)
+    dashboard.close()
+    state = dashboard.state()
+    assert state["Completed"] == 3
+    assert [row["Sharpe Ratio"] for row in state["Leaderboard"]] == [3.0, 2.0, 1.0]
+    assert [row["Params"] for row in state["Leaderboard"]] == ['{"x": 3}', '{"x": 2}', '{"x": 1}']
+    assert all(row["Ticker"] == "AAPL" for row in state["Leaderboard"])
+    assert '<td>{"x": 3}</td>' in open(str(tmp_path / "live" / "index.html")).read()
+
+def test_retried_error_not_failed(tmp_path):
+    '''
+
+        Description: a task that errors and then succeeds when retried counts as completed only, one given up counts as failed
+
+    '''
+    dashboard = Dashboard.Dashboard(str(tmp_path / "live"))
+    flaky, bad = Sweep.task_id("AAPL", {"x": 1}), Sweep.task_id("AAPL", {"x": 2})
+    dashboard.post("error", ticker="AAPL", error="timeout", attempt=1, given_up=False, ID=flaky)
+    dashboard.post("result", ticker="AAPL", stats={"Sharpe Ratio": 1.0}, ID=flaky, params={"x": 1})
+    dashboard.post("error", ticker="AAPL", error="no data", attempt=1, given_up=False, ID=bad)
+    dashboard.post("error", ticker="AAPL", error="no data", attempt=2, given_up=True, ID=bad)
+    dashboard.close()
+    state = dashboard.state()
+    assert state["Completed"] == 1 and state["Failed"] == 1
+    assert len(state["Errors"]["AAPL"]) == 3
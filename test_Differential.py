@@ -0,0 +1,43 @@
+import Differential
+import glob
+import numpy as np
+import os
+import pandas as pd
+import tempfile
+
+def test_fast_paths_match_references():
+    '''
+
+        Description: every fast path agrees bar for bar with its reference on random histories
+
+    '''
+    stores = set(glob.glob(os.path.join(tempfile.gettempdir(), "differential*")))
+    for result in Differential.run(seeds=range(2), n=300):
+        assert result["Divergence"] is None, Differential.report([result])
+        assert result["Speed Ratio"] > 0
+    #* The bar stores of the chunked case are removed once it ran
+    assert set(glob.glob(os.path.join(tempfile.gettempdir(), "differential*"))) == stores
+
+def test_first_divergence_reported_with_context():
+    '''
+
+        Description: a difference injected into a copy is reported at its bar and column, with the bars around it
+
+    '''
+    reference = Differential.random_bars(50, 0)
+    fast = reference.copy()
+    fast.iloc[30, 1] += 1e-9
+    fast.iloc[40, 0] += 1.0
+
+    divergence = Differential.first_divergence(reference, fast)
+    assert (divergence["Row"], divergence["Date"], divergence["Column"]) == (30, reference.index[30], "High")
+    assert divergence["Fast"] - divergence["Reference"] == fast.iloc[30, 1] - reference.iloc[30, 1]
+    assert list(divergence["Context"].index) == list(reference.index[27:34])
+
+    assert Differential.first_divergence(reference, fast, rtol=1e-9)["Row"] == 40
+    assert Differential.first_divergence(reference, fast.iloc[:45], atol=2.0)["Column"] == "Length"
+    assert Differential.first_divergence(reference, reference.copy()) is None
+
+    positions = pd.DataFrame({"Position": np.array([None, "Long", "Short"], dtype=object)})
+    swapped = pd.DataFrame({"Position": np.array([None, "Short", "Short"], dtype=object)})
+    assert Differential.first_divergence(positions, swapped)["Row"] == 1
@@ -0,0 +1,101 @@
+import Differential
+import Intraday
+import numpy as np
+import pandas as pd
+
+def reference_sessions(minutes, stdev_window, ma_window, entry_start=0, entry_end=None, stop_loss=None, take_profit=None):
+    '''
+
+        Description: the entry and exit of every session walked bar by bar
+
+    '''
+    sessions = [group for _, group in minutes.groupby(minutes.index.normalize())]
+    daily = pd.DataFrame({"Low": [s["Low"].min() for s in sessions], "High": [s["High"].max() for s in sessions],
+                          "Close": [s["Close"].iloc[-1] for s in sessions]})
+    stdev = daily["Close"].rolling(stdev_window).std().shift(1).to_numpy()
+    average = daily["Close"].rolling(ma_window).mean().shift(1).to_numpy()
+    rows = []
+    for d, session in enumerate(sessions):
+        prices = session["Close"].to_numpy()
+        row = {"Side": 0, "Entry Bar": -1, "Exit Bar": -1, "Rets": 0.0}
+        for bar in range(entry_start, min(len(prices) - 1, len(prices) if entry_end is None else entry_end)):
+            if d == 0:
+                break
+            buy = prices[bar] - daily["Low"][d - 1] < -stdev[d] and prices[bar] > average[d]
+            sell = prices[bar] - daily["High"][d - 1] > stdev[d] and prices[bar] < average[d]
+            if buy or sell:
+                side, entry = (1 if buy else -1), prices[bar]
+                exit_bar = len(prices) - 1
+                for later in range(bar + 1, len(prices)):
+                    move = side * (prices[later] - entry) / entry
+                    if (stop_loss is not None and move <= -stop_loss) or (take_profit is not None and move >= take_profit):
+                        exit_bar = later
+                        break
+                row = {"Side": side, "Entry Bar": bar, "Exit Bar": exit_bar, "Rets": side * (prices[exit_bar] - entry) / entry}
+                break
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def test_entries_exits_and_thresholds():
+    '''
+
+        Description: entries, session close exits, stop losses and take profits match a bar by bar walk of every session
+
+    '''
+    minutes = Differential.random_minutes(120, 0)
+    for kwargs in [{}, {"stop_loss": 0.004, "take_profit": 0.006}, {"entry_start": 30, "entry_end": 300, "stop_loss": 0.002}]:
+        result = Intraday.IntradayBacktest(minutes, stdev_window=2, ma_window=20, **kwargs).run()
+        expected = reference_sessions(minutes, 2, 20, **kwargs)
+        for col in ["Side", "Entry Bar", "Exit Bar"]:
+            assert list(result[col]) == list(expected[col]), (kwargs, col)
+        assert np.allclose(result["Rets"], expected["Rets"])
+        assert (result["Side"] != 0).sum() > 10
+
+    thresholds = Intraday.IntradayBacktest(minutes, stdev_window=2, ma_window=20, stop_loss=0.004, take_profit=0.006).run()
+    early = thresholds[(thresholds["Side"] != 0) & (thresholds["Exit Bar"] < 389)]
+    assert len(early.index) > 0
+    assert ((early["Rets"] <= -0.004) | (early["Rets"] >= 0.006)).all()
+
+def test_chunks_timezones_and_empty_universe():
+    '''
+
+        Description: results do not depend on the chunking, tz-aware minutes give local sessions, and a universe of failures is empty
+
+    '''
+    minutes = Differential.random_minutes(60, 1)
+    whole = Intraday.IntradayBacktest(minutes, stdev_window=2, ma_window=20, stop_loss=0.003).run()
+    for chunk_days in [1, 7, 59]:
+        chunked = Intraday.IntradayBacktest(minutes, stdev_window=2, ma_window=20, stop_loss=0.003, chunk_days=chunk_days).run()
+        assert chunked.equals(whole)
+
+    aware = minutes.tz_localize("America/New_York")
+    local = Intraday.IntradayBacktest(aware, stdev_window=2, ma_window=20, stop_loss=0.003).run()
+    assert (local.index == pd.bdate_range("2020-01-02", periods=60)).all()
+    assert local.equals(whole)
+
+    def fail(ticker):
+        raise KeyError(ticker)
+    assert Intraday.run_universe(fail, ["AAA", "BBB"]).empty
+    assert list(Intraday.run_universe({"AAA": minutes}.__getitem__, ["AAA", "BBB"], stdev_window=2).columns) == ["AAA"]
+
+def test_extended_hours_filtered():
+    '''
+
+        Description: pre-market and after-hours minutes are dropped before sessions are laid out, unless session is None
+
+    '''
+    minutes = Differential.random_minutes(40, 2)
+    days = pd.bdate_range("2020-01-02", periods=40)
+    #* Extreme prices outside the session, which would trigger entries and shift every bar if they were kept
+    extended = pd.DatetimeIndex(np.concatenate([days.values + np.timedelta64(m, "m") for m in list(range(240, 570, 5)) + list(range(960, 1200, 5))]))
+    noise = pd.DataFrame({"Open": 1.0, "High": 1000.0, "Low": 1.0, "Close": 1000.0, "Volume": 1}, index=extended)
+    noisy = pd.concat([minutes, noise[minutes.columns]]).sort_index()
+
+    regular = Intraday.IntradayBacktest(minutes, stdev_window=2, ma_window=20, stop_loss=0.003).run()
+    filtered = Intraday.IntradayBacktest(noisy, stdev_window=2, ma_window=20, stop_loss=0.003)
+    assert len(filtered.minute_data.index) == len(minutes.index)
+    assert filtered.run().equals(regular)
+    assert filtered.daily_levels().equals(Intraday.IntradayBacktest(minutes, stdev_window=2, ma_window=20).daily_levels())
+
+    unfiltered = Intraday.IntradayBacktest(noisy, stdev_window=2, ma_window=20, stop_loss=0.003, session=None).run()
+    assert not unfiltered.equals(regular)
@@ -0,0 +1,50 @@
+import Algo
+import Differential
+import LiveDecision
+import numpy as np
+
+def test_decider_matches_run_algo():
+    '''
+
+        Description: one decider over several tickers takes the decisions of BollingerBands.run_algo, day by day
+
+    '''
+    panels = [Differential.random_bars(400, seed) for seed in range(4)]
+    decider = LiveDecision.BollingerDecider(["T" + str(seed) for seed in range(4)])
+    references = [Differential.offline_algo(Algo.BollingerBands, bars) for bars in panels]
+    closes = np.column_stack([bars["Close"].to_numpy(dtype=np.float64) for bars in panels])
+
+    n_positions = 0
+    for row in range(len(closes)):
+        is_long, is_short = decider.on_bar(closes[row])
+        if row < LiveDecision.WINDOW - 1:
+            continue
+        for j, (bars, reference) in enumerate(zip(panels, references)):
+            reference.run_algo(bars.index[row])
+            assert (is_long[j], is_short[j]) == (reference.get_long(), reference.get_short()), (row, j)
+        n_positions += is_long.sum() + is_short.sum()
+    assert n_positions > 0
+
+def test_decider_continues_algo_and_latency():
+    '''
+
+        Description: a decider warmed up from an algorithm continues its decisions, and the latency harness reports every bar
+
+    '''
+    bars = Differential.random_bars(300, 5)
+    reference = Differential.offline_algo(Algo.BollingerBands, bars)
+    for row in range(21, 200):
+        reference.run_algo(bars.index[row])
+
+    warm = Differential.offline_algo(Algo.BollingerBands, bars.iloc[:200])
+    for row in range(21, 200):
+        warm.run_algo(bars.index[row])
+    decider = LiveDecision.BollingerDecider.from_algo(warm)
+    for row in range(200, 300):
+        is_long, is_short = decider.on_bar(np.array([bars["Close"].iloc[row]]))
+        reference.run_algo(bars.index[row])
+        assert (is_long[0], is_short[0]) == (reference.get_long(), reference.get_short())
+
+    result = LiveDecision.measure_latency(50, n_bars=200, seed=0)
+    assert result["Tickers"] == 50 and result["Bars"] == 200 - LiveDecision.WINDOW
+    assert 0 < result["p50 (us)"] <= result["p99 (us)"] <= result["Max (us)"]
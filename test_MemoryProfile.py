@@ -0,0 +1,127 @@
+import Backtest
+import ChunkedPipeline
+import Differential
+import MemoryProfile
+import MinuteStore
+import matplotlib
+import numpy as np
+import pandas as pd
+import pytest
+
+matplotlib.use("Agg")
+
+class Blob:
+    '''
+
+        Description: object kept alive by a leaking loop
+
+    '''
+    def __init__(self):
+        self.payload = bytearray(10000)
+
+def test_retained_objects_flagged():
+    '''
+
+        Description: objects kept from one iteration to the next are flagged, temporary ones are not
+
+    '''
+    kept = []
+    with MemoryProfile.MemoryProfiler(leak_iterations=3) as profiler:
+        for i in range(6):
+            with profiler.stage("work", "T" + str(i)):
+                kept.append(Blob())
+                temporary = [bytearray(10000) for _ in range(10)]
+                del temporary
+            profiler.end_iteration("T" + str(i))
+
+    assert "type test_MemoryProfile.Blob" in profiler.retained
+    assert profiler.retained["type test_MemoryProfile.Blob"]["First Flagged"] == "T3"
+    assert not any("bytearray" in key for key in profiler.retained if key.startswith("type"))
+    assert list(profiler.stage_frame()["Ticker"]) == ["T" + str(i) for i in range(6)]
+    assert "test_MemoryProfile.Blob" in profiler.report()
+
+def test_ceiling_and_pipeline(tmp_path):
+    '''
+
+        Description: a sweep profiled through ChunkedPipeline.run reports each ticker, and stops at its memory ceiling
+
+    '''
+    store = MinuteStore.MinuteStore(str(tmp_path / "store"))
+    for i in range(4):
+        store.write("T" + str(i), Differential.random_bars(1000, i))
+    pipeline = ChunkedPipeline.ChunkedPipeline(store, memory_budget=ChunkedPipeline.FIXED_BYTES + 300 * ChunkedPipeline.BYTES_PER_ROW)
+
+    with MemoryProfile.MemoryProfiler() as profiler:
+        expected = pipeline.run(store.tickers())
+        assert pipeline.run(store.tickers(), profiler=profiler).equals(expected)
+    profiler.write(str(tmp_path / "report.md"))
+    assert [row["Ticker"] for row in profiler.iterations] == store.tickers()
+    assert "## By ticker" in open(str(tmp_path / "report.md")).read()
+
+    with pytest.raises(MemoryError):
+        with MemoryProfile.MemoryProfiler(ceiling=MemoryProfile.rss() // 2) as profiler:
+            pipeline.run(store.tickers(), profiler=profiler)
+
+def test_failed_stage_measured():
+    '''
+
+        Description: a stage that raises is still recorded with its error, and still checked against the ceiling
+
+    '''
+    with MemoryProfile.MemoryProfiler() as profiler:
+        with pytest.raises(KeyError):
+            with profiler.stage("download", "X"):
+                partial = bytearray(10**6)
+                raise KeyError("X")
+    assert profiler.stages[0]["Stage"] == "download" and profiler.stages[0]["Error"] == "KeyError('X')"
+    assert profiler.stages[0]["Traced Peak"] >= 10**6
+    assert "Errors" in profiler.report()
+
+    with pytest.raises(MemoryError):
+        with MemoryProfile.MemoryProfiler(ceiling=MemoryProfile.rss() // 2) as profiler:
+            with profiler.stage("download", "X"):
+                raise KeyError("X")
+    assert len(profiler.stages) == 1
+
+def test_graph_closes_figures(tmp_path, monkeypatch):
+    '''
+
+        Description: drawing the portfolio graph of many backtests leaves no figure open
+
+    '''
+    import matplotlib.pyplot as plt
+    monkeypatch.chdir(tmp_path)
+    back = Backtest.Backtest(None, None, None)
+    back.ticker = "TEST"
+    back.hist_positions = pd.DataFrame({"Capital": np.ones(10), "Equity": np.zeros(10), "Cash": np.ones(10)},
+                                       index=pd.bdate_range("2020-01-01", periods=10))
+    for _ in range(3):
+        back._graph_portfolio()
+    assert plt.get_fignums() == []
+
+def test_profile_backtests_offline(tmp_path):
+    '''
+
+        Description: the backtest loop profiled through a bar source records every stage of every ticker, with peaks covering the bars loaded
+
+    '''
+    store = MinuteStore.MinuteStore(str(tmp_path / "store"))
+    bars = {"T" + str(i): Differential.random_bars(400 + 100 * i, i) for i in range(3)}
+    for ticker, frame in bars.items():
+        store.write(ticker, frame)
+    #* Daily bars are stamped at midnight, outside the default session
+    source = MinuteStore.BarAggregator(store, session=None)
+
+    profiler = MemoryProfile.profile_backtests(list(bars) + ["MISSING"], MemoryProfile.MemoryProfiler(), years_back=1, bar_source=source, graphs=False)
+    stages = profiler.stage_frame()
+    #* The missing ticker fails in its first stage, which is still measured
+    assert list(stages["Ticker"]) == [ticker for ticker in bars for _ in range(3)] + ["MISSING"]
+    assert list(stages["Stage"]) == ["download", "signals", "backtest"] * 3 + ["download"]
+    assert stages["Error"].iloc[:-1].isna().all() and stages["Error"].iloc[-1].startswith("FileNotFoundError")
+    assert (stages["RSS Diff"] == stages["RSS After"] - stages["RSS Before"]).all()
+    for ticker, frame in bars.items():
+        download = stages[(stages["Ticker"] == ticker) & (stages["Stage"] == "download")].iloc[0]
+        assert download["Traced Peak"] >= frame.to_numpy().nbytes
+
+    #* It still closes its iteration
+    assert [row["Ticker"] for row in profiler.iterations] == list(bars) + ["MISSING"]
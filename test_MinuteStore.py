@@ -0,0 +1,80 @@
+import Algo
+import Differential
+import MinuteStore
+import numpy as np
+import pandas as pd
+import pytest
+
+AGGREGATIONS = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+def with_extended_hours(minutes):
+    '''
+
+        Description: adds one pre-market and one after-hours bar to every session
+
+    '''
+    days = minutes.index.normalize().unique()
+    extra = []
+    for offset in [pd.Timedelta("08:00:00"), pd.Timedelta("17:30:00")]:
+        extra.append(pd.DataFrame({col: 1000.0 for col in MinuteStore.COLUMNS}, index=days + offset))
+    return pd.concat([minutes] + extra).sort_index()
+
+def test_aggregates_match_resample(tmp_path):
+    '''
+
+        Description: session, intraday, daily and weekly bars are those of pandas resample, and merged writes replace overlapping minutes
+
+    '''
+    minutes = with_extended_hours(Differential.random_minutes(40, 0))
+    store = MinuteStore.MinuteStore(str(tmp_path))
+    store.write("AAA", minutes.iloc[:9000])
+    store.write("AAA", minutes.iloc[8000:])
+    assert store.version("AAA") == 2
+    assert store.read("AAA").equals(minutes)
+
+    aggregator = MinuteStore.BarAggregator(store)
+    regular = minutes.between_time("09:30", "16:00", inclusive="left")
+    for rule, frequency, frame in [("1d", "1D", regular), ("1wk", "W-MON", regular), ("15min", "15min", regular),
+                                   ("1h", "1h", regular), ("1d", "1D", minutes)]:
+        session = "default" if frame is regular else None
+        expected = frame.resample(frequency, label="left", closed="left").agg(AGGREGATIONS).dropna(subset=["Open"])
+        bars = aggregator.bars("AAA", rule, session=session)
+        assert (bars.index == expected.index).all(), rule
+        assert np.allclose(bars.to_numpy(), expected[MinuteStore.COLUMNS].to_numpy()), rule
+    assert (aggregator.bars("AAA", "1wk").index.dayofweek == 0).all()
+    with pytest.raises(ValueError):
+        aggregator.bars("AAA", "2wk")
+
+def test_cache_period_and_algo(tmp_path):
+    '''
+
+        Description: rewriting session close minutes invalidates the cached bars, period serves get_current_data, and Algo reads from the aggregator
+
+    '''
+    minutes = Differential.random_minutes(300, 1)
+    store = MinuteStore.MinuteStore(str(tmp_path))
+    store.write("AAA", minutes)
+    aggregator = MinuteStore.BarAggregator(store)
+    daily = aggregator.bars("AAA", "1d")
+    assert aggregator.bars("AAA", "1d") is daily
+
+    closes = minutes[minutes.index.time == pd.Timestamp("15:59").time()]
+    store.write("AAA", closes.assign(Close=closes["Close"] * 2))
+    updated = aggregator.bars("AAA", "1d")
+    assert updated is not daily
+    assert np.allclose(updated["Close"], daily["Close"] * 2)
+    assert np.allclose(updated["Open"], daily["Open"])
+
+    assert aggregator.period("AAA", "22d").equals(updated.iloc[-22:])
+    assert aggregator.period("AAA", "max").equals(updated)
+    assert (aggregator.period("AAA", "ytd").index.year == updated.index[-1].year).all()
+    month = aggregator.period("AAA", "1mo", end=updated.index[100])
+    assert month.index[-1] == updated.index[100]
+    assert month.equals(updated.loc[updated.index[100] - pd.DateOffset(months=1) + pd.Timedelta(1, "D"):updated.index[100]])
+    with pytest.raises(ValueError):
+        aggregator.period("AAA", "3q")
+
+    algo = Algo.BollingerBands("AAA", bar_source=aggregator)
+    assert algo.total_price_data.equals(updated)
+    algo.get_current_data("22d")
+    assert algo.price_data.equals(updated["Close"].iloc[-22:])
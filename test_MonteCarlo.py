@@ -0,0 +1,71 @@
+import MonteCarlo
+import numpy as np
+import pytest
+
+def make_ledger(seed):
+    '''
+
+        Description: random trade P/L ratios and daily returns of a backtest
+
+    '''
+    rng = np.random.default_rng(seed)
+    return rng.normal(0.01, 0.05, 40), rng.normal(0.0005, 0.01, 300)
+
+def test_estimate_is_realized_ledger():
+    '''
+
+        Description: the estimate row holds the statistics of the ledger itself, computed explicitly
+
+    '''
+    trade_pl, daily_returns = make_ledger(0)
+    result = MonteCarlo.MonteCarlo(trade_pl, daily_returns, 1000.0, paths=200, seed=0).run()
+
+    equity = 1000.0 * np.cumprod(1 + trade_pl)
+    peaks = np.maximum(np.maximum.accumulate(equity), 1000.0)
+    wins, losses = (trade_pl > 0).sum(), (trade_pl < 0).sum()
+    expected = {
+        "Sharpe Ratio": daily_returns.mean() * 252 / (daily_returns.std(ddof=1) * np.sqrt(252)),
+        "Kelley Criterion": wins / len(trade_pl) - (losses / len(trade_pl)) / (wins / losses),
+        "Max Drawdown": ((peaks - equity) / peaks).max(),
+        "Final Capital": equity[-1],
+    }
+    for statistic, value in expected.items():
+        assert result.loc[statistic, "Estimate"] == pytest.approx(value)
+        assert result.loc[statistic, "Lower"] <= result.loc[statistic, "Mean"] <= result.loc[statistic, "Upper"]
+
+def test_seeded_results_independent_of_chunks_and_workers():
+    '''
+
+        Description: a fixed seed gives the same samples however the paths are chunked or spread over processes
+
+    '''
+    trade_pl, daily_returns = make_ledger(1)
+    reference = MonteCarlo.MonteCarlo(trade_pl, daily_returns, 1000.0, paths=500, block_size=5, chunk_size=100, seed=7).samples()
+    assert reference.shape == (500, len(MonteCarlo.STATISTICS))
+    pooled = MonteCarlo.MonteCarlo(trade_pl, daily_returns, 1000.0, paths=500, block_size=5, chunk_size=100, workers=2, seed=7).samples()
+    assert np.array_equal(reference, pooled, equal_nan=True)
+
+    for chunk_size, workers in [(37, None), (250, 3), (1000, None)]:
+        again = MonteCarlo.MonteCarlo(trade_pl, daily_returns, 1000.0, paths=500, block_size=5, chunk_size=chunk_size, workers=workers, seed=7).samples()
+        assert np.array_equal(reference, again, equal_nan=True)
+    other = MonteCarlo.MonteCarlo(trade_pl, daily_returns, 1000.0, paths=500, block_size=5, chunk_size=100, seed=8).samples()
+    assert not np.array_equal(reference, other, equal_nan=True)
+
+def test_resample_indices():
+    '''
+
+        Description: i.i.d. indices cover the observations, block indices are wrapped runs of consecutive observations
+
+    '''
+    rng = np.random.default_rng(0)
+    iid = MonteCarlo._resample_indices(rng, 10, 200, 50, None)
+    assert iid.shape == (200, 50) and iid.min() == 0 and iid.max() == 9
+    assert set(np.unique(iid)) == set(range(10))
+
+    blocks = MonteCarlo._resample_indices(rng, 10, 200, 23, 4)
+    assert blocks.shape == (200, 23) and blocks.min() >= 0 and blocks.max() <= 9
+    for start in range(0, 23, 4):
+        block = blocks[:, start:start + 4]
+        assert (np.diff(block, axis=1) % 10 == 1).all()
+    #* Blocks start anywhere, so wrapping from the last observation to the first happens
+    assert (np.diff(blocks[:, :4], axis=1) == -9).any()
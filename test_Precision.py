@@ -0,0 +1,64 @@
+import Algo
+import Backtest
+import Differential
+import Precision
+import numpy as np
+import pandas as pd
+import pytest
+
+def test_packed_mask_round_trip():
+    '''
+
+        Description: unpacking a packed mask gives back the mask, whatever its length, at one bit per value
+
+    '''
+    rng = np.random.default_rng(0)
+    for n in [0, 1, 7, 8, 9, 1000]:
+        mask = rng.random(n) < 0.3
+        packed = Precision.PackedMask(mask)
+        assert len(packed) == n and packed.nbytes == -(-n // 8)
+        assert np.array_equal(packed.unpack(), mask)
+
+def test_volumes_cast_or_widened():
+    '''
+
+        Description: volumes are stored in the mode's integer type, or int64 when they overflow it
+
+    '''
+    frame = pd.DataFrame({"Close": [1.0, 2.0], "Volume": [1.0, np.nan]})
+    compact = Precision.compact_prices(frame, Precision.COMPACT)
+    assert compact["Close"].dtype == np.float32 and compact["Volume"].dtype == np.int32
+    assert list(compact["Volume"]) == [1, 0]
+    large = Precision.compact_prices(frame.assign(Volume=[1.0, 2.0**40]), Precision.COMPACT)
+    assert large["Volume"].dtype == np.int64 and large["Volume"].iloc[1] == 2**40
+
+def test_compact_within_tolerance():
+    '''
+
+        Description: MinhsAlgo's indicators and returns and a BollingerBands backtest in COMPACT mode stay within its tolerance of FULL
+
+    '''
+    tolerance = Precision.COMPACT.tolerance
+    for seed in range(3):
+        bars = Differential.random_bars(1500, seed)
+        full = Differential.offline_algo(Algo.MinhsAlgo, bars)
+        compact = Differential.offline_algo(Algo.MinhsAlgo, bars, Precision.COMPACT)
+        full.run_algo()
+        compact.run_algo()
+        for col in ["Stdev", "Moving Average"]:
+            assert np.allclose(compact.total_price_data[col], full.total_price_data[col], rtol=tolerance, atol=0, equal_nan=True)
+        assert np.allclose(compact.total_price_data["Rets"], full.total_price_data["Rets"], rtol=0, atol=tolerance, equal_nan=True)
+        for signal in ["BUY", "SELL"]:
+            assert compact.get_signal(signal).equals(full.get_signal(signal))
+            with pytest.raises(KeyError):
+                compact.total_price_data[signal]
+
+        years_back = (pd.to_datetime("today").normalize() - bars.index[30]).days / 365
+        results = []
+        for precision in [None, Precision.COMPACT]:
+            back = Backtest.Backtest(Differential.offline_algo(Algo.BollingerBands, bars, precision), 100000.0, years_back)
+            back.run_backtest_vectorized()
+            results.append(back.hist_positions)
+        assert list(results[1]["Position"]) == list(results[0]["Position"])
+        assert results[1]["Capital"].dtype == np.float64
+        assert np.allclose(results[1]["Capital"], results[0]["Capital"], rtol=tolerance, atol=0)
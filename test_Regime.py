@@ -0,0 +1,69 @@
+import Algo
+import Differential
+import Regime
+import numpy as np
+import pandas as pd
+
+def test_features_match_pandas():
+    '''
+
+        Description: the regime features match their pandas definitions, and a panel matches its tickers one by one
+
+    '''
+    bars = Differential.random_bars(400, 0)
+    features = Regime.SPEC.evaluate(bars)
+
+    log_range = np.log(bars["High"] / bars["Low"])
+    log_body = np.log(bars["Close"] / bars["Open"])
+    expected = {
+        "Realized Vol": np.log(bars["Close"] / bars["Close"].shift(1)).rolling(20).std(),
+        "Volume Z": (bars["Volume"] - bars["Volume"].rolling(20).mean()) / bars["Volume"].rolling(20).std(),
+        "Parkinson Vol": np.sqrt((log_range ** 2).rolling(20).mean() / (4 * np.log(2))),
+        "Garman-Klass Vol": np.sqrt((0.5 * log_range ** 2 - (2 * np.log(2) - 1) * log_body ** 2).rolling(20).mean()),
+    }
+    for name, values in expected.items():
+        assert np.allclose(features[name], values.to_numpy(), equal_nan=True), name
+
+    regime = features["Regime"]
+    #* Volume spikes are labelled once the volume z-score has a window, calm and volatile once the baseline has one too
+    assert (regime[:19] == Regime.UNKNOWN).all()
+    assert not np.isin(regime[:20 + 90 - 2], [Regime.CALM, Regime.VOLATILE]).any()
+    assert regime.dtype.kind == "i"
+    assert set(np.unique(regime[120:])) >= {Regime.CALM, Regime.VOLATILE}
+    assert np.array_equal(features["Mean Reversion"], regime == Regime.CALM)
+
+    panels = [Differential.random_bars(400, seed) for seed in range(3)]
+    panel = {col: np.column_stack([frame[col].to_numpy() for frame in panels]) for col in ["Open", "High", "Low", "Close", "Volume"]}
+    masks = Regime.mask(panel)
+    for j, frame in enumerate(panels):
+        assert np.array_equal(masks[:, j], Regime.mask(frame))
+
+def test_algos_gated_by_regime():
+    '''
+
+        Description: MinhsAlgo and BollingerBands only enter on days the regime mask allows
+
+    '''
+    bars = Differential.random_bars(600, 1)
+    mask = Regime.mask(bars)
+
+    ungated = bars.copy()
+    Algo.MinhsAlgo.signals(ungated)
+    gated = bars.copy()
+    Algo.MinhsAlgo.signals(gated, regime=mask)
+    for signal in ["BUY", "SELL"]:
+        assert np.array_equal(gated[signal], ungated[signal] & mask)
+    assert (gated["Rets"][~mask] == 0).all()
+    assert np.array_equal(gated["Rets"][mask], ungated["Rets"][mask])
+
+    algo = Differential.offline_algo(Algo.BollingerBands, bars)
+    algo.set_regime(pd.Series(mask, index=bars.index))
+    is_long, is_short = algo.positions(start=21)
+    entries = np.flatnonzero((is_long[1:] & ~is_long[:-1]) | (is_short[1:] & ~is_short[:-1])) + 1
+    assert len(entries) > 0 and mask[entries].all()
+
+    reference = Differential.offline_algo(Algo.BollingerBands, bars)
+    reference.set_regime()
+    for row in range(21, len(bars.index)):
+        reference.run_algo(bars.index[row])
+        assert (reference.get_long(), reference.get_short()) == (is_long[row], is_short[row])
@@ -0,0 +1,61 @@
+import ResultsArchive
+import numpy as np
+import pandas as pd
+import uuid
+
+def make_curve(n, seed):
+    '''
+
+        Description: creates a random equity curve with the columns archived by ResultsArchive
+
+    '''
+    rng = np.random.default_rng(seed)
+    capital = 10000 * np.cumprod(1 + rng.normal(0, 0.01, n))
+    cash = capital * rng.random(n)
+    return pd.DataFrame({"Capital": capital, "Equity": capital - cash, "Cash": cash},
+                        index=pd.date_range("2020-01-01", periods=n, freq="B"))
+
+def test_query_and_load_curve(tmp_path):
+    '''
+
+        Description: runs appended across several segments are found by query and their curves reload exactly
+
+    '''
+    archive = ResultsArchive.ResultsArchive(str(tmp_path), flush_every=3)
+    runs = {}
+    for i in range(7):
+        ID = uuid.uuid4()
+        curve = make_curve(50 + i, i)
+        runs[str(ID)] = curve
+        archive.append(ID, ["AAPL", "MSFT"][i % 2], "MinhsAlgo", {"window": 20 + i}, {"Sharpe Ratio": i / 2}, curve)
+    archive.flush()
+
+    reopened = ResultsArchive.ResultsArchive(str(tmp_path))
+    assert len(reopened.index().index) == 7
+    assert set(reopened.query(**{"Sharpe Ratio": (1, None), "Ticker": "AAPL"})["Sharpe Ratio"]) == {1.0, 2.0, 3.0}
+
+    for ID, curve in runs.items():
+        loaded = reopened.load_curve(ID)
+        assert (loaded.index == curve.index).all()
+        assert np.array_equal(loaded.to_numpy(), curve[["Capital", "Equity", "Cash"]].to_numpy())
+
+def test_concurrent_writers_keep_every_segment(tmp_path):
+    '''
+
+        Description: two archives flushing to the same directory never overwrite each other's segments or curves
+
+    '''
+    first = ResultsArchive.ResultsArchive(str(tmp_path), flush_every=2)
+    second = ResultsArchive.ResultsArchive(str(tmp_path), flush_every=2)
+    runs = {}
+    for i in range(8):
+        ID = str(uuid.uuid4())
+        runs[ID] = make_curve(20 + i, i)
+        [first, second][i % 2].append(ID, "AAPL", "MinhsAlgo", {"i": i}, {"Sharpe Ratio": float(i)}, runs[ID])
+    first.flush()
+    second.flush()
+
+    reopened = ResultsArchive.ResultsArchive(str(tmp_path))
+    assert sorted(reopened.index()["Sharpe Ratio"]) == [float(i) for i in range(8)]
+    for ID, curve in runs.items():
+        assert np.array_equal(reopened.load_curve(ID).to_numpy(), curve[["Capital", "Equity", "Cash"]].to_numpy())
@@ -0,0 +1,69 @@
+import Algo
+import Differential
+import SignalSpec
+import numpy as np
+import pandas as pd
+
+def reference_minhs(df):
+    '''
+
+        Description: the column by column MinhsAlgo.run_algo code the spec replaces
+
+    '''
+    df['Stdev'] = Algo.rolling_std(df['Close'], 90)
+    df['Moving Average'] = Algo.rolling_mean(df['Close'], 20)
+    df['Buy1'] = (df['Open'] - df['Low'].shift(1)) < -df['Stdev']
+    df['Buy2'] = df['Open'] > df['Moving Average']
+    df['BUY'] = df['Buy1'] & df['Buy2']
+    df['Sell1'] = (df['Open'] - df['High'].shift(1)) > df['Stdev']
+    df['Sell2'] = df['Open'] < df['Moving Average']
+    df['SELL'] = df['Sell1'] & df['Sell2']
+    df['Pct Change'] = (df['Close'] - df['Open']) / df['Open']
+    df['Rets'] = np.where(df['BUY'], df['Pct Change'], 0)
+    df['Rets'] = np.where(df['SELL'], -df['Pct Change'], df['Rets'])
+
+def test_minhs_identical():
+    '''
+
+        Description: MinhsAlgo.signals adds exactly the columns of the imperative implementation
+
+    '''
+    for seed in range(5):
+        expected = Differential.random_bars(1500, seed)
+        reference_minhs(expected)
+        actual = Differential.random_bars(1500, seed)
+        Algo.MinhsAlgo.signals(actual)
+        pd.testing.assert_frame_equal(actual, expected, check_exact=True)
+
+def test_bollinger_identical():
+    '''
+
+        Description: BollingerBands.positions matches run_algo called on every day
+
+    '''
+    for seed in range(3):
+        frame = Differential.random_bars(400, seed)
+        long_positions, short_positions = Differential.offline_algo(Algo.BollingerBands, frame).positions(start=21)
+
+        algo = Differential.offline_algo(Algo.BollingerBands, frame)
+        for row in range(21, len(frame.index)):
+            algo.run_algo(frame.index[row])
+            assert (algo.get_long(), algo.get_short()) == (long_positions[row], short_positions[row])
+        assert long_positions.any() and short_positions.any()
+
+def test_panel_and_common_subexpressions():
+    '''
+
+        Description: a panel evaluates as its columns would one by one, and shared nodes are compiled once
+
+    '''
+    close = SignalSpec.column("Close")
+    strategy = SignalSpec.Strategy({"a": close.rolling_std(10) + 1, "b": close.rolling_std(10) * close.shift(1)})
+    assert [op for op, _, _ in strategy.steps].count("rolling_std") == 1
+
+    panel = np.column_stack([Differential.random_bars(200, seed)["Close"].to_numpy() for seed in range(4)])
+    outputs = strategy.evaluate({"Close": panel})
+    for j in range(4):
+        single = strategy.evaluate({"Close": panel[:, j]})
+        for name in ["a", "b"]:
+            assert np.array_equal(outputs[name][:, j], single[name], equal_nan=True)
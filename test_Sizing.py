@@ -0,0 +1,84 @@
+import Backtest
+import Differential
+import Sizing
+import functools
+import numpy as np
+import pandas as pd
+
+def naive_kelly(close, codes, window, fraction, default, cap):
+    '''
+
+        Description: Kelly fraction of every bar from an explicit list of the trades closed so far
+
+    '''
+    exits, returns = Sizing.trade_returns(close, codes)
+    out = np.full(len(codes), default)
+    for bar in range(len(codes)):
+        recent = returns[exits <= bar][-window:]
+        wins, losses = recent[recent > 0], recent[recent < 0]
+        if len(recent) == window and len(wins) and len(losses):
+            kelly = len(wins) / window - (len(losses) / window) / (wins.mean() / -losses.mean())
+            out[bar] = min(max(fraction * kelly, 0.0), cap)
+    return out
+
+def test_trades_and_kelly():
+    '''
+
+        Description: trades are read off position changes, and the rolling Kelly fraction matches a naive loop
+
+    '''
+    close = np.array([10.0, 11.0, 12.0, 11.0, 10.0, 10.0, 12.0])
+    codes = np.array([0, 1, 1, -1, 0, 1, 1])
+    exits, returns = Sizing.trade_returns(close, codes)
+    assert list(exits) == [3, 4]
+    assert np.allclose(returns, [0.0, 1 / 11])
+
+    bars = Differential.random_bars(600, 0)["Close"].to_numpy()
+    codes = Differential.random_positions(600, 0)
+    for window in [5, 20]:
+        expected = naive_kelly(bars, codes, window, 0.5, 0.3, 0.8)
+        assert np.allclose(Sizing.kelly_fractions(bars, codes, window, 0.5, 0.3, 0.8), expected)
+        assert (expected != 0.3).any()
+
+def test_volatility_and_equal_risk():
+    '''
+
+        Description: inverse volatility hits the target under its cap, and equal risk weights active tickers by inverse volatility under its cap
+
+    '''
+    close = np.array([100.0, 100.0, 50.0, 100.0])
+    stdev = np.array([np.nan, 10.0, 10.0, 1.0])
+    assert np.allclose(Sizing.inverse_volatility_fractions(close, stdev, target=0.05, default=0.2), [0.2, 0.5, 0.25, 1.0])
+
+    volatility = pd.DataFrame({"A": [0.1, 0.1, 0.1], "B": [0.2, 0.2, np.nan], "C": [0.4, 0.4, 0.4]})
+    active = pd.DataFrame({"A": [True, False, True], "B": True, "C": True})
+    weights = Sizing.equal_risk_fractions(volatility, active)
+    assert np.allclose(weights.to_numpy(), [[4 / 7, 2 / 7, 1 / 7], [0.0, 2 / 3, 1 / 3], [0.8, 0.0, 0.2]])
+
+    #* A binding cap hands its excess to the uncapped tickers, and leaves the bar under-invested once every ticker is capped
+    volatility = pd.DataFrame({"A": [0.01, 0.01, 0.1], "B": [0.1, 0.02, 0.1], "C": [0.1, np.nan, 0.1], "D": [0.1, np.nan, np.nan]})
+    weights = Sizing.equal_risk_fractions(volatility, cap=0.4)
+    assert np.allclose(weights.to_numpy(), [[0.4, 0.2, 0.2, 0.2], [0.4, 0.4, 0.0, 0.0], [1 / 3, 1 / 3, 1 / 3, 0.0]])
+    assert (weights.to_numpy() <= 0.4).all()
+
+def test_backtest_consumes_sizing():
+    '''
+
+        Description: every entry of a sized backtest buys the fraction of its cash and equity given by the sizing rule
+
+    '''
+    bars = Differential.random_bars(300, 1)
+    algo = Differential.ReplayAlgo(bars, Differential.random_positions(300, 1))
+    years_back = (pd.to_datetime("today").normalize() - bars.index[1]).days / 365
+    back = Backtest.Backtest(algo, 100000.0, years_back)
+    kelly = functools.partial(Sizing.kelly_fractions, window=5, default=0.5)
+    back.run_backtest_vectorized(sizing=kelly)
+
+    hist = back.hist_positions
+    close = hist["Close"].to_numpy()
+    codes = np.select([hist["Position"] == "Long", hist["Position"] == "Short"], [1, -1], 0)
+    fractions = kelly(close, codes)
+    entries = np.flatnonzero((codes[1:] != codes[:-1]) & (codes[1:] != 0)) + 1
+    before = hist["Cash"].to_numpy()[entries - 1] + hist["Equity"].to_numpy()[entries - 1]
+    assert len(entries) > 10
+    assert list(hist["Volume"].to_numpy()[entries]) == list((before * fractions[entries]) // close[entries])
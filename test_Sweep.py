@@ -0,0 +1,145 @@
+import Sweep
+import ResultsArchive
+import multiprocessing
+import os
+import time
+import pandas as pd
+import pytest
+
+def square_task(ticker, params):
+    '''
+
+        Description: toy task returning one statistic and a two row curve
+
+    '''
+    curve = pd.DataFrame({"Capital": [1.0, params["x"] ** 2], "Equity": 0.0, "Cash": [1.0, params["x"] ** 2]},
+                         index=pd.to_datetime(["2020-01-01", "2020-01-02"]))
+    return {"Square": params["x"] ** 2}, curve
+
+def crashing_task(ticker, params):
+    '''
+
+        Description: kills its worker process in the middle of a task
+
+    '''
+    os._exit(1)
+
+def hanging_task(ticker, params):
+    '''
+
+        Description: holds its lease without ever answering, as a node that stopped responding
+
+    '''
+    time.sleep(3600)
+
+def poison_task(ticker, params):
+    '''
+
+        Description: kills its worker on one ticker, as a task running out of memory, and squares the others
+
+    '''
+    if ticker == "POISON":
+        os._exit(1)
+    return square_task(ticker, params)
+
+def start_worker(coordinator, task, name):
+    process = multiprocessing.get_context("fork").Process(target=Sweep.run_worker, args=(coordinator.address, coordinator.authkey, task, name), daemon=True)
+    process.start()
+    return process
+
+def test_sweep_survives_crashed_and_hung_workers(tmp_path):
+    '''
+
+        Description: tasks leased to dead or hung workers are re-dispatched and every result is written once
+
+    '''
+    archive = ResultsArchive.ResultsArchive(str(tmp_path))
+    tasks = [("T" + str(x), {"x": x}) for x in range(20)]
+    coordinator = Sweep.SweepCoordinator(tasks, archive, "Square", lease_timeout=1.0)
+    coordinator.start()
+
+    #* The faulty workers connect first so they are the first to be handed a task
+    faulty = [start_worker(coordinator, crashing_task, "crasher"), start_worker(coordinator, hanging_task, "hanger")]
+    time.sleep(0.5)
+    workers = [start_worker(coordinator, square_task, "node" + str(i)) for i in range(3)]
+
+    summary = coordinator.wait(timeout=30)
+    #* Idle workers were told the sweep is over before wait returned
+    for process in workers:
+        process.join(timeout=5)
+        assert process.exitcode == 0
+    for process in faulty:
+        process.kill()
+
+    assert summary == {"Completed": 20, "Errors": {}}
+    index = ResultsArchive.ResultsArchive(str(tmp_path)).index()
+    assert len(index.index) == 20
+    assert sorted(index["Square"]) == [x ** 2 for x in range(20)]
+
+    #* Running the same sweep again finds every result in the archive and writes nothing
+    rerun = Sweep.SweepCoordinator(tasks, ResultsArchive.ResultsArchive(str(tmp_path)), "Square")
+    assert rerun.run(timeout=5) == {"Completed": 20, "Errors": {}}
+    assert len(ResultsArchive.ResultsArchive(str(tmp_path)).index().index) == 20
+
+def test_task_killing_workers_given_up(tmp_path):
+    '''
+
+        Description: a task that kills every worker it is leased to is given up after max_attempts, and the sweep still finishes
+
+    '''
+    tasks = [("POISON", {"x": 0})] + [("T" + str(x), {"x": x}) for x in range(1, 10)]
+    coordinator = Sweep.SweepCoordinator(tasks, ResultsArchive.ResultsArchive(str(tmp_path)), "Square", max_attempts=2)
+    assert len(coordinator.authkey) == 32
+    coordinator.start()
+    workers = [start_worker(coordinator, poison_task, "node" + str(i)) for i in range(4)]
+
+    summary = coordinator.wait(timeout=30)
+    assert summary["Completed"] == 9
+    assert list(summary["Errors"]) == [Sweep.task_id("POISON", {"x": 0})]
+    assert "disconnected" in summary["Errors"][Sweep.task_id("POISON", {"x": 0})]
+    assert coordinator.attempts[Sweep.task_id("POISON", {"x": 0})] == 2
+    #* Two workers died on the two attempts, the others were told the sweep is over
+    for process in workers:
+        process.join(timeout=5)
+    assert sorted(process.exitcode for process in workers) == [0, 0, 1, 1]
+
+def test_leases_of_hung_workers_reclaimed(tmp_path):
+    '''
+
+        Description: expired leases are reclaimed on a timer, so a sweep whose every worker hangs still gives its tasks up
+
+    '''
+    tasks = [("T" + str(x), {"x": x}) for x in range(2)]
+    coordinator = Sweep.SweepCoordinator(tasks, ResultsArchive.ResultsArchive(str(tmp_path)), "Square",
+                                         lease_timeout=0.5, max_attempts=1, drain_timeout=0.5)
+    coordinator.start()
+    workers = [start_worker(coordinator, hanging_task, "hanger" + str(i)) for i in range(2)]
+
+    summary = coordinator.wait(timeout=10)
+    for process in workers:
+        process.kill()
+    assert summary["Completed"] == 0
+    assert sorted(summary["Errors"]) == sorted(Sweep.task_id(ticker, params) for ticker, params in tasks)
+    assert all("expired" in error for error in summary["Errors"].values())
+
+def test_worker_key_from_environment_or_file(tmp_path, monkeypatch, capsys):
+    '''
+
+        Description: command line workers read the coordinator's key from the file or the environment it was saved to, never a default
+
+    '''
+    key = bytes(range(32))
+    monkeypatch.delenv(Sweep.AUTHKEY_VARIABLE, raising=False)
+    with pytest.raises(KeyError):
+        Sweep.load_authkey()
+    monkeypatch.setenv(Sweep.AUTHKEY_VARIABLE, key.hex())
+    assert Sweep.load_authkey() == key
+    (tmp_path / "key").write_text(key.hex() + "\n")
+    assert Sweep.load_authkey(str(tmp_path / "key")) == key
+
+    #* The coordinator writes its key for the workers readable by its owner only, or prints it
+    Sweep.save_authkey(key[::-1], str(tmp_path / "shared"))
+    assert os.stat(str(tmp_path / "shared")).st_mode & 0o777 == 0o600
+    assert Sweep.load_authkey(str(tmp_path / "shared")) == key[::-1]
+    Sweep.save_authkey(key)
+    assert capsys.readouterr().out == Sweep.AUTHKEY_VARIABLE + "=" + key.hex() + "\n"
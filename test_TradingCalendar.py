@@ -0,0 +1,51 @@
+from TradingCalendar import TradingCalendar
+import pandas as pd
+import pytest
+
+def make_calendar():
+    '''
+
+        Description: business days of 2020 with a multi-month hole, as in the history of "EAI"
+
+    '''
+    days = pd.bdate_range("2020-01-01", "2020-12-31")
+    days = days[(days < "2020-03-01") | (days > "2020-07-15")]
+    return TradingCalendar(days), days
+
+def test_lookups_match_index():
+    '''
+
+        Description: every lookup agrees with the equivalent search of the DatetimeIndex
+
+    '''
+    calendar, days = make_calendar()
+    for day in pd.date_range("2020-01-01", "2020-12-31"):
+        if day in days:
+            assert calendar.get_loc(day) == days.get_loc(day)
+        else:
+            with pytest.raises(KeyError):
+                calendar.get_loc(day)
+        assert calendar.timestamp(calendar.previous_session(day)) == days[days <= day][-1]
+
+    assert calendar.sessions_back("2020-07-16", 21) == days.get_loc(pd.Timestamp("2020-07-16")) - 21
+    with pytest.raises(IndexError):
+        calendar.sessions_back("2020-01-02", 21)
+    with pytest.raises(KeyError):
+        calendar.previous_session("2019-12-31")
+
+    window = calendar.slice("2020-02-20", "2020-07-20")
+    assert list(days[window]) == list(days[(days >= "2020-02-20") & (days <= "2020-07-20")])
+
+def test_gaps():
+    '''
+
+        Description: the hole is reported and bounded by max_gap
+
+    '''
+    calendar, days = make_calendar()
+    gaps = calendar.gaps(min_days=30)
+    assert len(gaps.index) == 1
+    assert gaps["Start"].iloc[0] == pd.Timestamp("2020-02-28")
+    assert gaps["End"].iloc[0] == pd.Timestamp("2020-07-16")
+    with pytest.raises(ValueError):
+        calendar.previous_session("2020-06-01", max_gap=30)
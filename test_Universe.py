@@ -0,0 +1,63 @@
+from Universe import Universe
+import Universe as universe
+import numpy as np
+import pandas as pd
+import pytest
+
+def write_holdings(filestring, tickers):
+    '''
+
+        Description: spreadsheet laid out as the iShares holdings file, seven header rows then the table
+
+    '''
+    n = len(tickers)
+    holdings = pd.DataFrame({
+        "Ticker": tickers, "Name": [t + " INC" for t in tickers],
+        "Sector": ["Energy", "Financials", "Energy", "Utilities", "Financials", "Energy"][:n],
+        "Asset Class": ["Equity"] * (n - 1) + ["Futures"],
+        "Market Value": np.linspace(600.0, 100.0, n), "Weight (%)": np.linspace(6.0, 1.0, n),
+        "Shares": np.arange(1, n + 1), "Price": [10.0, 20.0, 0.0, 40.0, 50.0, 60.0][:n],
+        "Location": "United States", "Exchange": "NASDAQ",
+    })
+    with pd.ExcelWriter(filestring) as writer:
+        pd.DataFrame([["06-Jul-2020"]] * universe.HEADER_ROWS).to_excel(writer, header=False, index=False)
+        holdings.to_excel(writer, startrow=universe.HEADER_ROWS, index=False)
+
+def test_load_and_subsets(tmp_path):
+    '''
+
+        Description: the cache drops unusable rows, and subsets keep the IDs of the full list
+
+    '''
+    source = str(tmp_path / "holdings.xlsx")
+    write_holdings(source, ["AAA", "BBB", "--", "DDD", "AAA", "ESU0"])
+    stocks = Universe.load(source)
+
+    assert list(stocks) == ["AAA", "BBB", "DDD", "ESU0"]
+    assert list(stocks.ids(["DDD", "AAA"])) == [2, 0]
+    assert list(stocks.column("Sector")) == ["Energy", "Financials", "Utilities", "Energy"]
+    with pytest.raises(KeyError):
+        stocks.ids(["ZZZ"])
+
+    equities = stocks.named("russell3000")
+    assert list(equities) == ["AAA", "BBB", "DDD"]
+    largest = equities.subset({"Sector": ["Energy", "Utilities"]}, top=1)
+    assert list(largest) == ["AAA"] and list(largest.ids()) == [0]
+    assert list(equities.subset(tickers=["DDD", "ZZZ"]).ids()) == [2]
+    assert list(stocks.frame().loc["DDD", ["ID", "Price"]]) == [2, 40.0]
+
+def test_cache_refreshed_with_source(tmp_path):
+    '''
+
+        Description: the cache is reused while the spreadsheet is unchanged, and rebuilt once it changes
+
+    '''
+    source = str(tmp_path / "holdings.xlsx")
+    write_holdings(source, ["AAA", "BBB", "CCC"])
+    assert list(Universe.load(source)) == ["AAA", "BBB", "CCC"]
+
+    #* A cache that no longer matches its source is rebuilt, one without its source is used as is
+    write_holdings(source, ["AAA", "BBB", "CCC", "DDD"])
+    assert list(Universe.load(source)) == ["AAA", "BBB", "CCC", "DDD"]
+    (tmp_path / "holdings.xlsx").unlink()
+    assert list(Universe.load(source)) == ["AAA", "BBB", "CCC", "DDD"]